@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -25,10 +26,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'studenttracker.middleware.RequestMetricsMiddleware',  # SQL/template/latency per view, see REQUEST_METRICS
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'studenttracker.middleware.AccessContextMiddleware',  # request.access: role + cached enrolled course ids
+    'studenttracker.middleware.ProfilingMiddleware',  # Admin-only, ?profile=1 or X-Profile: 1, see PROFILING
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -37,7 +41,7 @@ ROOT_URLCONF = 'Studytrack.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'studenttracker.middleware.InstrumentedDjangoTemplates',  # DjangoTemplates + render timing
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -67,6 +71,20 @@ DATABASES = {
 }
 AUTH_USER_MODEL ='studenttracker.User'
 
+AUTHENTICATION_BACKENDS = [
+    'studenttracker.auth_backends.EmailBackend',  # Site login form: email + password, one indexed lookup
+    'django.contrib.auth.backends.ModelBackend',  # Django admin: username + password
+]
+
+# First entry hashes new passwords; its cost is STUDYTRACK_SETTINGS['PASSWORD_HASH_ITERATIONS']
+PASSWORD_HASHERS = [
+    'studenttracker.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -119,28 +137,165 @@ DEFAULT_FROM_EMAIL = 'StudyTrack <noreply@studytrack.com>'
 # AI Configuration (Optional)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Session storage, picked with SESSION_BACKEND:
+#   db             - every authenticated request reads the session table
+#   cached_db      - reads come from the cache, the table is only hit on a cache miss and on writes;
+#                    needs CACHE_URL, or a logout on one worker leaves the session alive on the others
+#   signed_cookies - no server-side storage; sessions cannot be revoked before they expire
+SESSION_BACKENDS = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_BACKENDS[os.getenv('SESSION_BACKEND', 'db')]
+SESSION_CACHE_ALIAS = 'default'
+# Expired rows of db/cached_db are purged by `manage.py clear_expired_sessions`
+
+# Cache shared by every web worker and the scheduler. Unread counts, enrolled
+# course ids, login throttling, request metrics and cached_db sessions rely on
+# all processes seeing the same entries; without CACHE_URL each process gets
+# its own memory cache and those features fall back to the database or refuse to start.
+CACHE_URL = os.getenv('CACHE_URL', '')  # redis://host:6379/1 (needs `redis`) or memcached://host:11211 (needs `pymemcache`)
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+elif CACHE_URL.startswith('memcached://'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': CACHE_URL.removeprefix('memcached://'),
+    }}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+if SESSION_ENGINE == SESSION_BACKENDS['cached_db'] and not CACHES[SESSION_CACHE_ALIAS]['BACKEND'].endswith(
+    ('RedisCache', 'PyMemcacheCache')
+):
+    raise ImproperlyConfigured('SESSION_BACKEND=cached_db needs a Redis or Memcached CACHE_URL; use db otherwise')
+
 # Security Settings (for development)
 SESSION_COOKIE_SECURE = False
 CSRF_COOKIE_SECURE = False
 SECURE_SSL_REDISRECT = False
 
 # File Upload Settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
+# Larger uploads spool to a temp file instead of worker memory; big videos
+# go through the chunked upload API (videos/uploads/), which streams to disk
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
+DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
 
 # Custom Settings for StudyTrack
 STUDYTRACK_SETTINGS = {
     'MAX_VIDEO_SIZE': 500 * 1024 * 1024,  # 500MB
     'ALLOWED_VIDEO_FORMATS': ['mp4', 'mov', 'avi', 'mkv'],
+    'UPLOAD_CHUNK_MAX_SIZE': 8 * 1024 * 1024,  # 8MB per chunk for the resumable upload API
+    'UPLOAD_EXPIRY_HOURS': 24,  # Unfinished uploads idle this long are failed and their temp files deleted
+    'VIDEO_STREAM_CHUNK_SIZE': 512 * 1024,  # Bytes read per chunk when Django streams a video
+    'VIDEO_STREAM_OFFLOAD': None,  # None, 'x-sendfile' or 'x-accel-redirect' to let the web server send files
+    'VIDEO_ACCEL_REDIRECT_PREFIX': '/protected-media/',  # nginx internal location mapped to MEDIA_ROOT
+    'PREVIEW_URL_SECONDS': 6 * 60 * 60,  # Signed preview links are shared per window and stay valid 1-2 windows
     'YOUTUBE_EMBED_URL': 'https://www.youtube.com/embed/',
     'DEFAULT_COURSE_THUMBNAIL': 'default_course.jpg',
+    'THUMBNAIL_WIDTHS': [160, 320, 640],  # Variant widths built by process_media_jobs (JPEG + WebP each)
+    'THUMBNAIL_QUALITY': 80,
+    'MEDIA_WORKERS': 2,  # Processes used by process_media_jobs
+    'MEDIA_JOB_MAX_ATTEMPTS': 3,
+    'MEDIA_POLL_SECONDS': 10,  # Idle wait between queue checks
+    'FFPROBE_BINARY': 'ffprobe',  # Duration probing is skipped when this is not on PATH
+    'RECOMMENDATION_TOP_K': 10,  # Neighbours stored per course
+    'RECOMMENDATION_REFRESH_AT': '03:00',  # Daily (server time) rebuild run by send_study_notifications
+    'FUNNEL_REFRESH_MINUTES': 30,  # How often courses with changed progress get their video funnels recomputed
+    'ENROLLMENT_CACHE_SECONDS': 3600,  # Per-user enrolled course ids in the shared cache (CACHE_URL); retired on every enrollment change
+    'ANALYTICS_CACHE_SECONDS': 300,  # How long the admin analytics page is served from cache
+    'REQUEST_METRICS': {
+        'ENABLED': True,
+        'SLOW_REQUEST_MS': 500,  # Requests slower than this are logged as warnings
+        'MAX_QUERIES': 50,  # ...as are requests running this many SQL queries
+        'N_PLUS_ONE_THRESHOLD': 5,  # Same query shape repeated this often in one request
+        'FLUSH_SECONDS': 30,  # How often each worker pushes its totals to the cache
+        'IGNORE_PATHS': ['/static/', '/media/'],
+    },
+    'PROFILING': {
+        'ENABLED': True,  # Admins can still only profile on request; set False to ignore the flag entirely
+        'QUERY_FLAG': 'profile',  # ?profile=1
+        'HEADER': 'X-Profile',  # or send "X-Profile: 1"
+        'KEEP': 100,  # Newest profiles kept under MEDIA_ROOT/profiles
+        'TOP_FUNCTIONS': 60,  # Functions listed in each report, by cumulative time
+        'TOP_QUERIES': 25,  # Query shapes listed in each report, by total time
+    },
+    'METRICS_TOKEN': os.getenv('METRICS_TOKEN', ''),  # Bearer token for Prometheus scrapes of /metrics/notifications/
+    'PASSWORD_HASH_ITERATIONS': 1_000_000,  # PBKDF2 rounds (Django 5.2 default); changed hashes are redone at next login
+    'LOGIN_THROTTLE': {
+        'ENABLED': True,
+        'WINDOW_SECONDS': 15 * 60,  # Failures are counted per window, starting at the first one
+        'IP_ATTEMPTS': 30,  # Failed logins per client address before it is refused
+        'EMAIL_ATTEMPTS': 5,  # Failed logins per email before it is refused; reset by a successful login
+        # META key our reverse proxy sets to the client address, e.g. HTTP_X_FORWARDED_FOR or HTTP_X_REAL_IP;
+        # empty uses REMOTE_ADDR. Never set it when clients can reach Django without the proxy.
+        'CLIENT_IP_HEADER': os.getenv('CLIENT_IP_HEADER', ''),
+        'TRUSTED_PROXIES': 1,  # Proxies of ours appending to X-Forwarded-For; the entry they added is used
+    },
+    'LEADERBOARD_REBUILD_AT': '03:30',  # Daily full re-rank to repair drift from the incremental updates
+    'LEADERBOARD_UPDATE_MINUTES': 5,  # Students whose values changed are re-ranked this often
     'AI_COACH_ENABLED': True,
+    'EMAIL_BATCH_SIZE': 50,  # Messages sent per SMTP session before reconnecting
+    'REMINDER_CHUNK_SIZE': 500,  # Students whose reminder emails are built and delivered per pass
+    'ASYNC_EMAIL_DELIVERY': False,  # Deliver batches over concurrent SMTP sessions (uses aiosmtplib if installed)
+    'ASYNC_EMAIL_CONCURRENCY': 8,  # Concurrent SMTP sessions to EMAIL_HOST
+    'ASYNC_EMAIL_QUEUE_SIZE': 100,  # Rendered messages buffered ahead of the senders
+    'QUIZ_REMINDER_WINDOW_HOURS': 48,  # Remind about quizzes due within this window
+    # Slot times are each student's local time (User.timezone)
     'NOTIFICATION_SCHEDULE': {
         'morning': '07:00',
+        'course_morning': '08:00',
+        'quiz': '11:00',
         'afternoon': '13:00', 
+        'course_afternoon': '14:00',
         'evening': '18:00',
-        'night': '22:00'
-    }
+        'course_evening': '19:00',
+        'night': '22:00',
+        'digest_morning': '08:00',  # Digest slots for users with digest_frequency daily/twice_daily
+        'digest_evening': '19:00',
+    },
+    'RETENTION': {
+        'NOTIFICATION_READ_DAYS': 30,  # Read notifications older than this are archived
+        'NOTIFICATION_MAX_DAYS': 180,  # Any notification older than this is archived
+        'VIDEO_PROGRESS_UNSTARTED_DAYS': 90,  # Never-watched progress rows untouched this long
+        'BATCH_SIZE': 1000,  # Rows deleted per transaction
+        'BATCH_PAUSE_SECONDS': 0.05,
+    },
+    'DIGEST_MAX_ITEMS': 10,  # Notifications listed per digest before "...and N more"
+    'NOTIFICATION_TICK_MINUTES': 15,  # Scheduler granularity for local-time buckets
+    'NOTIFICATION_CATCHUP_HOURS': 6,  # Missed slots older than this are skipped, not replayed
+    'NOTIFICATION_RETRY_MINUTES': 5,  # Delay before retrying a failed slot
+    'SCHEDULER_LOCK_TTL_SECONDS': 600,  # Leader lease; a crashed leader is replaced after this
 } # Leave empty for now - system will use fallback messages
 
+# Failed logins are counted in the cache; with a per-process cache every worker
+# would allow its own IP_ATTEMPTS/EMAIL_ATTEMPTS. A single runserver is fine.
+if STUDYTRACK_SETTINGS['LOGIN_THROTTLE']['ENABLED'] and not DEBUG and CACHES['default']['BACKEND'].endswith('LocMemCache'):
+    raise ImproperlyConfigured('LOGIN_THROTTLE needs a cache shared by every worker: set CACHE_URL (or disable the throttle)')
+
  
+
+# Logging: per-request metrics are one JSON object per line on 'studytrack.requests'
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message_only': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'message_only'},
+    },
+    'loggers': {
+        'studytrack.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'WARNING'),  # INFO logs every request
+            'propagate': False,
+        },
+        'studytrack.notifications': {
+            'handlers': ['console'],
+            'level': os.getenv('NOTIFICATION_LOG_LEVEL', 'INFO'),  # One JSON line per finished job
+            'propagate': False,
+        },
+    },
+}
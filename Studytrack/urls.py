@@ -17,23 +17,38 @@ urlpatterns = [
     # Dashboards
     path('dashboard/', views.dashboard, name='dashboard'),
     path('admin_dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin_dashboard/analytics/', views.admin_analytics, name='admin_analytics'),
 
     # Course & Task Management (Admin only)
     path('add_course/', views.add_course, name='add_course'),
     path('add_video/', views.add_video, name='add_video'),
     path('add_task/', views.add_task, name='add_task'),
+    
+    # Chunked, resumable video uploads
+    path('videos/uploads/', views.start_video_upload, name='start_video_upload'),
+    path('videos/uploads/<uuid:upload_id>/', views.video_upload_chunk, name='video_upload_chunk'),
+    path('videos/uploads/<uuid:upload_id>/complete/', views.complete_video_upload, name='complete_video_upload'),
 
     # Video Management & Playback
     path('course/<int:course_id>/enroll/', views.enroll_course, name='enroll_course'),
     path('course/<int:course_id>/', views.course_detail, name='course_detail'),
     path('video/play/<int:video_id>/', views.play_video, name='play_video'),
+    path('video/<int:video_id>/stream/', views.stream_video, name='stream_video'),
+    path('video/preview/<str:token>/', views.stream_preview, name='stream_preview'),
+    path('video/<int:video_id>/start/', views.start_video, name='start_video'),
     path('video/<int:video_id>/mark-completed/', views.mark_video_completed, name='mark_video_completed'),
     path('video/<int:video_id>/notes/', views.video_notes, name='video_notes'),
     path('course/<int:course_id>/', views.course_detail, name='course_detail'),
     
     # Notifications
     path('notifications/mark-read/<int:notification_id>/', views.mark_notification_read, name='mark_notification_read'),
+    path('notifications/mark-read/', views.mark_notifications_read, name='mark_notifications_read'),
+    path('notifications/feed/', views.notification_feed, name='notification_feed'),
+    path('search/', views.search, name='search'),
+    path('leaderboard/', views.leaderboard, name='leaderboard'),
+    path('metrics/notifications/', views.notification_metrics_export, name='notification_metrics'),
     path('notifications/test-reminder/', views.test_study_reminder, name='test_study_reminder'),
+    path('notifications/settings/', views.notification_settings, name='notification_settings'),
     
     # Temporary redirects
     path('courses/', views.dashboard, name='courses'),
@@ -1,16 +1,35 @@
 from django.contrib import admin
+from django.utils.html import format_html
 from .models import (
     User, LegacyCourse, Quiz, Task, QuizAttempt, StudyHabit, 
     StudySession, StudentGoal, HabitNotification,
-    Course, VideoSection, Video, Enrollment, VideoProgress
+    Course, VideoSection, Video, Enrollment, VideoProgress, VideoUpload, MediaJob,
+    CourseRecommendation, LeaderboardEntry, VideoFunnel, NotificationJobStats,
+    ProfileRun
 )
+from .services.search_service import SearchIndex
+
+
+class IndexedSearchMixin:
+    """Answer the changelist search box from the search index instead of LIKE '%term%' scans"""
+    search_object_type = None
+    search_result_limit = 1000
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        hits = SearchIndex().ranked_ids(
+            search_term, self.search_object_type, limit=self.search_result_limit, include_unpublished=True
+        )
+        return queryset.filter(id__in=[object_id for object_id, _ in hits]), False
 
 # YouTube-style Models
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ['title',  'level', 'price', 'students_count', 'is_published', 'created_at']
     list_filter = ['level', 'is_published', 'created_at']
     search_fields = ['title', 'description']
+    search_object_type = 'course'
     readonly_fields = ['students_count', 'created_at', 'updated_at']
     
     fieldsets = (
@@ -39,11 +58,14 @@ class VideoSectionAdmin(admin.ModelAdmin):
     ordering = ['course', 'order']
 
 @admin.register(Video)
-class VideoAdmin(admin.ModelAdmin):
-    list_display = ['title', 'section', 'video_type', 'duration', 'order', 'is_preview']
+class VideoAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ['title', 'section', 'video_type', 'duration', 'order', 'is_preview',
+                    'funnel_completed', 'funnel_completion_rate', 'funnel_drop_off_rate']
     list_filter = ['video_type', 'is_preview', 'section__course']
+    list_select_related = ['section__course', 'funnel']
     search_fields = ['title', 'description']
-    readonly_fields = ['created_at']
+    search_object_type = 'video'
+    readonly_fields = ['created_at', 'funnel_histogram']
     
     fieldsets = (
         ('Basic Information', {
@@ -54,8 +76,39 @@ class VideoAdmin(admin.ModelAdmin):
         }),
         ('Settings', {
             'fields': ('order', 'is_preview')
+        }),
+        ('Completion Funnel', {
+            'fields': ('funnel_histogram',)
         })
     )
+    
+    def _funnel(self, obj):
+        try:
+            return obj.funnel
+        except VideoFunnel.DoesNotExist:
+            return None
+    
+    @admin.display(description='Completed')
+    def funnel_completed(self, obj):
+        funnel = self._funnel(obj)
+        return f"{funnel.completed}/{funnel.enrolled}" if funnel else '-'
+    
+    @admin.display(description='Completion %')
+    def funnel_completion_rate(self, obj):
+        funnel = self._funnel(obj)
+        return funnel.completion_rate if funnel else '-'
+    
+    @admin.display(description='Drop-off %')
+    def funnel_drop_off_rate(self, obj):
+        funnel = self._funnel(obj)
+        return funnel.drop_off_rate if funnel else '-'
+    
+    @admin.display(description='Watch depth (enrolled students per 10% of the video)')
+    def funnel_histogram(self, obj):
+        funnel = self._funnel(obj)
+        if not funnel or not funnel.histogram:
+            return 'Not computed yet'
+        return ' | '.join(f"{i * 10}%: {count}" for i, count in enumerate(funnel.histogram))
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
@@ -71,11 +124,91 @@ class VideoProgressAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'video__title']
     readonly_fields = ['last_watched']
 
+@admin.register(VideoUpload)
+class VideoUploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'status', 'received_bytes', 'total_size', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['filename', 'user__username']
+    readonly_fields = ['upload_id', 'received_bytes', 'file_name', 'created_at', 'updated_at']
+
+@admin.register(CourseRecommendation)
+class CourseRecommendationAdmin(admin.ModelAdmin):
+    list_display = ['course', 'rank', 'recommended_course', 'score', 'computed_at']
+    list_filter = ['course']
+    ordering = ['course', 'rank']
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ['metric', 'course_id', 'rank', 'user', 'value', 'updated_at']
+    list_filter = ['metric']
+    search_fields = ['user__username']
+    ordering = ['metric', 'course_id', 'rank']
+
+@admin.register(MediaJob)
+class MediaJobAdmin(admin.ModelAdmin):
+    list_display = ['job_type', 'object_id', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['job_type', 'status']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+    ordering = ['-id']
+
+@admin.register(NotificationJobStats)
+class NotificationJobStatsAdmin(admin.ModelAdmin):
+    list_display = ['job_name', 'runs', 'sent', 'failed', 'bound_by', 'updated_at']
+    readonly_fields = ['job_name', 'counters', 'last_run', 'updated_at']
+    ordering = ['job_name']
+    
+    def runs(self, obj):
+        return obj.counters.get('runs', 0)
+    
+    def sent(self, obj):
+        return obj.counters.get('sent', 0)
+    
+    def failed(self, obj):
+        return obj.counters.get('failed', 0)
+    
+    @admin.display(description='Last run bound by')
+    def bound_by(self, obj):
+        return obj.last_run.get('bound_by') or '-'
+
+@admin.register(ProfileRun)
+class ProfileRunAdmin(admin.ModelAdmin):
+    list_display = ['label', 'kind', 'total_ms', 'sql_count', 'sql_ms', 'user', 'created_at']
+    list_select_related = ['user']
+    list_filter = ['kind']
+    search_fields = ['label']
+    readonly_fields = ['kind', 'label', 'user', 'total_ms', 'sql_count', 'sql_ms', 'report', 'stats', 'created_at',
+                       'report_text']
+    ordering = ['-created_at']
+    
+    def has_add_permission(self, request):
+        return False  # Captured with ?profile=1 or send_study_notifications --profile
+    
+    @admin.display(description='Report')
+    def report_text(self, obj):
+        try:
+            with obj.report.open('rb') as handle:
+                text = handle.read().decode(errors='replace')
+        except (OSError, ValueError):
+            return 'Report file is missing'
+        return format_html('<pre style="white-space: pre; overflow-x: auto; font-size: 12px;">{}</pre>', text)
+    
+    def delete_model(self, request, obj):
+        obj.report.delete(save=False)
+        obj.stats.delete(save=False)
+        super().delete_model(request, obj)
+    
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            obj.report.delete(save=False)
+            obj.stats.delete(save=False)
+        super().delete_queryset(request, queryset)
+
 # Legacy Models (Your existing models)
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ['username', 'email', 'role', 'education', 'date_joined']
-    list_filter = ['role', 'is_staff', 'is_active']
+    list_display = ['username', 'email', 'role', 'education', 'timezone', 'digest_frequency', 'date_joined']
+    list_filter = ['role', 'is_staff', 'is_active', 'timezone', 'digest_frequency']
+    readonly_fields = ['utc_offset_minutes']
     search_fields = ['username', 'email', 'first_name', 'last_name']
 
 @admin.register(LegacyCourse)
@@ -96,6 +229,7 @@ class HabitNotificationAdmin(admin.ModelAdmin):
     list_filter = ['notification_type', 'is_read', 'created_at']
     search_fields = ['title', 'student__username']
     readonly_fields = ['created_at']
+    ordering = ['-id']
 
 # Register other legacy models without custom admin
 admin.site.register(Quiz)
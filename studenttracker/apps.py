@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StudenttrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'studenttracker'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    """Authenticate with `email=` and a password in one indexed query.
+
+    Emails are not unique in older data, so up to a few accounts sharing an
+    address are tried in id order instead of failing on the duplicate.
+    Passwords stored with outdated hasher settings are re-hashed by
+    check_password() on a successful login.
+    """
+
+    MAX_SHARED_EMAIL = 3
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if not email or password is None:
+            return None
+        candidates = list(UserModel._default_manager.filter(email=email).order_by('id')[:self.MAX_SHARED_EMAIL])
+        if not candidates:
+            # Run the hasher once anyway so unknown emails take as long as wrong passwords
+            UserModel().set_password(password)
+            return None
+        for user in candidates:
+            if user.check_password(password) and self.user_can_authenticate(user):
+                return user
+        return None
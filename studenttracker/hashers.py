@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the work factor taken from PASSWORD_HASH_ITERATIONS.
+
+    Uses the stock "pbkdf2_sha256" algorithm name, so existing hashes keep
+    verifying. When the setting changes, must_update() flags every hash made
+    with another count and it is re-hashed on that user's next login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.STUDYTRACK_SETTINGS.get('PASSWORD_HASH_ITERATIONS', PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from studenttracker.services.retention_service import HistoryArchiver
+
+
+class Command(BaseCommand):
+    help = 'Archive old notifications and unstarted video progress to compressed JSONL under MEDIA_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Rows per delete batch (default RETENTION['BATCH_SIZE'])")
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be archived')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🗄️ Starting history archival...'))
+        archiver = HistoryArchiver(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            log=self.stdout.write,
+        )
+        results = archiver.run()
+
+        total = sum(rows for rows, _ in results.values())
+        seconds = sum(elapsed for _, elapsed in results.values())
+        verb = 'would move' if options['dry_run'] else 'moved'
+        rate = f' ({total / seconds:.0f} rows/s)' if seconds and not options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(f'✅ Archival complete: {verb} {total} rows in {seconds:.1f}s{rate}'))
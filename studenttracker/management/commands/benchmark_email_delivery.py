@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+
+from django.core.mail import get_connection, send_mail
+from django.core.management.base import BaseCommand
+from studenttracker.services.email_delivery import AsyncEmailDelivery, render_email
+
+
+class StandInSMTPServer:
+    """Minimal local SMTP server (aiosmtpd-style) that accepts and discards mail.
+
+    `latency` seconds are added to every DATA reply to mimic the round-trip
+    of a real relay, which is what concurrency is meant to hide. `rejects`
+    maps a recipient to how many times its RCPT is refused with a 451
+    before it is accepted, to exercise retries.
+    """
+
+    def __init__(self, latency=0.0, rejects=None):
+        self.latency = latency
+        self.rejects = dict(rejects or {})
+        self.received = 0
+        self.port = None
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+
+    async def _handle(self, reader, writer):
+        writer.write(b"220 standin ESMTP\r\n")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                writer.write(b"250-standin\r\n250 8BITMIME\r\n")
+            elif command.startswith('RCPT') and self._reject(line):
+                writer.write(b"451 Try again later\r\n")
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                writer.write(b"250 OK\r\n")
+            elif command == 'DATA':
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                    pass
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                self.received += 1
+                writer.write(b"250 Queued\r\n")
+            elif command == 'QUIT':
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"502 Not implemented\r\n")
+            await writer.drain()
+        writer.close()
+
+    def _reject(self, line):
+        address = line.decode(errors='replace').partition(':')[2].strip().strip('<>').lower()
+        if self.rejects.get(address, 0) > 0:
+            self.rejects[address] -= 1
+            return True
+        return False
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, '127.0.0.1', 0)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class Command(BaseCommand):
+    help = 'Compare the serial send_mail loop with async SMTP delivery against a local stand-in server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='Messages to send per run')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent SMTP sessions for the async run')
+        parser.add_argument('--latency-ms', type=float, default=20.0, help='Simulated relay latency per message')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        server = StandInSMTPServer(latency=options['latency_ms'] / 1000)
+        server.start()
+        smtp_options = {'host': '127.0.0.1', 'port': server.port, 'use_tls': False, 'use_ssl': False,
+                        'username': '', 'password': ''}
+
+        context = {
+            'student_name': 'Benchmark Student',
+            'current_date': 'Today',
+            'pending_assignments': 2,
+            'upcoming_deadlines': [],
+            'study_hours_today': 1,
+            'target_hours': 4,
+            'completed_courses': 1,
+            'total_courses': 3,
+            'progress_percentage': 33,
+        }
+        emails = [
+            ("📚 Benchmark Reminder", "emails/study_reminder.html", context, [f"student{i}@example.com"])
+            for i in range(count)
+        ]
+
+        try:
+            # Baseline: what the services do today, one send_mail (and one SMTP session) per message
+            started = time.perf_counter()
+            for subject, template_name, email_context, recipients in emails:
+                message = render_email(subject, template_name, email_context, recipients)
+                connection = get_connection(
+                    'django.core.mail.backends.smtp.EmailBackend',
+                    host=smtp_options['host'], port=smtp_options['port'],
+                    username='', password='', use_tls=False, use_ssl=False,
+                )
+                send_mail(
+                    subject=message.subject,
+                    message=message.body,
+                    from_email=message.from_email,
+                    recipient_list=recipients,
+                    html_message=message.alternatives[0][0],
+                    connection=connection,
+                )
+            serial_seconds = time.perf_counter() - started
+
+            delivery = AsyncEmailDelivery(concurrency=options['concurrency'], **smtp_options)
+            started = time.perf_counter()
+            results = delivery.deliver(render_email(*email) for email in emails)
+            async_seconds = time.perf_counter() - started
+        finally:
+            server.stop()
+
+        sent = sum(1 for result in results if result['status'] == 'sent')
+        self.stdout.write(self.style.SUCCESS('📬 Email delivery benchmark'))
+        self.stdout.write(f'  Client: {delivery.session_class.__name__.strip("_")}')
+        self.stdout.write(f'  Messages: {count}, relay latency: {options["latency_ms"]:.0f}ms')
+        self.stdout.write(f'  Serial send_mail: {serial_seconds:.2f}s ({count / serial_seconds:.1f} msg/s)')
+        self.stdout.write(
+            f'  Async x{options["concurrency"]}: {async_seconds:.2f}s ({count / async_seconds:.1f} msg/s), '
+            f'{sent}/{count} sent'
+        )
+        self.stdout.write(f'  Speed-up: {serial_seconds / async_seconds:.1f}x')
@@ -0,0 +1,301 @@
+import contextlib
+import io
+import json
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from studenttracker.middleware import QueryRecorder, RequestMetrics
+from studenttracker.services.course_notification_service import CourseNotificationService
+from studenttracker.services.digest_service import DigestNotificationService
+from studenttracker.services.notification_metrics import notification_metrics
+from studenttracker.services.notification_service import StudyHabitNotificationService
+from studenttracker.services.synthetic_data import SyntheticDataset
+
+FLOWS = ['dashboard', 'course_detail', 'enroll_course', 'play_video', 'mark_video_completed']
+
+# Reminder job -> callable taking the student queryset, returning emails sent
+JOBS = {
+    'course_completion_reminders': lambda users: CourseNotificationService().send_course_completion_reminders(users=users),
+    'quiz_reminders': lambda users: CourseNotificationService().send_quiz_reminders(users=users),
+    'study_reminders': lambda users: StudyHabitNotificationService().send_study_reminders(users=users),
+    'daily_digest': lambda users: DigestNotificationService().send_digests(users),
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the core student flows and reminder jobs against a seeded synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--courses', type=int, default=20)
+        parser.add_argument('--sections', type=int, default=4, help='Sections per course')
+        parser.add_argument('--videos', type=int, default=5, help='Videos per section')
+        parser.add_argument('--enrollments', type=int, default=3, help='Courses each student is enrolled in')
+        parser.add_argument('--sessions', type=int, default=10, help='Study sessions per student')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--requests', type=int, default=100, help='Measured requests per flow')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per flow first')
+        parser.add_argument('--skip-jobs', action='store_true', help='Only benchmark the HTTP flows')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Previous JSON report to print the differences against')
+        parser.add_argument(
+            '--session-backend', choices=sorted(settings.SESSION_BACKENDS),
+            help='Session storage to benchmark with (default: the configured SESSION_ENGINE)',
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Keep the benchmark database between runs (skips the dataset when it already exists)',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {options['compare']}: {e}")
+
+        # Never touch the real data: run on a throwaway test database (test_<NAME> on MySQL, memory on SQLite)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb']
+        )
+        try:
+            session_engine = settings.SESSION_BACKENDS.get(options['session_backend'], settings.SESSION_ENGINE)
+            with override_settings(
+                SESSION_ENGINE=session_engine,
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                ALLOWED_HOSTS=['testserver'],
+                STUDYTRACK_SETTINGS=dict(
+                    settings.STUDYTRACK_SETTINGS,
+                    ASYNC_EMAIL_DELIVERY=False,
+                    # The benchmark measures requests itself; keep them out of the live metrics
+                    REQUEST_METRICS=dict(settings.STUDYTRACK_SETTINGS.get('REQUEST_METRICS', {}), ENABLED=False),
+                ),
+            ):
+                report = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.print_report(report, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"📝 Report written to {options['output']}")
+
+    def run_benchmark(self, options):
+        from studenttracker.models import User
+        dataset = SyntheticDataset(
+            students=options['students'], courses=options['courses'], sections=options['sections'],
+            videos=options['videos'], enrollments=options['enrollments'], sessions=options['sessions'],
+            seed=options['seed'], log=self.stdout.write,
+        )
+        if options['keepdb'] and User.objects.filter(username__startswith='bench_student_').exists():
+            self.stdout.write('♻️  Reusing the existing benchmark dataset')
+            counts = {'students': User.objects.filter(username__startswith='bench_student_').count()}
+        else:
+            counts = dataset.generate()
+
+        self.rng = random.Random(options['seed'])
+        self.clients = {}
+        self.state = self.load_state()
+        flows = {}
+        for flow in FLOWS:
+            flows[flow] = self.run_flow(flow, options['requests'], options['warmup'])
+            self.stdout.write(f"  ⏱️  {flow}: p95 {flows[flow]['p95_ms']}ms, {flows[flow]['avg_queries']} queries")
+
+        jobs = {}
+        if not options['skip_jobs']:
+            students = User.objects.filter(role='student')
+            for name, job in JOBS.items():
+                jobs[name] = self.run_job(name, job, students)
+
+        return {
+            'generated_at': timezone.now().isoformat(),
+            'database': {'vendor': connection.vendor, 'engine': connection.settings_dict['ENGINE']},
+            'session_engine': settings.SESSION_ENGINE,
+            'options': {key: options[key] for key in (
+                'students', 'courses', 'sections', 'videos', 'enrollments', 'sessions', 'seed', 'requests', 'warmup'
+            )},
+            'dataset': counts,
+            'flows': flows,
+            'jobs': jobs,
+        }
+
+    # ---- Request flows -------------------------------------------------
+
+    def load_state(self):
+        """Who is enrolled where, and which videos they have not completed yet"""
+        from studenttracker.models import Course, Enrollment, Video, VideoProgress
+        enrolled = {}
+        for user_id, course_id in Enrollment.objects.values_list('user_id', 'course_id'):
+            enrolled.setdefault(user_id, set()).add(course_id)
+        videos = {}
+        for video_id, course_id in Video.objects.values_list('id', 'section__course_id'):
+            videos.setdefault(course_id, []).append(video_id)
+        completed = set(VideoProgress.objects.filter(is_completed=True).values_list('user_id', 'video_id'))
+        return {
+            'users': sorted(enrolled),
+            'enrolled': enrolled,
+            'courses': list(Course.objects.filter(is_published=True).values_list('id', flat=True)),
+            'videos': videos,
+            'completed': completed,
+        }
+
+    def client_for(self, user_id):
+        from studenttracker.models import User
+        if user_id not in self.clients:
+            client = Client()
+            client.force_login(User.objects.get(id=user_id))
+            self.clients[user_id] = client
+        return self.clients[user_id]
+
+    def next_request(self, flow):
+        """(user_id, method, url, expected status) for one request of a flow"""
+        state = self.state
+        user_id = self.rng.choice(state['users'])
+        enrolled = state['enrolled'][user_id]
+        if flow == 'dashboard':
+            return user_id, 'get', reverse('dashboard'), 200
+        if flow == 'course_detail':
+            return user_id, 'get', reverse('course_detail', args=[self.rng.choice(sorted(enrolled))]), 200
+        if flow == 'enroll_course':
+            candidates = [course_id for course_id in state['courses'] if course_id not in enrolled]
+            if not candidates:
+                return self.next_request(flow)
+            course_id = self.rng.choice(candidates)
+            enrolled.add(course_id)
+            return user_id, 'post', reverse('enroll_course', args=[course_id]), 302
+        course_id = self.rng.choice(sorted(enrolled))
+        if flow == 'play_video':
+            return user_id, 'get', reverse('play_video', args=[self.rng.choice(state['videos'][course_id])]), 302
+        pending = [video_id for video_id in state['videos'][course_id] if (user_id, video_id) not in state['completed']]
+        video_id = self.rng.choice(pending or state['videos'][course_id])
+        state['completed'].add((user_id, video_id))
+        return user_id, 'post', reverse('mark_video_completed', args=[video_id]), 200
+
+    def run_flow(self, flow, count, warmup):
+        latencies = []
+        queries = []
+        session_queries = []
+        errors = 0
+        for _ in range(warmup):
+            user_id, method, url, _ = self.next_request(flow)
+            getattr(self.client_for(user_id), method)(url)
+
+        elapsed = 0.0
+        for _ in range(count):
+            user_id, method, url, expected = self.next_request(flow)
+            client = self.client_for(user_id)  # Logged in outside the timed section
+            metrics = RequestMetrics(flow)
+            with connection.execute_wrapper(QueryRecorder(metrics)):
+                started = time.perf_counter()
+                response = getattr(client, method)(url)
+                took = time.perf_counter() - started
+            elapsed += took
+            latencies.append(took * 1000)
+            queries.append(metrics.sql_count)
+            session_queries.append(sum(
+                count for sql, count in metrics.fingerprints.items() if 'django_session' in sql
+            ))
+            if response.status_code != expected:
+                errors += 1
+
+        return {
+            'requests': count,
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'max_ms': round(max(latencies, default=0), 2),
+            'avg_queries': round(sum(queries) / count, 1) if count else 0,
+            'max_queries': max(queries, default=0),
+            'avg_session_queries': round(sum(session_queries) / count, 2) if count else 0,
+            'throughput_rps': round(count / elapsed, 1) if elapsed else 0,
+        }
+
+    # ---- Reminder jobs -------------------------------------------------
+
+    def run_job(self, name, job, students):
+        metrics = RequestMetrics(name)
+        mail.outbox = []
+        # The job context stores its figures on exit; keep those writes out of the measurement
+        with notification_metrics.job(f'benchmark_{name}'), contextlib.redirect_stdout(io.StringIO()):
+            with connection.execute_wrapper(QueryRecorder(metrics)):
+                started = time.perf_counter()
+                job(students)
+                elapsed = time.perf_counter() - started
+        sent = len(mail.outbox)
+        breakdown = notification_metrics.session_summary()[f'benchmark_{name}']
+        return {
+            'students': students.count(),
+            'emails': sent,
+            'seconds': round(elapsed, 3),
+            'queries': metrics.sql_count,
+            'emails_per_second': round(sent / elapsed, 1) if elapsed else 0,
+            'render_seconds': breakdown['render_seconds'],
+            'smtp_seconds': breakdown['smtp_seconds'],
+            'db_seconds': breakdown['db_seconds'],
+            'bound_by': breakdown['bound_by'],
+        }
+
+    # ---- Output --------------------------------------------------------
+
+    def print_report(self, report, baseline=None):
+        def delta(section, name, field):
+            if not baseline:
+                return ''
+            before = baseline.get(section, {}).get(name, {}).get(field)
+            after = report[section][name][field]
+            if not before:
+                return ''
+            return f' ({(after - before) / before * 100:+.0f}%)'
+
+        self.stdout.write(self.style.SUCCESS(
+            f"📈 StudyTrack benchmark on {report['database']['vendor']} (seed {report['options']['seed']})"
+        ))
+        self.stdout.write(f"  Dataset: {report['dataset']}")
+        self.stdout.write(f"  Sessions: {report.get('session_engine', '-')}")
+        self.stdout.write(
+            f"  {'Flow':<22}{'p50 ms':>14}{'p95 ms':>14}{'queries':>14}{'session q':>14}{'req/s':>14}{'errors':>8}"
+        )
+        for name, row in report['flows'].items():
+            self.stdout.write(
+                f"  {name:<22}"
+                f"{str(row['p50_ms']) + delta('flows', name, 'p50_ms'):>14}"
+                f"{str(row['p95_ms']) + delta('flows', name, 'p95_ms'):>14}"
+                f"{str(row['avg_queries']) + delta('flows', name, 'avg_queries'):>14}"
+                f"{str(row.get('avg_session_queries', '-')) + delta('flows', name, 'avg_session_queries'):>14}"
+                f"{str(row['throughput_rps']) + delta('flows', name, 'throughput_rps'):>14}"
+                f"{row['errors']:>8}"
+            )
+        if report['jobs']:
+            self.stdout.write(f"  {'Job':<30}{'seconds':>14}{'queries':>14}{'emails':>8}{'emails/s':>14}  bound by")
+            for name, row in report['jobs'].items():
+                self.stdout.write(
+                    f"  {name:<30}"
+                    f"{str(row['seconds']) + delta('jobs', name, 'seconds'):>14}"
+                    f"{str(row['queries']) + delta('jobs', name, 'queries'):>14}"
+                    f"{row['emails']:>8}"
+                    f"{str(row['emails_per_second']) + delta('jobs', name, 'emails_per_second'):>14}"
+                    f"  {row.get('bound_by') or '-'}"
+                )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from studenttracker.services.recommendation_service import CourseRecommender
+
+
+class Command(BaseCommand):
+    help = 'Rebuild course-to-course recommendations from enrollment and video progress co-occurrence'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, help="Neighbours kept per course (default RECOMMENDATION_TOP_K)")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🧭 Building course recommendations...'))
+        courses, rows, seconds = CourseRecommender(top_k=options['top_k'], log=self.stdout.write).rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✅ Stored {rows} neighbours for {courses} courses in {seconds:.1f}s'))
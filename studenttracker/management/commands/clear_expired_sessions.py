@@ -0,0 +1,54 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions from the session table in small batches (db and cached_db session engines)'
+
+    def add_arguments(self, parser):
+        retention = settings.STUDYTRACK_SETTINGS.get('RETENTION', {})
+        parser.add_argument(
+            '--batch-size', type=int, default=retention.get('BATCH_SIZE', 1000),
+            help="Sessions deleted per statement (default RETENTION['BATCH_SIZE'])",
+        )
+        parser.add_argument(
+            '--pause', type=float, default=retention.get('BATCH_PAUSE_SECONDS', 0.05),
+            help='Seconds to wait between batches so logins are not blocked',
+        )
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches (default: until done)')
+
+    def handle(self, *args, **options):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not hasattr(store, 'get_model_class'):
+            # Signed cookies (and the cache-only engine) expire on their own
+            self.stdout.write(self.style.WARNING(f'⚠️ {settings.SESSION_ENGINE} keeps no session table, nothing to clear'))
+            return
+        Session = store.get_model_class()
+        now = timezone.now()
+
+        self.stdout.write(self.style.SUCCESS('🧹 Clearing expired sessions...'))
+        started = time.perf_counter()
+        deleted = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            # Select the keys first: a bounded DELETE ... LIMIT is not portable, and this
+            # keeps each statement's lock to one batch instead of the whole expired range
+            keys = list(
+                Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:options['batch_size']]
+            )
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            batches += 1
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        seconds = time.perf_counter() - started
+        remaining = Session.objects.filter(expire_date__lt=now).exists()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Deleted {deleted} expired sessions in {batches} batches ({seconds:.1f}s)'
+            + (', more remain' if remaining else '')
+        ))
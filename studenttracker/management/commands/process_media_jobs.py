@@ -0,0 +1,63 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from studenttracker.models import Course, Video
+from studenttracker.services.media_processing import MediaProcessingQueue
+
+
+class Command(BaseCommand):
+    help = 'Run the media worker: probe video durations and build thumbnail variants from the MediaJob queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--workers', type=int, help="Worker processes (default STUDYTRACK_SETTINGS['MEDIA_WORKERS'])")
+        parser.add_argument('--backfill', action='store_true',
+                            help='Queue jobs for existing courses and videos that have never been processed')
+
+    def backfill(self):
+        queued = 0
+        for course in Course.objects.exclude(thumbnail='').exclude(thumbnail__isnull=True):
+            if course.thumbnail_variants.get('source') != course.thumbnail.name:
+                MediaProcessingQueue.enqueue('course_thumbnail', course.id)
+                queued += 1
+        videos = Video.objects.exclude(thumbnail='').exclude(thumbnail__isnull=True)
+        for video in videos:
+            if video.thumbnail_variants.get('source') != video.thumbnail.name:
+                MediaProcessingQueue.enqueue('video_thumbnail', video.id)
+                queued += 1
+        for video_id in Video.objects.exclude(video_file='').exclude(video_file__isnull=True).filter(
+            duration=0
+        ).values_list('id', flat=True):
+            MediaProcessingQueue.enqueue('video_duration', video_id)
+            queued += 1
+        self.stdout.write(f'📥 Backfill queued {queued} jobs')
+
+    def handle(self, *args, **options):
+        queue = MediaProcessingQueue(workers=options['workers'], log=self.stdout.write)
+        poll_seconds = settings.STUDYTRACK_SETTINGS.get('MEDIA_POLL_SECONDS', 10)
+
+        # Jobs left running by a worker that died are picked up again
+        requeued = queue.requeue_stale(timezone.now() - timedelta(hours=1))
+        if requeued:
+            self.stdout.write(f'♻️ Requeued {requeued} stale jobs')
+        if options['backfill']:
+            self.backfill()
+
+        self.stdout.write(self.style.SUCCESS(f'🎬 Media worker started with {queue.workers} processes'))
+        total_done = total_failed = 0
+        try:
+            while True:
+                done, failed = queue.run_batch()
+                total_done += done
+                total_failed += failed
+                if not done and not failed:
+                    if options['once']:
+                        break
+                    time.sleep(poll_seconds)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('🛑 Media worker stopped by user'))
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Media jobs processed: {total_done} done, {total_failed} failed'))
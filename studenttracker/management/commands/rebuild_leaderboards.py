@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from studenttracker.services.leaderboard_service import LeaderboardService
+
+
+class Command(BaseCommand):
+    help = 'Recompute every leaderboard and its ranks from scratch'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🏆 Rebuilding leaderboards...'))
+        boards, rows, seconds = LeaderboardService().rebuild(log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'✅ Ranked {rows} entries on {boards} boards in {seconds:.1f}s'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from studenttracker.services.search_service import SearchIndex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the course and video search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🔎 Rebuilding search index...'))
+        SearchIndex().rebuild(batch_size=options['batch_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS('✅ Search index rebuilt'))
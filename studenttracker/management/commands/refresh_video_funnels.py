@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from studenttracker.services.funnel_service import VideoFunnelService
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-video completion funnels for courses whose progress changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Refresh every course, not only stale ones')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('📉 Refreshing video funnels...'))
+        courses, videos, seconds = VideoFunnelService().refresh_stale(everything=options['all'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'✅ Updated {videos} videos in {courses} courses in {seconds:.1f}s'))
@@ -1,90 +1,307 @@
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from studenttracker.services.notification_service import StudyHabitNotificationService
 from studenttracker.services.course_notification_service import CourseNotificationService
+from studenttracker.services.digest_service import DigestNotificationService
+from studenttracker.services.funnel_service import VideoFunnelService
+from studenttracker.services.leaderboard_service import LeaderboardService
+from studenttracker.services.notification_estimator import NotificationEstimator
+from studenttracker.services.notification_metrics import notification_metrics
+from studenttracker.services.profiling import ProfileSession
+from studenttracker.services.recommendation_service import CourseRecommender
+from studenttracker.services.video_upload_service import ChunkedVideoUploadService
+from studenttracker.services.notification_scheduler import (
+    NotificationScheduler, local_slot_audience, refresh_utc_offsets,
+)
 from studenttracker.models import User
-import schedule
+from datetime import datetime
+from functools import partial
 import time
 
 class Command(BaseCommand):
     help = 'Send scheduled notifications for course completion, quizzes, and study habits'
     
+    # NOTIFICATION_SCHEDULE key -> (command method, service it runs on, label, User.digest_frequency audience)
+    JOBS = {
+        # Course completion notifications (3 times daily)
+        'course_morning': ('send_course_completion_reminders', 'course', '📚 Course Reminder (Morning)', ['individual']),
+        'course_afternoon': ('send_course_completion_reminders', 'course', '📚 Course Reminder (Afternoon)', ['individual']),
+        'course_evening': ('send_course_completion_reminders', 'course', '📚 Course Reminder (Evening)', ['individual']),
+        # Quiz reminders (daily)
+        'quiz': ('send_quiz_reminders', 'course', '📝 Quiz Reminders', ['individual']),
+        # AI-powered study habit notifications (4 times daily); the key is the REMINDER_SLOTS slot,
+        # and slots configured for the same time are sent in one pass
+        'morning': ('send_reminder_slots', 'habit', '🌅 Morning Motivation', ['individual']),
+        'afternoon': ('send_reminder_slots', 'habit', '☀️ Afternoon Check-in', ['individual']),
+        'evening': ('send_reminder_slots', 'habit', '🌙 Evening Review', ['individual']),
+        'night': ('send_reminder_slots', 'habit', '🌌 Night Motivation', ['individual']),
+        # Digests replace all of the above for students who opted in
+        'digest_morning': ('send_morning_digest', 'digest', '📬 Morning Digest', ['daily', 'twice_daily']),
+        'digest_evening': ('send_evening_digest', 'digest', '📬 Evening Digest', ['twice_daily']),
+    }
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--test',
+            action='store_true',
+            help='Development mode: send every notification type now and every 5 minutes',
+        )
+        parser.add_argument(
+            '--profile',
+            action='store_true',
+            help='Store a cProfile trace with SQL breakdown of every job run under MEDIA_ROOT/profiles',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Send nothing: print each scheduled slot with its daily audience and busiest tick, then exit',
+        )
+        parser.add_argument(
+            '--estimate',
+            action='store_true',
+            help='With --dry-run, render a sample of each slot and project messages, render, SMTP and DB time',
+        )
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=20,
+            help='Students per slot rendered by --estimate (default 20)',
+        )
+        parser.add_argument(
+            '--slot',
+            action='append',
+            dest='slots',
+            metavar='KEY',
+            help='Only this job key (repeatable); may name jobs that are not in NOTIFICATION_SCHEDULE',
+        )
+    
     def handle(self, *args, **options):
+        if options['estimate'] and not options['dry_run']:
+            raise CommandError('--estimate only works together with --dry-run')
+        if options['dry_run']:
+            self.run_dry_run(options)
+            return
+        
         self.stdout.write(self.style.SUCCESS('🚀 Starting Comprehensive Notification Scheduler...'))
         
         notification_service = StudyHabitNotificationService()
         course_service = CourseNotificationService()
+        services = {
+            'habit': notification_service,
+            'course': course_service,
+            'digest': DigestNotificationService(),
+        }
         
-        # ============================================================================
-        # COURSE COMPLETION NOTIFICATIONS (3 times daily - Morning, Afternoon, Evening)
-        # ============================================================================
-        schedule.every().day.at("08:00").do(self.send_course_completion_reminders, course_service)  # Morning
-        schedule.every().day.at("14:00").do(self.send_course_completion_reminders, course_service)  # Afternoon
-        schedule.every().day.at("19:00").do(self.send_course_completion_reminders, course_service)  # Evening
-        
-        # ============================================================================
-        # QUIZ REMINDERS (Daily)
-        # ============================================================================
-        schedule.every().day.at("11:00").do(self.send_quiz_reminders, course_service)  # Late morning
-        
-        # ============================================================================
-        # AI-POWERED STUDY HABIT NOTIFICATIONS (4 times daily)
-        # ============================================================================
-        schedule.every().day.at("07:00").do(self.send_morning_motivation, notification_service)     # Early morning
-        schedule.every().day.at("13:00").do(self.send_afternoon_checkin, notification_service)      # Afternoon
-        schedule.every().day.at("18:00").do(self.send_evening_review, notification_service)         # Evening
-        schedule.every().day.at("22:00").do(self.send_night_motivation, notification_service)       # Night
+        self.profile = options['profile']
+        if options['test']:
+            self.run_test_mode(notification_service, course_service)
+            return
         
-        # ============================================================================
-        # TEST MODE (For development - runs all notification types)
-        # ============================================================================
-        schedule.every(5).minutes.do(self.send_test_all_notifications, notification_service, course_service)
-        
-        self.stdout.write(self.style.SUCCESS('✅ Comprehensive notification scheduler started successfully!'))
-        self.stdout.write('')
-        self.stdout.write('📚 COURSE COMPLETION REMINDERS (3x Daily):')
-        self.stdout.write('  - 🌅 Morning: 8:00 AM')
-        self.stdout.write('  - ☀️ Afternoon: 2:00 PM') 
-        self.stdout.write('  - 🌙 Evening: 7:00 PM')
-        self.stdout.write('')
-        self.stdout.write('📝 QUIZ REMINDERS:')
-        self.stdout.write('  - 🧠 Daily: 11:00 AM')
-        self.stdout.write('')
-        self.stdout.write('🤖 AI STUDY COACH (4x Daily):')
-        self.stdout.write('  - 🌅 Morning Motivation: 7:00 AM')
-        self.stdout.write('  - ☀️ Afternoon Check-in: 1:00 PM')
-        self.stdout.write('  - 🌙 Evening Review: 6:00 PM')
-        self.stdout.write('  - 🌌 Night Motivation: 10:00 PM')
+        # Slot times are in each student's local time. Every tick selects the
+        # UTC-offset bucket whose clock just reached the slot, which spreads
+        # each slot across the day instead of one burst at server time.
+        schedule = settings.STUDYTRACK_SETTINGS.get('NOTIFICATION_SCHEDULE', {})
+        tick_minutes = settings.STUDYTRACK_SETTINGS.get('NOTIFICATION_TICK_MINUTES', 15)
+        jobs = {
+            'refresh_timezones': (60, lambda slot: refresh_utc_offsets() >= 0),
+            'course_recommendations': (
+                settings.STUDYTRACK_SETTINGS.get('RECOMMENDATION_REFRESH_AT', '03:00'),
+                lambda slot: CourseRecommender(log=self.stdout.write).rebuild() is not None,
+            ),
+            'leaderboards': (
+                settings.STUDYTRACK_SETTINGS.get('LEADERBOARD_REBUILD_AT', '03:30'),
+                lambda slot: LeaderboardService().rebuild(log=self.stdout.write) is not None,
+            ),
+            'leaderboard_updates': (
+                settings.STUDYTRACK_SETTINGS.get('LEADERBOARD_UPDATE_MINUTES', 5),
+                lambda slot: LeaderboardService().apply_pending(log=self.stdout.write) >= 0,
+            ),
+            'video_funnels': (
+                settings.STUDYTRACK_SETTINGS.get('FUNNEL_REFRESH_MINUTES', 30),
+                lambda slot: VideoFunnelService().refresh_stale(log=self.stdout.write) is not None,
+            ),
+            'expire_video_uploads': (
+                60,
+                lambda slot: ChunkedVideoUploadService().expire_abandoned(log=self.stdout.write) >= 0,
+            ),
+        }
         self.stdout.write('')
-        self.stdout.write('🧪 TEST MODE:')
-        self.stdout.write('  - All notifications: Every 5 minutes')
+        self.stdout.write(f'🗓️ SCHEDULE (student local time, checked every {tick_minutes} minutes):')
+        reminder_groups = {}  # (time, audience) -> reminder slots sharing one pass over the users
+        for key, at in sorted(schedule.items(), key=lambda item: item[1]):
+            if key not in self.JOBS:
+                self.stdout.write(self.style.WARNING(f'  - Unknown schedule key "{key}" ignored'))
+                continue
+            method_name, service_key, label, frequencies = self.JOBS[key]
+            self.stdout.write(f'  - {label}: {at}')
+            if method_name == 'send_reminder_slots':
+                reminder_groups.setdefault((at, tuple(frequencies)), []).append(key)
+                continue
+            method = partial(getattr(self, method_name), services[service_key])
+            jobs[key] = (tick_minutes, partial(self.run_local_slot, at, tick_minutes, frequencies, method))
+        for (at, frequencies), slot_keys in reminder_groups.items():
+            method = partial(self.send_reminder_slots, notification_service, slot_keys)
+            jobs['+'.join(slot_keys)] = (tick_minutes, partial(self.run_local_slot, at, tick_minutes, list(frequencies), method))
         self.stdout.write('')
         
+        if self.profile:
+            self.stdout.write(self.style.WARNING('🔬 Profiling every job run (see Profile runs in the admin)'))
+            jobs = {name: (at, self.profiled(name, func)) for name, (at, func) in jobs.items()}
+        scheduler = NotificationScheduler(jobs, log=self.stdout.write)
         self.stdout.write(self.style.WARNING('🔄 Scheduler is running. Press Ctrl+C to stop.'))
         
-        # Run initial test
-        self.send_test_all_notifications(notification_service, course_service)
-        
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('🛑 Scheduler stopped by user'))
+        self.print_metrics_summary()
+    
+    def run_local_slot(self, at, tick_minutes, frequencies, method, slot):
+        """Run `method` for the opted-in users whose local clock reached `at` in this tick"""
+        local_time = datetime.strptime(at, '%H:%M').time()
+        users = User.objects.filter(
+            local_slot_audience(local_time, slot, tick_minutes),
+            digest_frequency__in=frequencies,
+            is_active=True,
+        ).exclude(email='').order_by('id')
+        # Keyset batches: the services load the users they are given, so never hand them the whole slot
+        chunk_size = settings.STUDYTRACK_SETTINGS.get('REMINDER_CHUNK_SIZE', 500)
+        succeeded = True
+        last_id = 0
+        while True:
+            ids = list(users.filter(id__gt=last_id).values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return succeeded
+            if method(users=User.objects.filter(id__in=ids)) is False:
+                succeeded = False
+            last_id = ids[-1]
+    
+    def run_test_mode(self, notification_service, course_service):
+        """Send all notification types every 5 minutes (for development)"""
+        self.stdout.write(self.style.WARNING('🧪 TEST MODE: all notifications every 5 minutes'))
         while True:
             try:
-                schedule.run_pending()
-                time.sleep(60)
+                send_all = partial(self.send_test_all_notifications, notification_service, course_service)
+                if self.profile:
+                    send_all = self.profiled('test_mode', send_all)
+                with notification_metrics.job('test_mode'):
+                    send_all()
+                time.sleep(300)
             except KeyboardInterrupt:
                 self.stdout.write(self.style.WARNING('🛑 Scheduler stopped by user'))
                 break
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'❌ Scheduler error: {e}'))
-                time.sleep(60)  # Wait a minute before retrying
+        self.print_metrics_summary()
+    
+    def run_dry_run(self, options):
+        """Report what the schedule would send, without sending anything or keeping any writes"""
+        schedule = settings.STUDYTRACK_SETTINGS.get('NOTIFICATION_SCHEDULE', {})
+        tick_minutes = settings.STUDYTRACK_SETTINGS.get('NOTIFICATION_TICK_MINUTES', 15)
+        keys = options['slots'] or [key for key in schedule if key in self.JOBS]
+        unknown = [key for key in keys if key not in self.JOBS]
+        if unknown:
+            raise CommandError(f'Unknown job key(s): {", ".join(unknown)} (choose from {", ".join(self.JOBS)})')
+        
+        estimate = options['estimate']
+        estimator = NotificationEstimator(tick_minutes, options['sample'] if estimate else 0)
+        self.stdout.write(self.style.SUCCESS(
+            f"🧮 DRY RUN{' + ESTIMATE' if estimate else ''}: nothing is sent, every write is rolled back"
+        ))
+        rows = []
+        for key in sorted(keys, key=lambda key: schedule.get(key, '')):
+            method_name, service_key, label, frequencies = self.JOBS[key]
+            # Off-schedule keys are reported at midnight, only the busiest tick depends on the time
+            at = schedule.get(key, '00:00')
+            rows.append(estimator.estimate(key, at, frequencies, self.estimate_runner(key)))
+            self.stdout.write(f"  - {label}: {rows[-1]['audience']} students")
+        
+        self.stdout.write('')
+        if not estimate:
+            self.stdout.write(f"  {'Job':<20}{'at':>7}{'audience':>10}{'peak tick':>11}")
+            for row in rows:
+                self.stdout.write(f"  {row['slot']:<20}{row['at']:>7}{row['audience']:>10}{row['peak_per_tick']:>11}")
+            return
+        
+        def seconds(value):
+            return '?' if value is None else f'{value:.2f}'
+        
+        self.stdout.write(
+            f"  {'Job':<20}{'at':>7}{'audience':>10}{'peak tick':>11}{'sample':>8}{'messages':>10}"
+            f"{'ms/msg':>8}{'render s':>10}{'smtp s':>10}{'db s':>10}{'queries':>9}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"  {row['slot']:<20}{row['at']:>7}{row['audience']:>10}{row['peak_per_tick']:>11}"
+                f"{row['sample']:>8}{row['messages']:>10}{row['render_ms_per_message']:>8}"
+                f"{seconds(row['render_seconds']):>10}{seconds(row['smtp_seconds']):>10}"
+                f"{seconds(row['db_seconds']):>10}{row['sample_queries']:>9}"
+            )
+        totals = estimator.totals(rows)
+        self.stdout.write(
+            f"  {'TOTAL / day':<56}{totals['messages']:>10}{'':>8}{seconds(totals['render_seconds']):>10}"
+            f"{seconds(totals['smtp_seconds']):>10}{seconds(totals['db_seconds']):>10}"
+        )
+        self.stdout.write('')
+        self.stdout.write('  messages, render s and db s are scaled from the sample to the whole audience;')
+        self.stdout.write('  queries is what the sample run issued (compare it with the sample size to spot N+1s).')
+        if totals['smtp_seconds'] is None:
+            self.stdout.write(self.style.WARNING(
+                '  smtp s needs delivery history (Notification job stats); run the scheduler once to measure it.'
+            ))
+        else:
+            self.stdout.write('  smtp s uses the per-message SMTP time measured by earlier runs.')
+    
+    def estimate_runner(self, key):
+        """callable(users) running job `key` exactly as the scheduler would, minus the console output"""
+        method_name, service_key, label, frequencies = self.JOBS[key]
+        if service_key == 'habit':
+            return lambda users: StudyHabitNotificationService().send_reminder_slots([key], users=users)
+        if service_key == 'digest':
+            digest_label = 'Morning' if method_name == 'send_morning_digest' else 'Evening'
+            return lambda users: DigestNotificationService().send_digests(users, label=digest_label)
+        return lambda users: getattr(CourseNotificationService(), method_name)(users=users)
+    
+    def profiled(self, name, func):
+        """Wrap a scheduler job so every run is stored as a ProfileRun"""
+        def run(*args):
+            session = ProfileSession('command', f'send_study_notifications {name}')
+            with session:
+                result = func(*args)
+            if session.run is not None:
+                self.stdout.write(
+                    f'🔬 Profiled {name}: {session.run.total_ms:.0f} ms, {session.run.sql_count} queries '
+                    f'-> {session.run.report.path}'
+                )
+            return result
+        return run
+    
+    def print_metrics_summary(self):
+        """Delivery figures for every job this process ran, and what each run spent its time on"""
+        summary = notification_metrics.session_summary()
+        if not summary:
+            return
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('📊 NOTIFICATION METRICS (this run):'))
+        self.stdout.write(
+            f"  {'Job':<24}{'runs':>6}{'rendered':>10}{'sent':>8}{'failed':>8}{'retried':>9}"
+            f"{'total s':>10}{'render s':>10}{'smtp s':>10}{'db s':>10}  bound by"
+        )
+        for job, row in summary.items():
+            self.stdout.write(
+                f"  {job:<24}{row['runs']:>6}{row['rendered']:>10}{row['sent']:>8}{row['failed']:>8}{row['retried']:>9}"
+                f"{row['job_seconds']:>10.2f}{row['render_seconds']:>10.2f}{row['smtp_seconds']:>10.2f}"
+                f"{row['db_seconds']:>10.2f}  {row['bound_by'] or '-'}"
+            )
     
     # ============================================================================
     # COURSE COMPLETION NOTIFICATION METHODS
     # ============================================================================
     
-    def send_course_completion_reminders(self, service):
+    def send_course_completion_reminders(self, service, users=None):
         """Send course completion reminders"""
         try:
             # Use the existing method from course_notification_service
-            result = service.send_course_completion_reminders()
+            result = service.send_course_completion_reminders(users=users)
             self.stdout.write(self.style.SUCCESS('📚 Sent course completion reminders'))
             return result
             
@@ -92,12 +309,11 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'❌ Error in course completion reminders: {e}'))
             return False
     
-    def send_quiz_reminders(self, service):
+    def send_quiz_reminders(self, service, users=None):
         """Send quiz attempt reminders"""
         try:
-            # Use the existing method from course_notification_service
-            result = service.send_course_completion_reminders()  # Fallback to course reminders
-            self.stdout.write(self.style.SUCCESS('📝 Sent quiz reminders'))
+            result = service.send_quiz_reminders(users=users)
+            self.stdout.write(self.style.SUCCESS(f'📝 Sent quiz reminders to {result} students'))
             return result
             
         except Exception as e:
@@ -108,44 +324,39 @@ class Command(BaseCommand):
     # AI STUDY COACH NOTIFICATION METHODS
     # ============================================================================
     
-    def send_morning_motivation(self, service):
-        """Send morning study motivation"""
+    def send_reminder_slots(self, service, slot_keys, users=None):
+        """Send study habit reminder slots that fire together in one pass"""
         try:
-            result = service.send_morning_reminder()
-            self.stdout.write(self.style.SUCCESS('🌅 Sent morning motivation'))
-            return result
+            sent = service.send_reminder_slots(slot_keys, users=users)
+            for key in slot_keys:
+                self.stdout.write(self.style.SUCCESS(f'{self.JOBS[key][2]}: sent {sent[key]}'))
+            return sum(sent.values()) > 0
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'❌ Error in morning motivation: {e}'))
+            self.stdout.write(self.style.ERROR(f'❌ Error in {", ".join(slot_keys)} reminders: {e}'))
             return False
     
-    def send_afternoon_checkin(self, service):
-        """Send afternoon progress check"""
-        try:
-            result = service.send_afternoon_checkin()
-            self.stdout.write(self.style.SUCCESS('☀️ Sent afternoon check-ins'))
-            return result
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'❌ Error in afternoon check-in: {e}'))
-            return False
+    # ============================================================================
+    # DIGEST METHODS
+    # ============================================================================
     
-    def send_evening_review(self, service):
-        """Send evening study review"""
+    def send_morning_digest(self, service, users=None):
+        """Send the combined morning digest"""
         try:
-            result = service.send_evening_review()
-            self.stdout.write(self.style.SUCCESS('🌙 Sent evening reviews'))
+            result = service.send_digests(users, label='Morning')
+            self.stdout.write(self.style.SUCCESS(f'📬 Sent {result} morning digests'))
             return result
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'❌ Error in evening review: {e}'))
+            self.stdout.write(self.style.ERROR(f'❌ Error in morning digest: {e}'))
             return False
     
-    def send_night_motivation(self, service):
-        """Send night motivation"""
+    def send_evening_digest(self, service, users=None):
+        """Send the combined evening digest"""
         try:
-            result = service.send_night_motivation()
-            self.stdout.write(self.style.SUCCESS('🌌 Sent night motivations'))
+            result = service.send_digests(users, label='Evening')
+            self.stdout.write(self.style.SUCCESS(f'📬 Sent {result} evening digests'))
             return result
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'❌ Error in night motivation: {e}'))
+            self.stdout.write(self.style.ERROR(f'❌ Error in evening digest: {e}'))
             return False
     
     # ============================================================================
@@ -161,11 +372,8 @@ class Command(BaseCommand):
             course_service.send_course_completion_reminders()
             self.stdout.write(self.style.WARNING('  📚 Test course reminders completed'))
             
-            # Test AI study coach notifications
-            notification_service.send_morning_reminder()
-            notification_service.send_afternoon_checkin() 
-            notification_service.send_evening_review()
-            notification_service.send_night_motivation()
+            # Test AI study coach notifications: all four slots in one pass over the users
+            notification_service.send_reminder_slots(['morning', 'afternoon', 'evening', 'night'])
             
             self.stdout.write(self.style.WARNING('  🤖 Test AI notifications completed'))
             self.stdout.write(self.style.WARNING('🧪 All test notifications completed successfully'))
@@ -0,0 +1,217 @@
+import contextvars
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+from django.urls import resolve, Resolver404
+
+from .services.request_metrics import metrics_store
+
+logger = logging.getLogger('studytrack.requests')
+
+# Metrics of the request being handled on this thread/task, if any
+current_metrics = contextvars.ContextVar('studytrack_request_metrics', default=None)
+
+# Literals collapse to "?" so queries differing only in ids share a fingerprint
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+
+def fingerprint(sql):
+    return _IN_LISTS.sub('(?)', _LITERALS.sub('?', sql))
+
+
+class RequestMetrics:
+    def __init__(self, view):
+        self.view = view
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.fingerprints = Counter()
+        self.fingerprint_seconds = Counter()
+
+    def as_dict(self, status):
+        return {
+            'view': self.view,
+            'status': status,
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 1),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_seconds * 1000, 1),
+            'template_ms': round(self.template_seconds * 1000, 1),
+        }
+
+
+class QueryRecorder:
+    """connection.execute_wrapper hook counting and timing every query"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            took = time.perf_counter() - started
+            shape = fingerprint(sql)
+            self.metrics.sql_seconds += took
+            self.metrics.sql_count += 1
+            self.metrics.fingerprints[shape] += 1
+            self.metrics.fingerprint_seconds[shape] += took
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:  # Count nested render_to_string calls once
+                metrics.template_seconds += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The standard Django template backend, with render time added to the request metrics"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class RequestMetricsMiddleware:
+    """Record SQL count/time, template time and latency per request, tagged by URL name.
+
+    Every request is logged as one JSON line on the 'studytrack.requests'
+    logger; requests over the thresholds in STUDYTRACK_SETTINGS['REQUEST_METRICS']
+    or repeating the same query shape (N+1) are logged as warnings. Totals per
+    view are kept by RequestMetricsStore for the admin analytics page.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = settings.STUDYTRACK_SETTINGS.get('REQUEST_METRICS', {})
+        self.enabled = options.get('ENABLED', True)
+        self.slow_ms = options.get('SLOW_REQUEST_MS', 500)
+        self.max_queries = options.get('MAX_QUERIES', 50)
+        self.repeat_threshold = options.get('N_PLUS_ONE_THRESHOLD', 5)
+        self.ignore_prefixes = tuple(options.get('IGNORE_PATHS', ['/static/', '/media/']))
+
+    def _view_name(self, request):
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return 'unresolved'
+        return match.view_name or match._func_path
+
+    def __call__(self, request):
+        if not self.enabled or request.path_info.startswith(self.ignore_prefixes):
+            return self.get_response(request)
+
+        metrics = RequestMetrics(self._view_name(request))
+        token = current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                recorder = QueryRecorder(metrics)
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+
+        self.report(request, metrics, response.status_code)
+        return response
+
+    def report(self, request, metrics, status):
+        data = metrics.as_dict(status)
+        data['method'] = request.method
+        data['path'] = request.path
+
+        flags = []
+        if data['total_ms'] >= self.slow_ms:
+            flags.append('slow')
+        if data['sql_count'] >= self.max_queries:
+            flags.append('too_many_queries')
+        repeated = [(sql, count) for sql, count in metrics.fingerprints.most_common(3) if count >= self.repeat_threshold]
+        if repeated:
+            flags.append('n_plus_one')
+            data['repeated_queries'] = [{'sql': sql[:300], 'count': count} for sql, count in repeated]
+
+        data['flags'] = flags
+        logger.log(logging.WARNING if flags else logging.INFO, json.dumps(data))
+        metrics_store.record(data, flags)
+
+
+class ProfilingMiddleware:
+    """Profile a request on demand: admins add ?profile=1 or an `X-Profile: 1` header.
+
+    Must come after AccessContextMiddleware. The stored ProfileRun id is
+    returned in the X-Profile-Id response header; runs are listed in the
+    Django admin under "Profile runs".
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = settings.STUDYTRACK_SETTINGS.get('PROFILING', {})
+        self.enabled = options.get('ENABLED', True)
+        self.query_flag = options.get('QUERY_FLAG', 'profile')
+        self.header = options.get('HEADER', 'X-Profile')
+
+    def wants_profile(self, request):
+        if not self.enabled:
+            return False
+        flag = request.GET.get(self.query_flag) or request.headers.get(self.header)
+        if flag in (None, '', '0', 'false'):
+            return False
+        # Only now look at the user: loading it reads the session and adds "Vary: Cookie"
+        access = getattr(request, 'access', None)
+        return access is not None and access.is_admin
+
+    def __call__(self, request):
+        if not self.wants_profile(request):
+            return self.get_response(request)
+
+        from .services.profiling import ProfileSession
+        session = ProfileSession('request', f"{request.method} {request.get_full_path()}", user=request.user)
+        with session:
+            response = self.get_response(request)
+        if session.run is not None:
+            response['X-Profile-Id'] = str(session.run.pk)
+        return response
+
+
+class AccessContextMiddleware:
+    """Attach `request.access`, the user's role and enrolled course ids for access checks.
+
+    Must come after AuthenticationMiddleware. The enrollment set is loaded
+    lazily, once per request, from the cache (kept fresh by the Enrollment
+    signals) or one query.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .services.access_context import AccessContext
+        request.access = AccessContext(request.user)
+        return self.get_response(request)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studenttracker', '0002_scheduler'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='timezone',
+            field=models.CharField(default='UTC', help_text='IANA time zone, e.g. Asia/Kolkata', max_length=63),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='utc_offset_minutes',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studenttracker', '0003_user_timezone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='digest_frequency',
+            field=models.CharField(choices=[('individual', 'Every reminder as its own email'), ('twice_daily', 'Morning and evening digest'), ('daily', 'One daily digest'), ('off', 'No reminder emails')], default='individual', max_length=20),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studenttracker', '0004_user_digest_frequency'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='habitnotification',
+            index=models.Index(fields=['student', 'is_read', '-id'], name='notif_student_read_id_idx'),
+        ),
+    ]
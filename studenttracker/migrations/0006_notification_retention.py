@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studenttracker', '0005_notification_feed_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='habitnotification',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='habitnotification',
+            index=models.Index(fields=['created_at'], name='notif_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studenttracker', '0008_media_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=40)),
+                ('object_type', models.CharField(choices=[('course', 'Course'), ('video', 'Video')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('course_id', models.BigIntegerField()),
+                ('weight', models.IntegerField(default=1)),
+                ('is_public', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['object_type', 'token', 'is_public', 'object_id', 'weight'], name='search_token_lookup_idx'), models.Index(fields=['object_type', 'object_id'], name='search_token_object_idx'), models.Index(fields=['course_id'], name='search_token_course_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studenttracker', '0010_course_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('study_hours', 'Most Study Hours'), ('habit_streak', 'Longest Habit Streak'), ('courses_completed', 'Most Courses Completed'), ('course_watch_hours', 'Most Hours Watched in Course')], max_length=30)),
+                ('course_id', models.BigIntegerField(default=0)),
+                ('value', models.FloatField()),
+                ('rank', models.IntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['metric', 'course_id', 'rank', 'user'], name='leaderboard_page_idx'), models.Index(fields=['metric', 'course_id', 'value'], name='leaderboard_value_idx')],
+                'unique_together': {('metric', 'course_id', 'user')},
+            },
+        ),
+    ]
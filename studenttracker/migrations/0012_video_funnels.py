@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studenttracker', '0011_leaderboards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoFunnel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enrolled', models.IntegerField(default=0)),
+                ('started', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('histogram', models.JSONField(blank=True, default=list)),
+                ('is_stale', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('video', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='funnel', to='studenttracker.video')),
+            ],
+        ),
+    ]
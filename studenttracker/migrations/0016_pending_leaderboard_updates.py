@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studenttracker', '0015_user_email_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingLeaderboardUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('study_hours', 'Most Study Hours'), ('habit_streak', 'Longest Habit Streak'), ('courses_completed', 'Most Courses Completed'), ('course_watch_hours', 'Most Hours Watched in Course')], max_length=30)),
+                ('course_id', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('metric', 'course_id', 'user')},
+            },
+        ),
+    ]
@@ -1,17 +1,58 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import uuid
+
+
+def utc_offset_minutes(tz_name, at=None):
+    """Current UTC offset of an IANA time zone in minutes (0 for unknown zones)"""
+    try:
+        tz = ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return 0
+    offset = timezone.localtime(at or timezone.now(), tz).utcoffset()
+    return int(offset.total_seconds() // 60)
 
 class User(AbstractUser):
     ROLE_CHOICES = [
         ('student', 'Student'),
         ('admin', 'Admin'),
     ]
+    
+    DIGEST_CHOICES = [
+        ('individual', 'Every reminder as its own email'),
+        ('twice_daily', 'Morning and evening digest'),
+        ('daily', 'One daily digest'),
+        ('off', 'No reminder emails'),
+    ]
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='student')
+    # Indexed for the email login (auth_backends.EmailBackend); not unique because older rows share addresses
+    email = models.EmailField('email address', blank=True, db_index=True)
     education = models.CharField(max_length=100, blank=True, null=True)
+    timezone = models.CharField(max_length=63, default='UTC', help_text="IANA time zone, e.g. Asia/Kolkata")
+    # Denormalized from `timezone` so the scheduler can pick a local-time bucket with an index
+    utc_offset_minutes = models.IntegerField(default=0, db_index=True)
+    digest_frequency = models.CharField(max_length=20, choices=DIGEST_CHOICES, default='individual')
     
     def __str__(self):
         return self.username
+    
+    def save(self, *args, **kwargs):
+        self.utc_offset_minutes = utc_offset_minutes(self.timezone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'timezone' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'utc_offset_minutes'}
+        super().save(*args, **kwargs)
+    
+    def get_tzinfo(self):
+        try:
+            return ZoneInfo(self.timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            return ZoneInfo('UTC')
+    
+    def local_now(self):
+        return timezone.localtime(timezone.now(), self.get_tzinfo())
 
 # NEW: YouTube-style Course Model
 class Course(models.Model):
@@ -24,6 +65,8 @@ class Course(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(default='No description provided')
     thumbnail = models.ImageField(upload_to='course_thumbnails/', blank=True, null=True)
+    # Resized JPEG/WebP copies written by the media worker: {"source": name, "320": {"jpeg": name, "webp": name}}
+    thumbnail_variants = models.JSONField(default=dict, blank=True)
     #instructor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='courses_taught',null=True, blank=True)
     price = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
     level = models.CharField(max_length=20, choices=COURSE_LEVELS, default='beginner')
@@ -70,6 +113,7 @@ class Video(models.Model):
     video_url = models.URLField(help_text="YouTube URL or video file URL", blank=True, null=True)
     video_file = models.FileField(upload_to='course_videos/', blank=True, null=True)
     thumbnail = models.ImageField(upload_to='video_thumbnails/', blank=True, null=True)
+    thumbnail_variants = models.JSONField(default=dict, blank=True)
     duration = models.IntegerField(help_text="Duration in seconds", default=0)
     order = models.IntegerField(default=0)
     video_type = models.CharField(max_length=20, choices=VIDEO_TYPES, default='video')
@@ -265,4 +309,228 @@ class HabitNotification(models.Model):
         return f"{self.title} - {self.student.username}"
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        # No default ordering: callers order explicitly (usually '-id') so
+        # counts and retention scans don't pay for a sort
+        indexes = [
+            # Unread counts and the keyset-paginated feed (newest id first)
+            models.Index(fields=['student', 'is_read', '-id'], name='notif_student_read_id_idx'),
+            models.Index(fields=['created_at'], name='notif_created_at_idx'),
+        ]
+
+# Scheduler bookkeeping for send_study_notifications
+class ScheduledJobRun(models.Model):
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ]
+    
+    job_name = models.CharField(max_length=100, unique=True)
+    last_slot = models.DateTimeField(null=True, blank=True)  # Last slot that finished (or was skipped)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=20, choices=STATUS_CHOICES, blank=True)
+    last_error = models.TextField(blank=True)
+    failure_count = models.IntegerField(default=0)
+    retry_after = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.job_name} - {self.last_status or 'never run'}"
+
+class SchedulerLock(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=255, blank=True)
+    expires_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.name} - {self.owner or 'free'}"
+
+class VideoUpload(models.Model):
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    ]
+    
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='video_uploads')
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0)  # Resume offset
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Expected checksum of the whole file")
+    file_name = models.CharField(max_length=255, blank=True)  # Storage name once assembled
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size})"
+
+class MediaJob(models.Model):
+    JOB_TYPES = [
+        ('video_duration', 'Probe Video Duration'),
+        ('video_thumbnail', 'Video Thumbnail Variants'),
+        ('course_thumbnail', 'Course Thumbnail Variants'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    job_type = models.CharField(max_length=30, choices=JOB_TYPES)
+    object_id = models.BigIntegerField()  # Video or Course id, depending on job_type
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='mediajob_status_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_job_type_display()} #{self.object_id} - {self.status}"
+
+class SearchToken(models.Model):
+    """One row per (token, document) for the course/video search index"""
+    OBJECT_TYPES = [
+        ('course', 'Course'),
+        ('video', 'Video'),
+    ]
+    
+    token = models.CharField(max_length=40)
+    object_type = models.CharField(max_length=10, choices=OBJECT_TYPES)
+    object_id = models.BigIntegerField()
+    course_id = models.BigIntegerField()  # The course itself, or the video's course
+    weight = models.IntegerField(default=1)  # Summed field weights: title 3, section 2, description 1
+    is_public = models.BooleanField(default=False)  # Mirrors Course.is_published
+    
+    class Meta:
+        indexes = [
+            # Type equality then a token range scan; covers the query so table rows are never read
+            models.Index(fields=['object_type', 'token', 'is_public', 'object_id', 'weight'], name='search_token_lookup_idx'),
+            models.Index(fields=['object_type', 'object_id'], name='search_token_object_idx'),
+            models.Index(fields=['course_id'], name='search_token_course_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.token} -> {self.object_type} #{self.object_id}"
+
+class CourseRecommendation(models.Model):
+    """Top-K co-enrolled neighbours of a course, rebuilt by build_course_recommendations"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommendations')
+    recommended_course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.IntegerField()  # 1 = strongest neighbour
+    computed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['course', 'rank']
+    
+    def __str__(self):
+        return f"{self.course.title} -> {self.recommended_course.title} (#{self.rank})"
+
+class LeaderboardEntry(models.Model):
+    """Ranked rollup row per (metric, course, student), maintained by LeaderboardService"""
+    METRICS = [
+        ('study_hours', 'Most Study Hours'),
+        ('habit_streak', 'Longest Habit Streak'),
+        ('courses_completed', 'Most Courses Completed'),
+        ('course_watch_hours', 'Most Hours Watched in Course'),
+    ]
+    
+    metric = models.CharField(max_length=30, choices=METRICS)
+    course_id = models.BigIntegerField(default=0)  # 0 for global boards, else the Course id
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    value = models.FloatField()
+    rank = models.IntegerField()  # Competition ranking: 1 + number of students with a higher value
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['metric', 'course_id', 'user']
+        indexes = [
+            models.Index(fields=['metric', 'course_id', 'rank', 'user'], name='leaderboard_page_idx'),
+            models.Index(fields=['metric', 'course_id', 'value'], name='leaderboard_value_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_metric_display()} #{self.rank}: {self.user.username} ({self.value:g})"
+
+class PendingLeaderboardUpdate(models.Model):
+    """A (metric, course, student) whose value changed and still has to be re-ranked.
+
+    Written by the model signals with one conflict-ignoring INSERT, so many
+    changes to the same student collapse into one row; the scheduler's
+    leaderboard_updates job re-ranks and removes them.
+    """
+    metric = models.CharField(max_length=30, choices=LeaderboardEntry.METRICS)
+    course_id = models.BigIntegerField(default=0)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['metric', 'course_id', 'user']
+    
+    def __str__(self):
+        return f"{self.metric} ({self.course_id}) for user {self.user_id}"
+
+class VideoFunnel(models.Model):
+    """Completion and watch-depth summary of one video, refreshed by refresh_video_funnels"""
+    video = models.OneToOneField(Video, on_delete=models.CASCADE, related_name='funnel')
+    enrolled = models.IntegerField(default=0)  # Students enrolled in the video's course
+    started = models.IntegerField(default=0)  # Enrolled students with any progress on the video
+    completed = models.IntegerField(default=0)
+    # Enrolled students per watched_duration / duration decile: [0-10%, 10-20%, ..., 90-100%+]
+    histogram = models.JSONField(default=list, blank=True)
+    is_stale = models.BooleanField(default=True)  # Set when progress or enrollments change
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @property
+    def completion_rate(self):
+        return round(100 * self.completed / self.enrolled, 1) if self.enrolled else 0
+    
+    @property
+    def drop_off_rate(self):
+        """Share of students who started the video but did not finish it"""
+        return round(100 * (self.started - self.completed) / self.started, 1) if self.started else 0
+    
+    def __str__(self):
+        return f"{self.video.title}: {self.completed}/{self.enrolled} completed"
+
+class NotificationJobStats(models.Model):
+    """Lifetime delivery counters of one notification job, merged in by NotificationMetrics"""
+    job_name = models.CharField(max_length=100, unique=True)
+    # {'runs', 'rendered', 'sent', 'failed', 'retried', '*_seconds', 'batch_buckets', 'job_buckets', ...}
+    counters = models.JSONField(default=dict, blank=True)
+    last_run = models.JSONField(default=dict, blank=True)  # Figures of the most recent run only
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.job_name}: {self.counters.get('sent', 0)} sent, {self.counters.get('failed', 0)} failed"
+
+class ProfileRun(models.Model):
+    """A cProfile trace of one request or scheduler job, captured by ProfileSession"""
+    KIND_CHOICES = [
+        ('request', 'Request'),
+        ('command', 'Management command'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    label = models.CharField(max_length=255)  # "GET /dashboard/" or the scheduler job name
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    total_ms = models.FloatField()
+    sql_count = models.IntegerField(default=0)
+    sql_ms = models.FloatField(default=0)
+    report = models.FileField(upload_to='profiles/')  # Readable text: SQL breakdown + functions by cumulative time
+    stats = models.FileField(upload_to='profiles/', blank=True)  # Raw pstats dump for snakeviz/pstats
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.label} ({self.total_ms:.0f} ms)"
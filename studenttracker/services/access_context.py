@@ -0,0 +1,84 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .shared_cache import cache_is_shared
+
+
+def _version_key(user_id):
+    return f"studytrack:enrolled_courses:{user_id}:version"
+
+
+def _enrolled_key(user_id, version):
+    return f"studytrack:enrolled_courses:{user_id}:{version}"
+
+
+def _query_enrolled_course_ids(user_id):
+    from studenttracker.models import Enrollment
+    return frozenset(Enrollment.objects.filter(user_id=user_id).values_list('course_id', flat=True))
+
+
+def get_enrolled_course_ids(user_id):
+    """Ids of the courses a user is enrolled in, served from the shared cache when warm.
+
+    Cached sets are keyed by a per-user version that every enrollment change
+    bumps, so a reader that loaded the old set just before a change stores it
+    under a version nobody reads any more. Without a shared cache the set is
+    read from the database, since another worker could not invalidate it.
+    """
+    if not cache_is_shared():
+        return _query_enrolled_course_ids(user_id)
+    ttl = settings.STUDYTRACK_SETTINGS.get('ENROLLMENT_CACHE_SECONDS', 3600)
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # A fresh clock value, so an evicted version never brings back sets stored under an older one
+        cache.add(_version_key(user_id), time.time_ns(), ttl)
+        version = cache.get(_version_key(user_id))
+    key = _enrolled_key(user_id, version)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = _query_enrolled_course_ids(user_id)
+        cache.set(key, course_ids, ttl)
+    return course_ids
+
+
+def invalidate_enrolled_course_ids(user_id):
+    """Retire the user's cached set once the enrollment change is committed"""
+    def bump():
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            pass  # No version yet: the next reader starts a new one
+    transaction.on_commit(bump)
+
+
+class AccessContext:
+    """Who the current user is and what they may open, loaded at most once per request.
+
+    Attached to every request as `request.access` by AccessContextMiddleware.
+    The enrolled course ids are read on first use, so requests that never
+    check access never touch the cache or the database.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._course_ids = None
+
+    @property
+    def is_admin(self):
+        return self.user.is_authenticated and self.user.role == "admin"
+
+    @property
+    def course_ids(self):
+        if self._course_ids is None:
+            self._course_ids = get_enrolled_course_ids(self.user.id) if self.user.is_authenticated else frozenset()
+        return self._course_ids
+
+    def is_enrolled(self, course_id):
+        return course_id in self.course_ids
+
+    def can_watch(self, video):
+        """Preview videos are open to everyone logged in; the rest need an enrollment"""
+        return video.is_preview or self.is_enrolled(video.section.course_id)
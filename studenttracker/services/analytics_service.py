@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Exists, OuterRef, Q, Subquery
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+CACHE_KEY = 'admin_analytics:{days}'
+
+
+class AdminAnalyticsService:
+    """Course and engagement statistics for the admin analytics page.
+
+    Every figure comes from a grouped aggregate (one query per table), so
+    the cost depends on the number of courses, sections and videos, never on
+    how many students there are. Results are cached for
+    ANALYTICS_CACHE_SECONDS.
+    """
+
+    def __init__(self, days=30):
+        self.days = days
+        self.ttl = settings.STUDYTRACK_SETTINGS.get('ANALYTICS_CACHE_SECONDS', 300)
+
+    def get_summary(self, refresh=False):
+        key = CACHE_KEY.format(days=self.days)
+        summary = None if refresh else cache.get(key)
+        if summary is None:
+            summary = self.compute_summary()
+            cache.set(key, summary, self.ttl)
+        return summary
+
+    def compute_summary(self):
+        return {
+            'generated_at': timezone.now(),
+            'days': self.days,
+            'totals': self.totals(),
+            'courses': self.course_enrollments(),
+            'sections': self.section_funnels(),
+            'videos': self.video_drop_off(),
+            'active_days': self.active_students_per_day(),
+        }
+
+    def totals(self):
+        from studenttracker.models import Course, Enrollment, Task, User
+        enrollments = Enrollment.objects.aggregate(
+            total=Count('id'), completed=Count('id', filter=Q(completed_at__isnull=False))
+        )
+        courses = Course.objects.aggregate(total=Count('id'), published=Count('id', filter=Q(is_published=True)))
+        tasks = Task.objects.aggregate(
+            total=Count('id'), completed=Count('id', filter=Q(status='Completed'))
+        )
+        return {
+            'students': User.objects.filter(role='student').count(),
+            'courses': courses['total'],
+            'published_courses': courses['published'],
+            'enrollments': enrollments['total'],
+            'completed_enrollments': enrollments['completed'],
+            'tasks': tasks['total'],
+            'completed_tasks': tasks['completed'],
+        }
+
+    def course_enrollments(self):
+        """Enrollments, completions and average progress per course"""
+        from studenttracker.models import Course
+        rows = Course.objects.annotate(
+            enrolled=Count('enrollments'),
+            completed=Count('enrollments', filter=Q(enrollments__completed_at__isnull=False)),
+            avg_progress=Avg('enrollments__progress'),
+        ).order_by('-enrolled', 'title').values('id', 'title', 'is_published', 'enrolled', 'completed', 'avg_progress')
+        return [
+            dict(row, avg_progress=round(row['avg_progress'] or 0, 1),
+                 completion_rate=round(100 * row['completed'] / row['enrolled'], 1) if row['enrolled'] else 0)
+            for row in rows
+        ]
+
+    def section_funnels(self):
+        """Per section: students who started a video, and who completed every video in it"""
+        from studenttracker.models import Video, VideoProgress, VideoSection
+        in_section = VideoProgress.objects.filter(video__section_id=OuterRef('pk')).order_by()
+        # A video of the progress row's section that its student has not completed
+        unfinished = Video.objects.filter(section_id=OuterRef('video__section_id')).exclude(
+            Exists(VideoProgress.objects.filter(video_id=OuterRef('pk'), user_id=OuterRef(OuterRef('user_id')), is_completed=True))
+        )
+        students = Count('user_id', distinct=True)
+        rows = VideoSection.objects.annotate(
+            video_count=Count('videos'),
+            started=Subquery(in_section.values('video__section_id').annotate(n=students).values('n')),
+            completed=Subquery(
+                in_section.filter(is_completed=True).exclude(Exists(unfinished))
+                .values('video__section_id').annotate(n=students).values('n')
+            ),
+        ).order_by('course__title', 'order', 'id').values(
+            'id', 'title', 'course__title', 'video_count', 'started', 'completed'
+        )
+        return [
+            dict(row, started=row['started'] or 0, completed=row['completed'] or 0,
+                 completion_rate=round(100 * (row['completed'] or 0) / row['started'], 1) if row['started'] else 0)
+            for row in rows
+        ]
+
+    def video_drop_off(self, limit=20):
+        """Videos where the largest share of students who started did not finish"""
+        from studenttracker.models import VideoProgress
+        rows = VideoProgress.objects.values(
+            'video_id', 'video__title', 'video__section__course__title'
+        ).annotate(
+            started=Count('id'), completed=Count('id', filter=Q(is_completed=True))
+        ).order_by()
+        videos = [
+            dict(row, drop_off=round(100 * (row['started'] - row['completed']) / row['started'], 1))
+            for row in rows
+        ]
+        videos.sort(key=lambda row: (-row['drop_off'], -row['started']))
+        return videos[:limit]
+
+    def active_students_per_day(self):
+        """Distinct students watching videos and logging study sessions per day"""
+        from studenttracker.models import StudySession, VideoProgress
+        since = timezone.now() - timedelta(days=self.days)
+        watching = dict(
+            VideoProgress.objects.filter(last_watched__gte=since).annotate(day=TruncDate('last_watched')).values(
+                'day'
+            ).annotate(students=Count('user_id', distinct=True)).order_by().values_list('day', 'students')
+        )
+        studying = dict(
+            StudySession.objects.filter(session_date__gte=since.date()).values('session_date').annotate(
+                students=Count('student_id', distinct=True)
+            ).order_by().values_list('session_date', 'students')
+        )
+        today = timezone.localdate()
+        return [
+            {'day': day, 'watching': watching.get(day, 0), 'studying': studying.get(day, 0)}
+            for day in (today - timedelta(days=offset) for offset in range(self.days - 1, -1, -1))
+        ]
@@ -1,8 +1,14 @@
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db.models import Exists, OuterRef
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.utils import timezone
+from datetime import timedelta
+import time
+from .email_delivery import send_email_batch
+from .notification_metrics import notification_metrics
+from .recommendation_service import CourseRecommender
 
 class CourseNotificationService:
     def __init__(self):
@@ -10,35 +16,52 @@ class CourseNotificationService:
     
     def _send_email(self, subject, template_name, context, recipient_list):
         """Generic email sending method"""
+        started = time.perf_counter()
+        sent = False
         try:
-            html_message = render_to_string(template_name, context)
-            plain_message = strip_tags(html_message)
+            notification_metrics.incr('rendered')
+            with notification_metrics.timed('render_seconds'):
+                html_message = render_to_string(template_name, context)
+                plain_message = strip_tags(html_message)
             
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=recipient_list,
-                html_message=html_message,
-                fail_silently=False,
-            )
-            return True
+            with notification_metrics.timed('smtp_seconds'):
+                send_mail(
+                    subject=subject,
+                    message=plain_message,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    recipient_list=recipient_list,
+                    html_message=html_message,
+                    fail_silently=False,
+                )
+            sent = True
         except Exception as e:
             print(f"Email sending error: {e}")
-            return False
+        notification_metrics.record_delivery([sent], time.perf_counter() - started)
+        return sent
+    
+    def _send_email_batch(self, emails):
+        """Send many (subject, template_name, context, recipient_list) emails in one delivery pass"""
+        return send_email_batch(emails)
     
-    def _get_course_context(self, user):
-        """Get context data for course notifications"""
+    def _get_course_context(self, user, recommendations=None):
+        """Get context data for course notifications.
+
+        Pass `recommendations` from CourseRecommender.recommend_for_users() when
+        building many contexts, so the lookup is not repeated per student.
+        """
         try:
+            if recommendations is None:
+                recommendations = CourseRecommender().recommend_for_users([user])
+            recommended_course = recommendations.get(user.id)
             # Use basic user data that exists
             return {
                 'student_name': user.get_full_name() or user.username,
-                'current_date': timezone.now().strftime("%B %d, %Y"),
+                'current_date': user.local_now().strftime("%B %d, %Y"),
                 'completed_courses': 0,  # Default value
                 'total_courses': 0,      # Default value
                 'progress_percentage': 0, # Default value
                 'recent_courses': [],    # Default value
-                'next_recommended_course': 'Start your first course!', # Default value
+                'next_recommended_course': recommended_course.title if recommended_course else 'Start your first course!',
             }
             
         except Exception as e:
@@ -46,7 +69,7 @@ class CourseNotificationService:
             # Return fallback data
             return {
                 'student_name': user.get_full_name() or user.username,
-                'current_date': timezone.now().strftime("%B %d, %Y"),
+                'current_date': user.local_now().strftime("%B %d, %Y"),
                 'completed_courses': 0,
                 'total_courses': 0,
                 'progress_percentage': 0,
@@ -54,28 +77,31 @@ class CourseNotificationService:
                 'next_recommended_course': 'No courses enrolled',
             }
     
-    def send_course_completion_reminders(self):
+    def send_course_completion_reminders(self, users=None):
         """Send course completion reminders"""
         try:
             from studenttracker.models import User
-            users = User.objects.filter(is_active=True)
+            if users is None:
+                users = User.objects.all()
+            users = list(users.filter(is_active=True))
+            recommendations = CourseRecommender().recommend_for_users(users)
             
             success_count = 0
             for user in users:
                 if user.email:
-                    context = self._get_course_context(user)
+                    context = self._get_course_context(user, recommendations)
                     
-                    # Determine time-based subject
-                    current_hour = timezone.now().hour
-                    if current_hour < 12:
+                    # Determine time-based subject from the student's own clock
+                    local_now = user.local_now()
+                    if local_now.hour < 12:
                         time_greeting = "Morning"
-                    elif current_hour < 17:
+                    elif local_now.hour < 17:
                         time_greeting = "Afternoon"
                     else:
                         time_greeting = "Evening"
                     
                     sent = self._send_email(
-                        subject=f"🎓 {time_greeting} Course Update - {timezone.now().strftime('%Y-%m-%d')}",
+                        subject=f"🎓 {time_greeting} Course Update - {local_now.strftime('%Y-%m-%d')}",
                         template_name="emails/course_reminder.html",
                         context=context,
                         recipient_list=[user.email]
@@ -94,6 +120,73 @@ class CourseNotificationService:
             print(f"❌ Error sending course reminders: {e}")
             return 0
 
+    def get_pending_quizzes(self, window_hours=None, users=None):
+        """Active quizzes due inside the window that their student has not attempted yet"""
+        from studenttracker.models import Quiz, QuizAttempt
+        if window_hours is None:
+            window_hours = settings.STUDYTRACK_SETTINGS.get('QUIZ_REMINDER_WINDOW_HOURS', 48)
+        now = timezone.now()
+        
+        # Anti-join: a quiz belongs to one student through its LegacyCourse,
+        # so "no attempt yet" is a NOT EXISTS on (student, quiz)
+        attempted = QuizAttempt.objects.filter(
+            quiz=OuterRef('pk'),
+            student=OuterRef('course__student'),
+        )
+        quizzes = Quiz.objects.filter(
+            is_active=True,
+            deadline__gte=now,
+            deadline__lte=now + timedelta(hours=window_hours),
+            course__student__is_active=True,
+        ).exclude(
+            course__student__email='',
+        ).filter(
+            ~Exists(attempted)
+        )
+        if users is not None:
+            quizzes = quizzes.filter(course__student__in=users)
+        return quizzes.select_related('course__student').order_by('course__student_id', 'deadline')
+    
+    def send_quiz_reminders(self, window_hours=None, users=None):
+        """Send one digest email per student listing their unattempted quizzes"""
+        try:
+            # Group (student, quiz) pairs by student so each student gets one email
+            pending_by_student = {}
+            for quiz in self.get_pending_quizzes(window_hours, users):
+                student = quiz.course.student
+                pending_by_student.setdefault(student.id, (student, []))[1].append(quiz)
+            
+            emails = []
+            for student, quizzes in pending_by_student.values():
+                if not student.email:
+                    continue
+                context = {
+                    'student_name': student.get_full_name() or student.username,
+                    'current_date': student.local_now().strftime("%B %d, %Y"),
+                    'quizzes': [
+                        {
+                            'title': quiz.title,
+                            'course_name': quiz.course.name,
+                            'deadline': quiz.deadline,
+                        }
+                        for quiz in quizzes
+                    ],
+                }
+                emails.append((
+                    f"📝 {len(quizzes)} Quiz{'zes' if len(quizzes) != 1 else ''} Waiting For You",
+                    "emails/quiz_reminder.html",
+                    context,
+                    [student.email],
+                ))
+            
+            success_count = self._send_email_batch(emails)
+            print(f"🎯 Quiz reminders completed: {success_count}/{len(emails)} sent successfully!")
+            return success_count
+            
+        except Exception as e:
+            print(f"❌ Error sending quiz reminders: {e}")
+            return 0
+
     def send_course_test_notification(self):
         """Send test course notification"""
         try:
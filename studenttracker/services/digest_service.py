@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.utils import timezone
+from .course_notification_service import CourseNotificationService
+from .notification_service import StudyHabitNotificationService
+from .email_delivery import deliver_emails
+from .recommendation_service import CourseRecommender
+
+
+class DigestNotificationService:
+    """Coalesce everything pending for a student into one email per digest slot.
+
+    Students opt in through User.digest_frequency. Pending HabitNotification
+    rows, unattempted quizzes, course progress and study stats are loaded for
+    the whole audience with one query each and grouped in memory, so a slot
+    costs a fixed number of queries and one message per student.
+    """
+
+    def __init__(self):
+        self.course_service = CourseNotificationService()
+        self.habit_service = StudyHabitNotificationService()
+
+    def build_digests(self, users):
+        """Return [(user, context, notification_ids)] for every user with an email"""
+        from studenttracker.models import HabitNotification
+        users = list(users.filter(is_active=True).exclude(email=''))
+        if not users:
+            return []
+        max_items = settings.STUDYTRACK_SETTINGS.get('DIGEST_MAX_ITEMS', 10)
+
+        notifications_by_user = {}
+        pending = HabitNotification.objects.filter(
+            student__in=users, sent_at__isnull=True
+        ).order_by('student_id', '-created_at').only(
+            'id', 'student_id', 'notification_type', 'title', 'message', 'created_at'
+        )
+        for notification in pending:
+            notifications_by_user.setdefault(notification.student_id, []).append(notification)
+
+        recommendations = CourseRecommender().recommend_for_users(users)
+
+        quizzes_by_user = {}
+        for quiz in self.course_service.get_pending_quizzes(users=users):
+            quizzes_by_user.setdefault(quiz.course.student_id, []).append(quiz)
+
+        digests = []
+        for user in users:
+            notifications = notifications_by_user.get(user.id, [])
+            quizzes = quizzes_by_user.get(user.id, [])
+            context = self.habit_service._get_student_context(user)
+            context.update(self.course_service._get_course_context(user, recommendations))
+            context.update({
+                'notifications': notifications[:max_items],
+                'more_notifications': max(0, len(notifications) - max_items),
+                'quizzes': [
+                    {'title': quiz.title, 'course_name': quiz.course.name, 'deadline': quiz.deadline}
+                    for quiz in quizzes
+                ],
+            })
+            digests.append((user, context, [n.id for n in notifications]))
+        return digests
+
+    def send_digests(self, users, label='Daily'):
+        """Send one digest per user; returns the number of digests sent"""
+        from studenttracker.models import HabitNotification
+        try:
+            digests = self.build_digests(users)
+            emails = []
+            for user, context, _ in digests:
+                emails.append((
+                    f"📬 Your {label} StudyTrack Digest - {user.local_now().strftime('%Y-%m-%d')}",
+                    "emails/digest.html",
+                    context,
+                    [user.email],
+                ))
+
+            outcomes = deliver_emails(emails)
+            delivered_ids = [
+                notification_id
+                for (_, _, notification_ids), sent in zip(digests, outcomes) if sent
+                for notification_id in notification_ids
+            ]
+            if delivered_ids:
+                HabitNotification.objects.filter(id__in=delivered_ids).update(sent_at=timezone.now())
+
+            success_count = sum(outcomes)
+            print(f"🎯 {label} digests completed: {success_count}/{len(emails)} sent successfully!")
+            return success_count
+
+        except Exception as e:
+            print(f"❌ Error sending {label.lower()} digests: {e}")
+            return False
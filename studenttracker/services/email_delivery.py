@@ -0,0 +1,298 @@
+import asyncio
+import concurrent.futures
+import smtplib
+import ssl
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.mail import get_connection, EmailMessage, EmailMultiAlternatives
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from .notification_metrics import notification_metrics
+
+try:
+    import aiosmtplib
+except ImportError:  # Optional: fall back to smtplib sessions on worker threads
+    aiosmtplib = None
+
+
+def render_html(template_name, context):
+    """Render an email template, counted and timed in the notification metrics"""
+    notification_metrics.incr('rendered')
+    with notification_metrics.timed('render_seconds'):
+        return render_to_string(template_name, context)
+
+
+def build_email(subject, html_message, recipient_list, connection=None, plain_message=None):
+    """Wrap already-rendered HTML into a ready-to-send multipart message"""
+    message = EmailMultiAlternatives(
+        subject=subject,
+        body=plain_message if plain_message is not None else strip_tags(html_message),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=recipient_list,
+        connection=connection,
+    )
+    message.attach_alternative(html_message, "text/html")
+    return message
+
+
+def render_email(subject, template_name, context, recipient_list, connection=None):
+    """Render a template into a ready-to-send multipart message"""
+    return build_email(subject, render_html(template_name, context), recipient_list, connection)
+
+
+def _as_message(email, connection=None):
+    """An already-built EmailMessage as is, or a (subject, template_name, context, recipient_list) tuple rendered"""
+    if isinstance(email, EmailMessage):
+        email.connection = connection
+        return email
+    return render_email(*email, connection=connection)
+
+
+def deliver_emails(emails):
+    """Send many (subject, template_name, context, recipient_list) emails.
+
+    Items may also be EmailMessage objects that were built already, e.g.
+    by the reminder engine sharing one rendered body across subjects.
+
+    Uses AsyncEmailDelivery when STUDYTRACK_SETTINGS['ASYNC_EMAIL_DELIVERY']
+    is on, otherwise one pooled Django connection that is recycled every
+    EMAIL_BATCH_SIZE messages. Returns one True/False per email, in order.
+    """
+    started = time.perf_counter()
+    outcomes = _deliver(emails)
+    notification_metrics.record_delivery(outcomes, time.perf_counter() - started)
+    return outcomes
+
+
+def _deliver(emails):
+    custom = settings.STUDYTRACK_SETTINGS
+    if custom.get('ASYNC_EMAIL_DELIVERY'):
+        results = {}  # index -> outcome, filled in as each message finishes
+        try:
+            # Rendered lazily so the delivery queue bounds how many are held in memory
+            AsyncEmailDelivery().deliver((_as_message(email) for email in emails), results=results)
+        except Exception as e:
+            print(f"Async email delivery error: {e}")
+        for result in results.values():
+            notification_metrics.add_time('smtp_seconds', result['seconds'])
+            notification_metrics.incr('retried', result['attempts'] - 1)
+        # Messages that never finished count as failed; the ones already sent stay sent
+        return [index in results and results[index]['status'] == 'sent' for index in range(len(emails))]
+
+    batch_size = custom.get('EMAIL_BATCH_SIZE', 50)
+    outcomes = []
+    connection = get_connection(fail_silently=False)
+    smtp = partial(notification_metrics.timed, 'smtp_seconds')
+    try:
+        with smtp():
+            connection.open()
+        for index, email in enumerate(emails):
+            if index and index % batch_size == 0:
+                with smtp():
+                    connection.close()
+                    connection.open()
+            try:
+                message = _as_message(email, connection=connection)
+                with smtp():
+                    outcomes.append(bool(connection.send_messages([message])))
+            except Exception as e:
+                print(f"Email sending error: {e}")
+                outcomes.append(False)
+                # Start a fresh session for the rest of the batch
+                with smtp():
+                    connection.close()
+                    connection.open()
+    except Exception as e:
+        print(f"Batch email sending error: {e}")
+    finally:
+        try:
+            with smtp():
+                connection.close()
+        except Exception:
+            pass
+    return outcomes + [False] * (len(emails) - len(outcomes))
+
+
+def send_email_batch(emails):
+    """Send many emails over one delivery pass; returns the number sent"""
+    return sum(deliver_emails(emails))
+
+
+class _SmtplibSession:
+    """Blocking smtplib session driven from a worker thread"""
+
+    def __init__(self, options):
+        self.options = options
+        self.client = None
+
+    async def connect(self):
+        await asyncio.to_thread(self._connect)
+
+    def _connect(self):
+        opts = self.options
+        if opts['use_ssl']:
+            client = smtplib.SMTP_SSL(opts['host'], opts['port'], timeout=opts['timeout'],
+                                      context=ssl.create_default_context())
+        else:
+            client = smtplib.SMTP(opts['host'], opts['port'], timeout=opts['timeout'])
+            if opts['use_tls']:
+                client.starttls(context=ssl.create_default_context())
+        if opts['username'] and opts['password']:
+            client.login(opts['username'], opts['password'])
+        self.client = client
+
+    async def send(self, message):
+        await asyncio.to_thread(
+            self.client.sendmail, message.from_email, message.recipients(), message.message().as_bytes()
+        )
+
+    async def close(self):
+        if self.client is not None:
+            client, self.client = self.client, None
+            try:
+                await asyncio.to_thread(client.quit)
+            except Exception:
+                pass
+
+
+class _AiosmtplibSession:
+    """Native asyncio session using aiosmtplib"""
+
+    def __init__(self, options):
+        self.options = options
+        self.client = None
+
+    async def connect(self):
+        opts = self.options
+        client = aiosmtplib.SMTP(
+            hostname=opts['host'], port=opts['port'], timeout=opts['timeout'],
+            use_tls=opts['use_ssl'], start_tls=opts['use_tls'],
+        )
+        await client.connect()
+        if opts['username'] and opts['password']:
+            await client.login(opts['username'], opts['password'])
+        self.client = client
+
+    async def send(self, message):
+        await self.client.sendmail(message.from_email, message.recipients(), message.message().as_bytes())
+
+    async def close(self):
+        if self.client is not None:
+            client, self.client = self.client, None
+            try:
+                await client.quit()
+            except Exception:
+                pass
+
+
+class AsyncEmailDelivery:
+    """Deliver rendered messages over N concurrent SMTP sessions.
+
+    The calling thread feeds a bounded asyncio.Queue, so rendering never
+    runs more than `queue_size` messages ahead of the senders. Each worker keeps one
+    session open for its whole share of the queue and reconnects once on
+    failure before giving up on a message. Outcomes come back in input order.
+    """
+
+    def __init__(self, concurrency=None, queue_size=None, **options):
+        # `options` override the Django EMAIL_* settings (host, port, use_tls, ...)
+        custom = settings.STUDYTRACK_SETTINGS
+        self.concurrency = concurrency or custom.get('ASYNC_EMAIL_CONCURRENCY', 8)
+        self.queue_size = queue_size or custom.get('ASYNC_EMAIL_QUEUE_SIZE', 100)
+        self.options = {
+            'host': settings.EMAIL_HOST,
+            'port': settings.EMAIL_PORT,
+            'use_tls': getattr(settings, 'EMAIL_USE_TLS', False),
+            'use_ssl': getattr(settings, 'EMAIL_USE_SSL', False),
+            'username': getattr(settings, 'EMAIL_HOST_USER', None),
+            'password': getattr(settings, 'EMAIL_HOST_PASSWORD', None),
+            'timeout': getattr(settings, 'EMAIL_TIMEOUT', None) or 30,
+        }
+        self.options.update(options)
+        self.session_class = _AiosmtplibSession if aiosmtplib is not None else _SmtplibSession
+
+    def deliver(self, messages, results=None):
+        """Send an iterable of EmailMessage objects; returns one outcome dict per message.
+
+        The iterable is consumed on the calling thread, so messages rendered
+        lazily may use the ORM; the sessions run on an event loop in a helper
+        thread. `results` (index -> outcome) is filled in as messages finish,
+        so a caller still knows what was sent if delivery fails part way.
+        """
+        results = {} if results is None else results
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name='email-delivery', daemon=True)
+        thread.start()
+        try:
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            workers = asyncio.run_coroutine_threadsafe(self._work(queue, results), loop)
+
+            def hand_over(item):
+                put = asyncio.run_coroutine_threadsafe(queue.put(item), loop)  # Waits while the queue is full
+                while True:
+                    try:
+                        return put.result(timeout=1)
+                    except concurrent.futures.TimeoutError:
+                        if workers.done():
+                            put.cancel()
+                            workers.result()
+                            raise RuntimeError('Email delivery workers stopped')
+
+            try:
+                for index, message in enumerate(messages):
+                    hand_over((index, message))
+            finally:
+                for _ in range(self.concurrency):
+                    hand_over(None)
+                workers.result()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        return [results[index] for index in sorted(results)]
+
+    async def _work(self, queue, results):
+        async def work():
+            session = self.session_class(self.options)
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    index, message = item
+                    results[index] = await self._send_one(session, message)
+            finally:
+                await session.close()
+
+        await asyncio.gather(*(work() for _ in range(self.concurrency)))
+
+    async def _send_one(self, session, message):
+        started = time.perf_counter()
+        outcome = {
+            'recipients': message.recipients(),
+            'subject': message.subject,
+            'status': 'failed',
+            'error': '',
+            'attempts': 0,
+            'seconds': 0.0,
+        }
+        for attempt in (1, 2):
+            outcome['attempts'] = attempt
+            try:
+                if session.client is None:
+                    await session.connect()
+                await session.send(message)
+                outcome['status'] = 'sent'
+                outcome['error'] = ''
+                break
+            except Exception as e:
+                outcome['error'] = str(e)
+                await session.close()  # Reconnect on the retry
+        outcome['seconds'] = time.perf_counter() - started
+        if outcome['status'] != 'sent':
+            print(f"❌ Async delivery to {', '.join(outcome['recipients'])} failed: {outcome['error']}")
+        return outcome
@@ -0,0 +1,90 @@
+import time
+
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Floor, Least
+
+BUCKETS = 10  # Deciles of watched_duration / duration
+
+
+class VideoFunnelService:
+    """Per-video completion funnels for each course, stored in VideoFunnel.
+
+    A course is summarised with one grouped query over VideoProgress: the
+    database computes each row's watch-depth decile and groups by
+    (video, decile), so only BUCKETS rows per video come back. Progress and
+    enrollment changes flag the affected funnels stale, and refresh_stale()
+    recomputes just those courses.
+    """
+
+    def course_rows(self, course_id):
+        """{video_id: {'started', 'completed', 'histogram'}} for enrolled students of a course"""
+        from studenttracker.models import VideoProgress
+        depth = Cast(F('watched_duration'), FloatField()) * BUCKETS / F('video__duration')
+        bucket = Case(
+            When(video__duration__gt=0, then=Least(Floor(depth), Value(BUCKETS - 1))),
+            default=Value(None),
+            output_field=IntegerField(),
+        )
+        rows = VideoProgress.objects.filter(
+            video__section__course_id=course_id, user__enrollments__course_id=course_id
+        ).annotate(bucket=bucket).values('video_id', 'bucket').annotate(
+            students=Count('id'), done=Count('id', filter=Q(is_completed=True))
+        ).order_by()
+
+        summary = {}
+        for row in rows:
+            video = summary.setdefault(row['video_id'], {'started': 0, 'completed': 0, 'histogram': [0] * BUCKETS})
+            video['started'] += row['students']
+            video['completed'] += row['done']
+            if row['bucket'] is not None:
+                video['histogram'][int(row['bucket'])] += row['students']
+        return summary
+
+    def refresh_course(self, course_id):
+        """Recompute and store the funnel of every video in a course; returns videos updated"""
+        from studenttracker.models import Enrollment, Video, VideoFunnel
+        video_ids = list(Video.objects.filter(section__course_id=course_id).values_list('id', flat=True))
+        if not video_ids:
+            return 0
+        enrolled = Enrollment.objects.filter(course_id=course_id).count()
+        summary = self.course_rows(course_id)
+        empty = {'started': 0, 'completed': 0, 'histogram': [0] * BUCKETS}
+        funnels = [
+            VideoFunnel(video_id=video_id, enrolled=enrolled, is_stale=False, **summary.get(video_id, empty))
+            for video_id in video_ids
+        ]
+        VideoFunnel.objects.bulk_create(
+            funnels,
+            update_conflicts=True,
+            unique_fields=['video'],
+            update_fields=['enrolled', 'started', 'completed', 'histogram', 'is_stale', 'updated_at'],
+        )
+        return len(funnels)
+
+    def stale_course_ids(self):
+        """Courses with a stale funnel, or with videos that have never been summarised"""
+        from studenttracker.models import Video, VideoFunnel
+        stale = set(VideoFunnel.objects.filter(is_stale=True).values_list('video__section__course_id', flat=True))
+        stale.update(Video.objects.filter(funnel__isnull=True).values_list('section__course_id', flat=True))
+        return sorted(stale)
+
+    def refresh_stale(self, everything=False, log=print):
+        """Refresh stale courses (or all of them); returns (courses, videos, seconds)"""
+        from studenttracker.models import Course
+        started = time.perf_counter()
+        course_ids = list(Course.objects.values_list('id', flat=True)) if everything else self.stale_course_ids()
+        videos = sum(self.refresh_course(course_id) for course_id in course_ids)
+        elapsed = time.perf_counter() - started
+        if course_ids:
+            log(f"📉 Refreshed funnels for {videos} videos in {len(course_ids)} courses in {elapsed:.1f}s")
+        return len(course_ids), videos, elapsed
+
+    @staticmethod
+    def mark_video_stale(video_id):
+        from studenttracker.models import VideoFunnel
+        VideoFunnel.objects.filter(video_id=video_id, is_stale=False).update(is_stale=True)
+
+    @staticmethod
+    def mark_course_stale(course_id):
+        from studenttracker.models import VideoFunnel
+        VideoFunnel.objects.filter(video__section__course_id=course_id, is_stale=False).update(is_stale=True)
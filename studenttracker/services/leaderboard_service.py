@@ -0,0 +1,177 @@
+import time
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+
+GLOBAL = 0  # LeaderboardEntry.course_id of boards that span every course
+GLOBAL_METRICS = ['study_hours', 'habit_streak', 'courses_completed']
+COURSE_METRICS = ['course_watch_hours']
+
+
+class LeaderboardService:
+    """Precomputed rankings in the LeaderboardEntry rollup table.
+
+    Every board is (metric, course_id). Rows carry their competition rank,
+    so "where am I" is one unique-index lookup and a top-N page is a range
+    read on (metric, course_id, rank). When a student's value changes only
+    the rows between the old and new value shift by one rank. Model
+    changes only queue the student (mark_changed); apply_pending() re-ranks
+    each queued student once, every LEADERBOARD_UPDATE_MINUTES. rebuild()
+    recomputes every board from scratch and is run nightly to repair any
+    drift from concurrent updates.
+    """
+
+    # ---- Raw values ----------------------------------------------------
+
+    def compute_value(self, metric, user_id, course_id=GLOBAL):
+        from studenttracker.models import Enrollment, StudyHabit, StudySession, VideoProgress
+        if metric == 'study_hours':
+            minutes = StudySession.objects.filter(student_id=user_id).aggregate(total=Sum('duration_minutes'))['total']
+            return round((minutes or 0) / 60, 2)
+        if metric == 'habit_streak':
+            return StudyHabit.objects.filter(student_id=user_id).aggregate(best=Max('current_streak'))['best'] or 0
+        if metric == 'courses_completed':
+            return Enrollment.objects.filter(user_id=user_id, completed_at__isnull=False).count()
+        if metric == 'course_watch_hours':
+            seconds = VideoProgress.objects.filter(
+                user_id=user_id, video__section__course_id=course_id
+            ).aggregate(total=Sum('watched_duration'))['total']
+            return round((seconds or 0) / 3600, 2)
+        raise ValueError(f"Unknown leaderboard metric: {metric}")
+
+    def compute_all(self):
+        """{(metric, course_id): {user_id: value}} for every board, one GROUP BY per metric"""
+        from studenttracker.models import Enrollment, StudyHabit, StudySession, User, VideoProgress
+        students = set(User.objects.filter(role='student', is_active=True).values_list('id', flat=True))
+        boards = {(metric, GLOBAL): {} for metric in GLOBAL_METRICS}
+
+        for row in StudySession.objects.values('student_id').annotate(total=Sum('duration_minutes')):
+            boards['study_hours', GLOBAL][row['student_id']] = round((row['total'] or 0) / 60, 2)
+        for row in StudyHabit.objects.values('student_id').annotate(best=Max('current_streak')):
+            boards['habit_streak', GLOBAL][row['student_id']] = row['best'] or 0
+        for row in Enrollment.objects.filter(completed_at__isnull=False).values('user_id').annotate(total=Count('id')):
+            boards['courses_completed', GLOBAL][row['user_id']] = row['total']
+        for row in VideoProgress.objects.values('user_id', 'video__section__course_id').annotate(
+            total=Sum('watched_duration')
+        ):
+            board = boards.setdefault(('course_watch_hours', row['video__section__course_id']), {})
+            board[row['user_id']] = round((row['total'] or 0) / 3600, 2)
+
+        return {
+            key: {user_id: value for user_id, value in values.items() if value > 0 and user_id in students}
+            for key, values in boards.items()
+        }
+
+    # ---- Maintenance ---------------------------------------------------
+
+    def rebuild(self, log=print):
+        """Recompute every board; returns (boards, rows, seconds)"""
+        from studenttracker.models import LeaderboardEntry
+        started = time.perf_counter()
+        rows = []
+        boards = self.compute_all()
+        for (metric, course_id), values in boards.items():
+            ordered = sorted(values.items(), key=lambda item: (-item[1], item[0]))
+            rank = 0
+            previous = None
+            for position, (user_id, value) in enumerate(ordered, start=1):
+                if value != previous:
+                    rank, previous = position, value
+                rows.append(LeaderboardEntry(metric=metric, course_id=course_id, user_id=user_id, value=value, rank=rank))
+
+        with transaction.atomic():
+            LeaderboardEntry.objects.all().delete()
+            LeaderboardEntry.objects.bulk_create(rows, batch_size=1000)
+
+        elapsed = time.perf_counter() - started
+        log(f"🏆 Rebuilt {len(boards)} leaderboards ({len(rows)} entries) in {elapsed:.1f}s")
+        return len(boards), len(rows), elapsed
+
+    @staticmethod
+    def mark_changed(metric, user_id, course_id=GLOBAL):
+        """Queue a student for re-ranking once the current transaction commits"""
+        from studenttracker.models import PendingLeaderboardUpdate
+
+        def queue():
+            PendingLeaderboardUpdate.objects.bulk_create(
+                [PendingLeaderboardUpdate(metric=metric, course_id=course_id, user_id=user_id)],
+                ignore_conflicts=True,
+            )
+        transaction.on_commit(queue)
+
+    def apply_pending(self, batch_size=500, log=print):
+        """Re-rank every queued student once; returns how many entries were updated"""
+        from studenttracker.models import PendingLeaderboardUpdate
+        applied = 0
+        while True:
+            pending = list(PendingLeaderboardUpdate.objects.order_by('id').values_list(
+                'id', 'metric', 'course_id', 'user_id'
+            )[:batch_size])
+            if not pending:
+                break
+            # Removed first: a change that lands while we re-rank queues the student again
+            PendingLeaderboardUpdate.objects.filter(id__in=[row[0] for row in pending]).delete()
+            for _, metric, course_id, user_id in pending:
+                self.update(metric, user_id, course_id)
+            applied += len(pending)
+        if applied:
+            log(f"🏆 Re-ranked {applied} leaderboard entries")
+        return applied
+
+    def update(self, metric, user_id, course_id=GLOBAL):
+        """Recompute one student's value and move their entry; returns the new rank or None"""
+        from studenttracker.models import LeaderboardEntry, User
+        if not User.objects.filter(id=user_id, role='student', is_active=True).exists():
+            return None
+        new = self.compute_value(metric, user_id, course_id) or None
+
+        with transaction.atomic():
+            board = LeaderboardEntry.objects.filter(metric=metric, course_id=course_id)
+            entry = board.select_for_update().filter(user_id=user_id).first()
+            old = entry.value if entry else None
+            if old == new:
+                return entry.rank if entry else None
+
+            # Competition rank = 1 + count(value > mine), so only the
+            # students between the old and new value change rank
+            others = board.exclude(user_id=user_id)
+            if old is None:
+                others.filter(value__lt=new).update(rank=F('rank') + 1)
+            elif new is None:
+                others.filter(value__lt=old).update(rank=F('rank') - 1)
+            elif new > old:
+                others.filter(value__gte=old, value__lt=new).update(rank=F('rank') + 1)
+            else:
+                others.filter(value__gte=new, value__lt=old).update(rank=F('rank') - 1)
+
+            if new is None:
+                entry.delete()
+                return None
+
+            # Rank right below the nearest higher value: an index seek, not a count of everyone above
+            above = others.filter(value__gt=new).order_by('value').first()
+            rank = above.rank + others.filter(value=above.value).count() if above else 1
+            if entry:
+                entry.value, entry.rank = new, rank
+                entry.save(update_fields=['value', 'rank', 'updated_at'])
+            else:
+                LeaderboardEntry.objects.create(metric=metric, course_id=course_id, user_id=user_id, value=new, rank=rank)
+            return rank
+
+    # ---- Reads ---------------------------------------------------------
+
+    def top(self, metric, course_id=GLOBAL, limit=20, after=None):
+        """One page of a board; `after` is the (rank, user_id) of the previous page's last row"""
+        from studenttracker.models import LeaderboardEntry
+        entries = LeaderboardEntry.objects.filter(metric=metric, course_id=course_id)
+        if after:
+            rank, user_id = after
+            entries = entries.filter(Q(rank__gt=rank) | Q(rank=rank, user_id__gt=user_id))
+        return list(entries.order_by('rank', 'user_id').values('rank', 'user_id', 'user__username', 'value')[:limit])
+
+    def position(self, metric, user_id, course_id=GLOBAL):
+        """The student's own row, or None when they are not on the board"""
+        from studenttracker.models import LeaderboardEntry
+        return LeaderboardEntry.objects.filter(metric=metric, course_id=course_id, user_id=user_id).values(
+            'rank', 'user_id', 'user__username', 'value'
+        ).first()
@@ -0,0 +1,71 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _key(scope, value):
+    # Hashed so raw emails never end up in cache keys
+    return f"studytrack:login_failures:{scope}:{hashlib.sha256(value.encode()).hexdigest()[:32]}"
+
+
+def get_client_ip(request):
+    """The address the login came from, as reported by our own proxy when there is one.
+
+    Behind nginx REMOTE_ADDR is the proxy, so LOGIN_THROTTLE['CLIENT_IP_HEADER']
+    names the META key it fills in (e.g. HTTP_X_FORWARDED_FOR). Entries left
+    of the ones appended by our TRUSTED_PROXIES come from the client and are
+    ignored, so a forged header cannot pick a fresh address per attempt.
+    """
+    options = settings.STUDYTRACK_SETTINGS.get('LOGIN_THROTTLE', {})
+    header = options.get('CLIENT_IP_HEADER')
+    addresses = [address.strip() for address in request.META.get(header, '').split(',') if address.strip()] if header else []
+    if not addresses:
+        return request.META.get('REMOTE_ADDR', '')
+    return addresses[-min(options.get('TRUSTED_PROXIES', 1), len(addresses))]
+
+
+class LoginThrottle:
+    """Failed-login counters per client IP and per email, kept in the shared cache.
+
+    is_blocked() only reads the cache, so a throttled request is refused
+    before any user lookup or password hashing. Counters are fixed windows
+    of LOGIN_THROTTLE['WINDOW_SECONDS'] that start at the first failure.
+    Every worker has to count into the same cache (CACHE_URL), which
+    settings.py enforces outside DEBUG.
+    """
+
+    def __init__(self):
+        options = settings.STUDYTRACK_SETTINGS.get('LOGIN_THROTTLE', {})
+        self.enabled = options.get('ENABLED', True)
+        self.window = options.get('WINDOW_SECONDS', 15 * 60)
+        self.limits = {'ip': options.get('IP_ATTEMPTS', 30), 'email': options.get('EMAIL_ATTEMPTS', 5)}
+
+    def _keys(self, ip, email):
+        keys = {}
+        if ip:
+            keys['ip'] = _key('ip', ip)
+        if email:
+            keys['email'] = _key('email', email)
+        return keys
+
+    def is_blocked(self, ip, email):
+        if not self.enabled:
+            return False
+        keys = self._keys(ip, email)
+        counts = cache.get_many(keys.values())
+        return any(counts.get(key, 0) >= self.limits[scope] for scope, key in keys.items())
+
+    def record_failure(self, ip, email):
+        if not self.enabled:
+            return
+        for key in self._keys(ip, email).values():
+            cache.add(key, 0, self.window)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, self.window)  # Expired between add() and incr()
+
+    def reset(self, email):
+        """Forget an email's failures after it logs in; the IP counter keeps running"""
+        cache.delete(_key('email', email))
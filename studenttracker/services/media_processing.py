@@ -0,0 +1,170 @@
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.utils import timezone
+
+# Which model and field each job type works on
+JOB_TARGETS = {
+    'video_duration': ('Video', 'video_file'),
+    'video_thumbnail': ('Video', 'thumbnail'),
+    'course_thumbnail': ('Course', 'thumbnail'),
+}
+
+
+def probe_duration(path, ffprobe='ffprobe'):
+    """Return the media duration in whole seconds, or None when ffprobe is unavailable"""
+    binary = shutil.which(ffprobe)
+    if not binary:
+        return None
+    result = subprocess.run(
+        [binary, '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', path],
+        capture_output=True, text=True, timeout=60, check=True,
+    )
+    duration = json.loads(result.stdout or '{}').get('format', {}).get('duration')
+    return round(float(duration)) if duration else None
+
+
+def build_thumbnail_variants(source_path, output_dir, widths, quality=80):
+    """Write a JPEG and a WebP copy of `source_path` at each width (never upscaled).
+
+    Runs in a worker process, so it only takes and returns plain values:
+    {width: {'jpeg': path, 'webp': path}} with absolute paths.
+    """
+    from PIL import Image
+
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.splitext(os.path.basename(source_path))[0]
+    variants = {}
+    with Image.open(source_path) as image:
+        image = image.convert('RGB')
+        for width in sorted(set(widths)):
+            if width > image.width and variants:
+                break  # The largest variant already covers the original
+            target = min(width, image.width)
+            height = max(1, round(image.height * target / image.width))
+            resized = image.resize((target, height), Image.LANCZOS)
+            jpeg_path = os.path.join(output_dir, f"{base}_{target}w.jpg")
+            webp_path = os.path.join(output_dir, f"{base}_{target}w.webp")
+            resized.save(jpeg_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+            resized.save(webp_path, 'WEBP', quality=quality, method=4)
+            variants[str(target)] = {'jpeg': jpeg_path, 'webp': webp_path}
+    return variants
+
+
+def _run_job(job_type, path, options):
+    """Process-pool entry point: the CPU/IO heavy part of a job, without touching the DB"""
+    if job_type == 'video_duration':
+        return probe_duration(path, options['ffprobe'])
+    output_dir = os.path.join(os.path.dirname(path), 'variants')
+    return build_thumbnail_variants(path, output_dir, options['widths'], options['quality'])
+
+
+class MediaProcessingQueue:
+    """Database-backed queue for duration probes and thumbnail variants.
+
+    Jobs are MediaJob rows. A worker claims queued rows with a conditional
+    UPDATE (so several workers can share the table), runs the file work in a
+    process pool, and writes results back with queryset.update() so the
+    post_save hooks that enqueue jobs are not re-triggered.
+    """
+
+    def __init__(self, workers=None, log=print):
+        custom = settings.STUDYTRACK_SETTINGS
+        self.workers = workers or custom.get('MEDIA_WORKERS', 2)
+        self.max_attempts = custom.get('MEDIA_JOB_MAX_ATTEMPTS', 3)
+        self.options = {
+            'ffprobe': custom.get('FFPROBE_BINARY', 'ffprobe'),
+            'widths': custom.get('THUMBNAIL_WIDTHS', [160, 320, 640]),
+            'quality': custom.get('THUMBNAIL_QUALITY', 80),
+        }
+        self.log = log
+
+    @staticmethod
+    def enqueue(job_type, object_id):
+        """Queue a job unless an identical one is already waiting; returns the job"""
+        from studenttracker.models import MediaJob
+        job, _ = MediaJob.objects.get_or_create(job_type=job_type, object_id=object_id, status='queued')
+        return job
+
+    def claim(self, limit):
+        """Atomically move up to `limit` queued jobs to running; returns the claimed jobs"""
+        from studenttracker.models import MediaJob
+        claimed = []
+        candidates = MediaJob.objects.filter(status='queued').order_by('id').values_list('id', flat=True)[:limit * 2]
+        for job_id in candidates:
+            # Losing the race to another worker simply updates zero rows
+            if MediaJob.objects.filter(id=job_id, status='queued').update(status='running', started_at=timezone.now()):
+                claimed.append(MediaJob.objects.get(id=job_id))
+            if len(claimed) >= limit:
+                break
+        return claimed
+
+    def _target(self, job):
+        from studenttracker import models
+        model_name, field = JOB_TARGETS[job.job_type]
+        obj = getattr(models, model_name).objects.filter(id=job.object_id).first()
+        field_file = getattr(obj, field, None) if obj else None
+        return obj, field_file
+
+    def _apply(self, job, obj, field_file, result):
+        """Write a finished job's result back to its Video or Course"""
+        if job.job_type == 'video_duration':
+            if result is None:
+                return 'ffprobe not available; duration left unchanged'
+            type(obj).objects.filter(id=obj.id).update(duration=result)
+            return ''
+        media_root = os.path.join(os.path.abspath(settings.MEDIA_ROOT), '')
+        variants = {'source': field_file.name}
+        for width, files in result.items():
+            variants[width] = {fmt: os.path.relpath(path, media_root) for fmt, path in files.items()}
+        type(obj).objects.filter(id=obj.id).update(thumbnail_variants=variants)
+        return ''
+
+    def _finish(self, job, error='', failed=False):
+        """Mark a job done, or requeue/fail it after an exception; `error` is kept either way"""
+        job.attempts += 1
+        job.error = error
+        if failed:
+            job.status = 'queued' if job.attempts < self.max_attempts else 'failed'
+        else:
+            job.status = 'done'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['attempts', 'error', 'status', 'finished_at'])
+
+    def run_batch(self, limit=None):
+        """Claim and process one batch; returns (done, failed)"""
+        jobs = self.claim(limit or self.workers * 4)
+        if not jobs:
+            return 0, 0
+
+        done = failed = 0
+        pending = []
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for job in jobs:
+                obj, field_file = self._target(job)
+                if not field_file:
+                    self._finish(job)  # Object or file removed since the job was queued
+                    done += 1
+                    continue
+                future = pool.submit(_run_job, job.job_type, field_file.path, self.options)
+                pending.append((job, obj, field_file, future))
+
+            for job, obj, field_file, future in pending:
+                try:
+                    self._finish(job, error=self._apply(job, obj, field_file, future.result()))
+                    self.log(f"🎞️ {job}")
+                    done += 1
+                except Exception as e:
+                    self._finish(job, error=str(e) or e.__class__.__name__, failed=True)
+                    self.log(f"❌ {job}: {e}")
+                    failed += 1
+        return done, failed
+
+    def requeue_stale(self, older_than):
+        """Return jobs stuck in running (worker killed mid-batch) to the queue"""
+        from studenttracker.models import MediaJob
+        return MediaJob.objects.filter(status='running', started_at__lt=older_than).update(status='queued')
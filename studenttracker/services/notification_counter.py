@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .shared_cache import cache_is_shared
+
+UNREAD_TTL = 60 * 60  # Recomputed at least hourly in case an update bypassed the helpers
+
+
+def _unread_key(user_id):
+    return f"studytrack:unread_notifications:{user_id}"
+
+
+def get_unread_count(user_id):
+    """Unread HabitNotification count for a user, served from cache when warm.
+
+    Only cached when the cache is shared: the scheduler and other workers
+    create and read notifications too, and a per-process copy would miss
+    their changes.
+    """
+    from studenttracker.models import HabitNotification
+    if not cache_is_shared():
+        return HabitNotification.objects.filter(student_id=user_id, is_read=False).count()
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = HabitNotification.objects.filter(student_id=user_id, is_read=False).count()
+        # add(), not set(): another worker may have seeded and adjusted it meanwhile
+        if not cache.add(key, count, UNREAD_TTL):
+            count = cache.get(key, count)
+    return count
+
+
+def adjust_unread_count(user_id, delta):
+    """Shift a warm counter by `delta` once the change commits; a cold counter is left to be recomputed"""
+    if not delta:
+        return
+    key = _unread_key(user_id)
+
+    def adjust():
+        try:
+            if cache.incr(key, delta) < 0:
+                cache.delete(key)
+        except ValueError:
+            pass  # Not cached yet
+    transaction.on_commit(adjust)
+
+
+def mark_read(user_id, notification_ids=None):
+    """Mark all (or the given) unread notifications of a user read with one UPDATE"""
+    from studenttracker.models import HabitNotification
+    unread = HabitNotification.objects.filter(student_id=user_id, is_read=False)
+    if notification_ids is not None:
+        unread = unread.filter(id__in=notification_ids)
+    updated = unread.update(is_read=True)
+    adjust_unread_count(user_id, -updated)
+    return updated
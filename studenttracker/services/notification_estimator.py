@@ -0,0 +1,117 @@
+import contextlib
+import io
+from datetime import datetime
+
+from django.db import transaction
+from django.conf import settings
+from django.db.models import Count
+from django.test.utils import override_settings
+
+from .notification_metrics import notification_metrics
+
+
+class _DryRunRollback(Exception):
+    pass
+
+
+class NotificationEstimator:
+    """Project the cost of notification slots without sending anything.
+
+    For each slot the audience is counted with aggregate queries only, then
+    the real job runs for a random sample of that audience inside a
+    transaction that is rolled back, with mail going to the locmem backend.
+    Render time and DB time are scaled from the sample to the full
+    audience; SMTP time uses the per-message throughput measured by past
+    runs (NotificationJobStats). Only the sample is ever loaded into memory,
+    so it is safe to point at a production-sized snapshot.
+    """
+
+    def __init__(self, tick_minutes=15, sample_size=20):
+        self.tick_minutes = tick_minutes
+        self.sample_size = sample_size
+
+    def audience(self, frequencies):
+        """Everyone the slot reaches over a day (each local clock passes the slot once)"""
+        from studenttracker.models import User
+        return User.objects.filter(digest_frequency__in=frequencies, is_active=True).exclude(email='')
+
+    def peak_per_tick(self, audience, at):
+        """Largest number of students whose local clock reaches `at` in the same scheduler tick"""
+        slot_minutes = at.hour * 60 + at.minute
+        buckets = {}
+        for row in audience.values('utc_offset_minutes').annotate(students=Count('id')).order_by():
+            # Offsets [slot + k*tick, slot + (k+1)*tick) share a tick, see local_slot_audience()
+            bucket = (row['utc_offset_minutes'] - slot_minutes) // self.tick_minutes
+            buckets[bucket] = buckets.get(bucket, 0) + row['students']
+        return max(buckets.values(), default=0)
+
+    @staticmethod
+    def smtp_seconds_per_message(job_name=None):
+        """Measured SMTP time per sent message, for `job_name` if it has history, else across all jobs"""
+        from studenttracker.models import NotificationJobStats
+        rows = list(NotificationJobStats.objects.values_list('job_name', 'counters'))
+        own = [counters for name, counters in rows if name == job_name and counters.get('sent')]
+        pool = own or [counters for _, counters in rows if counters.get('sent')]
+        sent = sum(counters['sent'] for counters in pool)
+        return sum(counters.get('smtp_seconds', 0) for counters in pool) / sent if sent else None
+
+    def measure(self, name, run, sample):
+        """Run `run(users)` for the sample users, sending nothing and keeping no writes"""
+        from django.core import mail
+        result = {}
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            # Keep every send on this thread, inside the transaction that is rolled back
+            STUDYTRACK_SETTINGS=dict(settings.STUDYTRACK_SETTINGS, ASYNC_EMAIL_DELIVERY=False),
+        ):
+            mail.outbox = []
+            try:
+                with transaction.atomic(), contextlib.redirect_stdout(io.StringIO()):
+                    with notification_metrics.job(f'dry_run:{name}', store=False) as result:
+                        run(sample)
+                    raise _DryRunRollback()
+            except _DryRunRollback:
+                pass
+            result['messages'] = len(mail.outbox)
+            mail.outbox = []
+        return result
+
+    def estimate(self, name, at, frequencies, run):
+        """Projected daily cost of one slot; `run(users)` is the job as the scheduler would call it"""
+        from studenttracker.models import User
+        at = datetime.strptime(at, '%H:%M').time()
+        audience = self.audience(frequencies)
+        total = audience.count()
+        sample_ids = list(audience.order_by('?').values_list('id', flat=True)[:self.sample_size])
+        sample = User.objects.filter(id__in=sample_ids)
+        measured = self.measure(name, run, sample) if sample_ids else {'messages': 0}
+
+        scale = total / len(sample_ids) if sample_ids else 0
+        messages = round(measured['messages'] * scale)
+        per_message_smtp = self.smtp_seconds_per_message(name)
+        return {
+            'slot': name,
+            'at': at.strftime('%H:%M'),
+            'audience': total,
+            'peak_per_tick': self.peak_per_tick(audience, at),
+            'sample': len(sample_ids),
+            'sample_messages': measured['messages'],
+            'messages': messages,
+            'render_ms_per_message': round(1000 * measured.get('render_seconds', 0) / measured['messages'], 2)
+            if measured['messages'] else 0,
+            'render_seconds': round(measured.get('render_seconds', 0) * scale, 2),
+            'smtp_seconds': round(per_message_smtp * messages, 2) if per_message_smtp is not None else None,
+            'sample_queries': measured.get('queries', 0),
+            # Linear in the audience, so an upper bound for jobs whose query count does not grow with it
+            'db_seconds': round(measured.get('db_seconds', 0) * scale, 2),
+        }
+
+    @staticmethod
+    def totals(rows):
+        smtp = [row['smtp_seconds'] for row in rows if row['smtp_seconds'] is not None]
+        return {
+            'messages': sum(row['messages'] for row in rows),
+            'render_seconds': round(sum(row['render_seconds'] for row in rows), 2),
+            'smtp_seconds': round(sum(smtp), 2) if len(smtp) == len(rows) else None,
+            'db_seconds': round(sum(row['db_seconds'] for row in rows), 2),
+        }
@@ -0,0 +1,203 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+logger = logging.getLogger('studytrack.notifications')
+
+# Job the current thread is delivering for; set by NotificationMetrics.job()
+current_job = contextvars.ContextVar('studytrack_notification_job', default=None)
+ADHOC_JOB = 'adhoc'  # Emails sent outside a scheduled job, e.g. the test reminder button
+
+COUNTERS = {
+    'runs': 'Job runs',
+    'rendered': 'Messages rendered from templates',
+    'sent': 'Messages accepted by the mail server',
+    'failed': 'Messages that could not be delivered',
+    'retried': 'Extra delivery attempts after a failed send',
+}
+TIMERS = {
+    'render_seconds': 'Time spent rendering email templates',
+    'smtp_seconds': 'Time spent talking to the mail server (summed over concurrent sessions)',
+    'db_seconds': 'Time spent in SQL queries',
+}
+HISTOGRAMS = {
+    'batch': 'Duration of one delivery pass over a batch of messages',
+    'job': 'Duration of one job run',
+}
+BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+
+def _empty():
+    counters = dict.fromkeys(list(COUNTERS) + list(TIMERS), 0)
+    for name in HISTOGRAMS:
+        counters[f'{name}_buckets'] = [0] * (len(BUCKETS) + 1)  # Last slot is +Inf
+        counters[f'{name}_sum'] = 0
+    return counters
+
+
+def _merge(into, delta):
+    for key, value in delta.items():
+        if isinstance(value, list):
+            current = into.get(key) or [0] * len(value)
+            into[key] = [a + b for a, b in zip(current, value)]
+        else:
+            into[key] = into.get(key, 0) + value
+    return into
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class NotificationMetrics:
+    """Rendered/sent/failed/retried counts and render vs SMTP vs DB time per job.
+
+    Figures are buffered per job in memory and merged into the job's
+    NotificationJobStats row when the job finishes, so the scheduler
+    process and the web process (which serves the Prometheus endpoint)
+    see the same totals. `session` keeps this process's own totals for the
+    scheduler's exit summary.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self.session = {}
+        self._lock = threading.Lock()
+
+    # ---- Recording -----------------------------------------------------
+
+    def _bucket(self, job):
+        return self._pending.setdefault(job, _empty())
+
+    def incr(self, field, amount=1):
+        with self._lock:
+            self._bucket(current_job.get() or ADHOC_JOB)[field] += amount
+
+    def add_time(self, field, seconds):
+        self.incr(field, seconds)
+
+    @contextmanager
+    def timed(self, field):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(field, time.perf_counter() - started)
+
+    def observe(self, histogram, seconds):
+        index = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+        with self._lock:
+            counters = self._bucket(current_job.get() or ADHOC_JOB)
+            counters[f'{histogram}_buckets'][index] += 1
+            counters[f'{histogram}_sum'] += seconds
+
+    def record_delivery(self, outcomes, seconds):
+        """Count one delivery pass: a list of True/False per message and how long it took"""
+        sent = sum(1 for outcome in outcomes if outcome)
+        self.incr('sent', sent)
+        self.incr('failed', len(outcomes) - sent)
+        self.observe('batch', seconds)
+        if current_job.get() is None:
+            self.flush()
+
+    @contextmanager
+    def job(self, name, store=True):
+        """Attribute everything sent inside the block to `name`, then store and log the run.
+
+        Yields a dict that is filled with the run's summary on exit. With
+        store=False (dry runs) the figures are only returned, never saved.
+        """
+        from studenttracker.middleware import QueryRecorder, RequestMetrics
+        token = current_job.set(name)
+        queries = RequestMetrics(name)
+        result = {}
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(QueryRecorder(queries)):
+                yield result
+        finally:
+            elapsed = time.perf_counter() - started
+            self.incr('runs')
+            self.add_time('db_seconds', queries.sql_seconds)
+            self.observe('job', elapsed)
+            current_job.reset(token)
+            if store:
+                run = self.flush().get(name)
+            else:
+                with self._lock:
+                    run = self._pending.pop(name, None)
+            if run:
+                result.update(self._summarise(run), queries=queries.sql_count)
+                if store:
+                    logger.info(json.dumps(dict(result, job=name)))
+
+    # ---- Storage -------------------------------------------------------
+
+    def flush(self):
+        """Merge buffered figures into NotificationJobStats; returns what was flushed"""
+        from studenttracker.models import NotificationJobStats
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            for job, delta in pending.items():
+                _merge(self.session.setdefault(job, _empty()), delta)
+        for job, delta in pending.items():
+            try:
+                with transaction.atomic():
+                    stats, _ = NotificationJobStats.objects.select_for_update().get_or_create(job_name=job)
+                    stats.counters = _merge(dict(stats.counters), delta)
+                    if delta['runs']:
+                        stats.last_run = self._summarise(delta)
+                    stats.save(update_fields=['counters', 'last_run', 'updated_at'])
+            except Exception as e:
+                # Metrics must never break delivery
+                logger.warning(f"Could not store notification metrics for {job}: {e}")
+        return pending
+
+    @staticmethod
+    def _summarise(counters):
+        """Plain figures of a run, plus which kind of work dominated it"""
+        summary = {key: round(counters.get(key, 0), 3) for key in list(COUNTERS) + list(TIMERS)}
+        summary['job_seconds'] = round(counters.get('job_sum', 0), 3)
+        parts = {'template': summary['render_seconds'], 'smtp': summary['smtp_seconds'], 'db': summary['db_seconds']}
+        summary['bound_by'] = max(parts, key=parts.get) if any(parts.values()) else ''
+        return summary
+
+    def session_summary(self):
+        """{job: summary} for the jobs this process has run"""
+        with self._lock:
+            return {job: self._summarise(counters) for job, counters in sorted(self.session.items())}
+
+    @staticmethod
+    def prometheus_text():
+        """Every job's lifetime totals in the Prometheus text exposition format"""
+        from studenttracker.models import NotificationJobStats
+        stats = list(NotificationJobStats.objects.order_by('job_name').values_list('job_name', 'counters'))
+        lines = []
+        for field, help_text in COUNTERS.items():
+            name = 'studytrack_notification_runs_total' if field == 'runs' else f'studytrack_notification_messages_{field}_total'
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            lines += [f'{name}{{job="{_label(job)}"}} {counters.get(field, 0)}' for job, counters in stats]
+        for field, help_text in TIMERS.items():
+            name = f'studytrack_notification_{field}_total'
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            lines += [f'{name}{{job="{_label(job)}"}} {round(counters.get(field, 0), 6)}' for job, counters in stats]
+        for histogram, help_text in HISTOGRAMS.items():
+            name = f'studytrack_notification_{histogram}_duration_seconds'
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for job, counters in stats:
+                buckets = counters.get(f'{histogram}_buckets') or [0] * (len(BUCKETS) + 1)
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ['+Inf'], buckets):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{job="{_label(job)}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{job="{_label(job)}"}} {round(counters.get(f"{histogram}_sum", 0), 6)}')
+                lines.append(f'{name}_count{{job="{_label(job)}"}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+notification_metrics = NotificationMetrics()
@@ -0,0 +1,277 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .notification_metrics import notification_metrics
+
+
+def local_slot_audience(at, tick, tick_minutes):
+    """Q() matching users whose local clock is in [at, at + tick_minutes) at UTC instant `tick`.
+
+    Local time = UTC + utc_offset_minutes, so the wanted offsets form one
+    contiguous range (repeated a day apart to cover wrap-around), which the
+    index on User.utc_offset_minutes answers without scanning.
+    """
+    utc_tick = tick.astimezone(dt_timezone.utc)
+    wanted = (at.hour * 60 + at.minute) - (utc_tick.hour * 60 + utc_tick.minute)
+    audience = Q(pk__in=[])
+    for low in (wanted - 1440, wanted, wanted + 1440):
+        # Real-world offsets lie between UTC-12:00 and UTC+14:00
+        if low + tick_minutes > -720 and low <= 840:
+            audience |= Q(utc_offset_minutes__gte=low, utc_offset_minutes__lt=low + tick_minutes)
+    return audience
+
+
+def refresh_utc_offsets():
+    """Re-derive User.utc_offset_minutes after DST transitions; one UPDATE per zone that moved"""
+    from studenttracker.models import User, utc_offset_minutes
+    updated = 0
+    for tz_name in User.objects.values_list('timezone', flat=True).distinct():
+        offset = utc_offset_minutes(tz_name)
+        updated += User.objects.filter(timezone=tz_name).exclude(
+            utc_offset_minutes=offset
+        ).update(utc_offset_minutes=offset)
+    return updated
+
+
+class NotificationScheduler:
+    """Restart-safe job scheduler backed by ScheduledJobRun and SchedulerLock.
+
+    A job either fires once per day at an 'HH:MM' slot in the project time
+    zone, or every N minutes when its schedule is an int. Each job is called
+    with the slot it covers. The last finished slot is stored per job, so a
+    restart picks up where the previous process stopped and every slot missed
+    while nothing was running is caught up in order (as long as it is younger
+    than NOTIFICATION_CATCHUP_HOURS). Only the process holding the lock row
+    runs jobs; other copies stand by.
+    """
+
+    def __init__(self, jobs, lock_name='send_study_notifications', log=print):
+        # jobs: {job_name: ('HH:MM' or interval minutes, callable(slot))}
+        self.jobs = {name: (self._parse_schedule(at), func) for name, (at, func) in jobs.items()}
+        self.lock_name = lock_name
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.log = log
+
+        custom = settings.STUDYTRACK_SETTINGS
+        self.lock_ttl = timedelta(seconds=custom.get('SCHEDULER_LOCK_TTL_SECONDS', 600))
+        self.catchup_window = timedelta(hours=custom.get('NOTIFICATION_CATCHUP_HOURS', 6))
+        self.retry_delay = timedelta(minutes=custom.get('NOTIFICATION_RETRY_MINUTES', 5))
+
+    @staticmethod
+    def _parse_schedule(value):
+        if isinstance(value, int):
+            return value
+        return datetime.strptime(value, '%H:%M').time()
+
+    # ------------------------------------------------------------------
+    # Leader election
+    # ------------------------------------------------------------------
+
+    def acquire_lock(self):
+        """Take or renew the lock row; returns True if this process is the leader"""
+        from studenttracker.models import SchedulerLock
+        now = timezone.now()
+        try:
+            SchedulerLock.objects.get_or_create(name=self.lock_name, defaults={'expires_at': now})
+        except IntegrityError:
+            pass  # Another process created the row first
+
+        # A single conditional UPDATE is atomic on every backend we run on
+        updated = SchedulerLock.objects.filter(name=self.lock_name).filter(
+            Q(owner=self.owner) | Q(expires_at__lte=now)
+        ).update(owner=self.owner, expires_at=now + self.lock_ttl)
+        return updated == 1
+
+    @contextmanager
+    def keep_lock(self):
+        """Renew the lock from a background thread while the block runs.
+
+        A job can take longer than the lease; without this the standby would
+        take over mid-job and run the same slot again. Yields an Event that is
+        set once the lease is lost: taken over, or not renewable (e.g. the
+        database is unreachable) until it expired.
+        """
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def heartbeat():
+            held_until = time.monotonic() + self.lock_ttl.total_seconds()
+            try:
+                while not stop.wait(self.lock_ttl.total_seconds() / 3):
+                    try:
+                        renewed = self.acquire_lock()
+                    except Exception as e:
+                        self.log(f"⚠️ Could not renew the scheduler lock: {e}")
+                        connection.close()  # Reconnect on the next attempt
+                        if time.monotonic() < held_until:
+                            continue
+                        renewed = False
+                    if not renewed:
+                        self.log("⚠️ Scheduler lock was lost while a job was running")
+                        lost.set()
+                        return
+                    held_until = time.monotonic() + self.lock_ttl.total_seconds()
+            finally:
+                connection.close()  # The thread's own connection
+
+        thread = threading.Thread(target=heartbeat, name=f'{self.lock_name}-lease', daemon=True)
+        thread.start()
+        try:
+            yield lost
+        finally:
+            stop.set()
+            thread.join()
+
+    def release_lock(self):
+        from studenttracker.models import SchedulerLock
+        SchedulerLock.objects.filter(name=self.lock_name, owner=self.owner).update(
+            owner='', expires_at=timezone.now()
+        )
+
+    # ------------------------------------------------------------------
+    # Slot bookkeeping
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _period(at):
+        return timedelta(minutes=at) if isinstance(at, int) else timedelta(days=1)
+
+    def _latest_slot(self, at, now):
+        """Most recent slot of schedule `at` that is <= now"""
+        if isinstance(at, int):
+            step = at * 60
+            return datetime.fromtimestamp(int(now.timestamp()) // step * step, tz=dt_timezone.utc)
+        local_now = timezone.localtime(now)
+        slot = timezone.make_aware(datetime.combine(local_now.date(), at))
+        if slot > local_now:
+            slot = timezone.make_aware(datetime.combine(local_now.date() - timedelta(days=1), at))
+        return slot
+
+    def _get_run(self, job_name, now):
+        from studenttracker.models import ScheduledJobRun
+        at = self.jobs[job_name][0]
+        # A job seen for the first time starts from the current slot instead
+        # of replaying whatever already passed today
+        run, _ = ScheduledJobRun.objects.get_or_create(
+            job_name=job_name,
+            defaults={'last_slot': self._latest_slot(at, now), 'last_status': 'skipped'},
+        )
+        return run
+
+    def _next_due(self, run, now):
+        """When `run` next needs to execute, and the slot it will cover (persists skipped slots)"""
+        at = self.jobs[run.job_name][0]
+        period = self._period(at)
+        if run.last_slot is None:
+            slot = self._latest_slot(at, now)
+        else:
+            # Aligned to the current schedule even if the configured time changed
+            slot = self._latest_slot(at, run.last_slot) + period
+
+        oldest_allowed = now - self.catchup_window
+        if slot < oldest_allowed:
+            # Older slots are too stale to be useful (e.g. a morning reminder at night)
+            skip_to = self._latest_slot(at, oldest_allowed)
+            if skip_to < oldest_allowed:
+                skip_to += period
+            run.last_slot = skip_to - period
+            run.last_status = 'skipped'
+            run.retry_after = None
+            run.save(update_fields=['last_slot', 'last_status', 'retry_after'])
+            self.log(f"⏭️ Skipped stale slots {slot:%Y-%m-%d %H:%M} to {run.last_slot:%Y-%m-%d %H:%M} for {run.job_name}")
+            slot = skip_to
+
+        due = slot
+        if run.retry_after and run.retry_after > due:
+            due = run.retry_after
+        return due, slot
+
+    def _run_job(self, run, slot):
+        """Run one slot and record its outcome; returns False if the lease was lost meanwhile"""
+        from studenttracker.models import ScheduledJobRun
+        func = self.jobs[run.job_name][1]
+        started = timezone.now()
+        ScheduledJobRun.objects.filter(pk=run.pk).update(last_started_at=started, last_status='running')
+
+        lease_lost = None
+        try:
+            with self.keep_lock() as lease_lost, notification_metrics.job(run.job_name):
+                result = func(slot)
+            error = '' if result is not False else 'Job reported failure'
+        except Exception as e:
+            error = str(e)
+
+        finished = timezone.now()
+        if error:
+            ScheduledJobRun.objects.filter(pk=run.pk).update(
+                last_finished_at=finished,
+                last_status='failed',
+                last_error=error,
+                failure_count=run.failure_count + 1,
+                retry_after=finished + self.retry_delay,
+            )
+            self.log(f"❌ {run.job_name} failed for slot {slot:%Y-%m-%d %H:%M}: {error}")
+        else:
+            ScheduledJobRun.objects.filter(pk=run.pk).update(
+                last_slot=slot,
+                last_finished_at=finished,
+                last_status='success',
+                last_error='',
+                failure_count=0,
+                retry_after=None,
+            )
+            self.log(f"✅ {run.job_name} finished slot {slot:%Y-%m-%d %H:%M} in {(finished - started).total_seconds():.1f}s")
+        # Its outcome is recorded, but another process may lead by now: run nothing more
+        return not (lease_lost and lease_lost.is_set())
+
+    def run_pending(self):
+        """Run every slot that is due; returns the datetime of the next due job"""
+        next_wake = None
+
+        for job_name in self.jobs:
+            now = timezone.now()
+            run = self._get_run(job_name, now)
+            due, slot = self._next_due(run, now)
+
+            while due <= now:
+                # Renewed before every slot, and by keep_lock() while the slot runs
+                if not self.acquire_lock():
+                    return None
+                if not self._run_job(run, slot):
+                    return None
+                run.refresh_from_db()
+                now = timezone.now()
+                due, slot = self._next_due(run, now)
+
+            if next_wake is None or due < next_wake:
+                next_wake = due
+
+        return next_wake
+
+    def run_forever(self):
+        """Sleep until the next due slot; renew leadership while idle"""
+        heartbeat = self.lock_ttl.total_seconds() / 3
+        try:
+            while True:
+                if self.acquire_lock():
+                    next_wake = self.run_pending()
+                    if next_wake is None:
+                        wait = heartbeat  # Lost the lease mid-run or nothing scheduled
+                    else:
+                        wait = (next_wake - timezone.now()).total_seconds()
+                else:
+                    # Standby: check again once the current leader's lease could have lapsed
+                    wait = heartbeat
+                time.sleep(max(0.0, min(wait, heartbeat)))
+        finally:
+            self.release_lock()
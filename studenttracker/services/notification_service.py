@@ -4,6 +4,10 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.utils import timezone
 from datetime import timedelta
+import time
+
+from .notification_metrics import notification_metrics
+from .reminder_engine import ReminderEngine
 
 class StudyHabitNotificationService:
     def __init__(self):
@@ -15,7 +19,7 @@ class StudyHabitNotificationService:
             # Use basic user data that exists in your database
             return {
                 'student_name': user.get_full_name() or user.username,
-                'current_date': timezone.now().strftime("%B %d, %Y"),
+                'current_date': user.local_now().strftime("%B %d, %Y"),
                 'pending_assignments': 0,  # Default value
                 'upcoming_deadlines': [],  # Default value
                 'study_hours_today': 0,    # Default value
@@ -30,7 +34,7 @@ class StudyHabitNotificationService:
             # Return fallback data
             return {
                 'student_name': user.get_full_name() or user.username,
-                'current_date': timezone.now().strftime("%B %d, %Y"),
+                'current_date': user.local_now().strftime("%B %d, %Y"),
                 'pending_assignments': 0,
                 'upcoming_deadlines': [],
                 'study_hours_today': 0,
@@ -42,62 +46,32 @@ class StudyHabitNotificationService:
     
     def _send_email(self, subject, template_name, context, recipient_list):
         """Generic email sending method"""
+        started = time.perf_counter()
+        sent = False
         try:
-            html_message = render_to_string(template_name, context)
-            plain_message = strip_tags(html_message)
-            
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=recipient_list,
-                html_message=html_message,
-                fail_silently=False,
-            )
-            return True
+            notification_metrics.incr('rendered')
+            with notification_metrics.timed('render_seconds'):
+                html_message = render_to_string(template_name, context)
+                plain_message = strip_tags(html_message)
+            
+            with notification_metrics.timed('smtp_seconds'):
+                send_mail(
+                    subject=subject,
+                    message=plain_message,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    recipient_list=recipient_list,
+                    html_message=html_message,
+                    fail_silently=False,
+                )
+            sent = True
         except Exception as e:
             print(f"Email sending error: {e}")
-            return False
+        notification_metrics.record_delivery([sent], time.perf_counter() - started)
+        return sent
     
-    def send_study_reminders(self):
-        """Send study habit reminders"""
-        try:
-            from studenttracker.models import User
-            users = User.objects.filter(is_active=True)
-            
-            success_count = 0
-            for user in users:
-                if user.email:
-                    context = self._get_student_context(user)
-                    
-                    # Determine time-based subject
-                    current_hour = timezone.now().hour
-                    if current_hour < 12:
-                        time_greeting = "Morning"
-                    elif current_hour < 17:
-                        time_greeting = "Afternoon"
-                    else:
-                        time_greeting = "Evening"
-                    
-                    sent = self._send_email(
-                        subject=f"📚 {time_greeting} Study Reminder - {timezone.now().strftime('%Y-%m-%d')}",
-                        template_name="emails/study_reminder.html",
-                        context=context,
-                        recipient_list=[user.email]
-                    )
-                    
-                    if sent:
-                        success_count += 1
-                        print(f"✅ Study reminder sent to {user.email}")
-                    else:
-                        print(f"❌ Failed to send study reminder to {user.email}")
-            
-            print(f"🎯 Study reminders completed: {success_count}/{len(users)} sent successfully!")
-            return success_count
-            
-        except Exception as e:
-            print(f"❌ Error sending study reminders: {e}")
-            return 0
+    def send_study_reminders(self, users=None):
+        """Send study habit reminders, greeting each student by their own clock"""
+        return self.send_reminder_slots(['study'], users=users)['study']
 
     def send_test_notification(self):
         """Send test notification"""
@@ -141,130 +115,29 @@ class StudyHabitNotificationService:
             print(f"❌ Test notification error: {e}")
             return False
 
-    def send_morning_reminder(self, user=None):
-        """Send morning reminder notifications"""
+    def send_reminder_slots(self, slot_keys, user=None, users=None):
+        """Send several REMINDER_SLOTS in one pass over their audience; returns {slot_key: sent}"""
         try:
             from studenttracker.models import User
             if user:
-                users = [user]
-            else:
-                users = User.objects.filter(is_active=True)
-            
-            success_count = 0
-            for user_obj in users:
-                if user_obj.email:
-                    context = self._get_student_context(user_obj)
-                    
-                    sent = self._send_email(
-                        subject="🌅 Morning Study Reminder - Start Your Day Right!",
-                        template_name="emails/study_reminder.html",
-                        context=context,
-                        recipient_list=[user_obj.email]
-                    )
-                    
-                    if sent:
-                        success_count += 1
-                        print(f"✅ Morning reminder sent to {user_obj.email}")
-            
-            print(f"🎯 Morning reminders: {success_count}/{len(users)} sent successfully!")
-            return success_count > 0
-            
+                users = User.objects.filter(pk=user.pk)
+            return ReminderEngine(self._get_student_context).send(slot_keys, users)
         except Exception as e:
-            print(f"❌ Error sending morning reminder: {e}")
-            return False
+            print(f"❌ Error sending {', '.join(slot_keys)} reminders: {e}")
+            return dict.fromkeys(slot_keys, 0)
 
-    def send_afternoon_checkin(self, user=None):
+    def send_morning_reminder(self, user=None, users=None):
+        """Send morning reminder notifications"""
+        return self.send_reminder_slots(['morning'], user, users)['morning'] > 0
+
+    def send_afternoon_checkin(self, user=None, users=None):
         """Send afternoon check-in notifications"""
-        try:
-            from studenttracker.models import User
-            if user:
-                users = [user]
-            else:
-                users = User.objects.filter(is_active=True)
-            
-            success_count = 0
-            for user_obj in users:
-                if user_obj.email:
-                    context = self._get_student_context(user_obj)
-                    
-                    sent = self._send_email(
-                        subject="☀️ Afternoon Study Check-in - Keep Going!",
-                        template_name="emails/study_reminder.html", 
-                        context=context,
-                        recipient_list=[user_obj.email]
-                    )
-                    
-                    if sent:
-                        success_count += 1
-                        print(f"✅ Afternoon check-in sent to {user_obj.email}")
-            
-            print(f"🎯 Afternoon check-ins: {success_count}/{len(users)} sent successfully!")
-            return success_count > 0
-            
-        except Exception as e:
-            print(f"❌ Error sending afternoon check-in: {e}")
-            return False
+        return self.send_reminder_slots(['afternoon'], user, users)['afternoon'] > 0
 
-    def send_evening_review(self, user=None):
+    def send_evening_review(self, user=None, users=None):
         """Send evening review notifications"""
-        try:
-            from studenttracker.models import User
-            if user:
-                users = [user]
-            else:
-                users = User.objects.filter(is_active=True)
-            
-            success_count = 0
-            for user_obj in users:
-                if user_obj.email:
-                    context = self._get_student_context(user_obj)
-                    
-                    sent = self._send_email(
-                        subject="🌙 Evening Study Review - Great Work Today!",
-                        template_name="emails/study_reminder.html",
-                        context=context,
-                        recipient_list=[user_obj.email]
-                    )
-                    
-                    if sent:
-                        success_count += 1
-                        print(f"✅ Evening review sent to {user_obj.email}")
-            
-            print(f"🎯 Evening reviews: {success_count}/{len(users)} sent successfully!")
-            return success_count > 0
-            
-        except Exception as e:
-            print(f"❌ Error sending evening review: {e}")
-            return False
+        return self.send_reminder_slots(['evening'], user, users)['evening'] > 0
 
-    def send_night_motivation(self, user=None):
+    def send_night_motivation(self, user=None, users=None):
         """Send night motivation notifications"""
-        try:
-            from studenttracker.models import User
-            if user:
-                users = [user]
-            else:
-                users = User.objects.filter(is_active=True)
-            
-            success_count = 0
-            for user_obj in users:
-                if user_obj.email:
-                    context = self._get_student_context(user_obj)
-                    
-                    sent = self._send_email(
-                        subject="🌌 Night Motivation - Plan for Tomorrow!",
-                        template_name="emails/study_reminder.html",
-                        context=context,
-                        recipient_list=[user_obj.email]
-                    )
-                    
-                    if sent:
-                        success_count += 1
-                        print(f"✅ Night motivation sent to {user_obj.email}")
-            
-            print(f"🎯 Night motivations: {success_count}/{len(users)} sent successfully!")
-            return success_count > 0
-            
-        except Exception as e:
-            print(f"❌ Error sending night motivation: {e}")
-            return False
\ No newline at end of file
+        return self.send_reminder_slots(['night'], user, users)['night'] > 0
@@ -0,0 +1,114 @@
+import cProfile
+import io
+import marshal
+import pstats
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.utils import timezone
+
+
+def _slug(label):
+    return re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')[:60] or 'profile'
+
+
+class ProfileSession:
+    """cProfile plus a per-query-shape SQL breakdown around a block of code.
+
+    Use as a context manager; on exit the trace is written under
+    MEDIA_ROOT/profiles as a text report (SQL shapes by total time, then
+    functions sorted by cumulative time) and a raw pstats dump, and a
+    ProfileRun row points at both. Only the PROFILING['KEEP'] newest runs
+    are kept.
+    """
+
+    def __init__(self, kind, label, user=None):
+        self.options = settings.STUDYTRACK_SETTINGS.get('PROFILING', {})
+        self.kind = kind
+        self.label = label
+        self.user = user if user is not None and user.is_authenticated else None
+        self.profiler = cProfile.Profile()
+        self.run = None
+        self._stack = None
+
+    def __enter__(self):
+        from studenttracker.middleware import QueryRecorder, RequestMetrics
+        self.metrics = RequestMetrics(self.label)
+        self._stack = ExitStack()
+        recorder = QueryRecorder(self.metrics)
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(recorder))
+        self.started = time.perf_counter()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread (e.g. a nested session)
+            self.profiler = None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+        self._stack.close()
+        if self.profiler is not None:
+            try:
+                self.save()
+            except Exception as e:
+                # A failed save must not turn a working request into an error
+                print(f"❌ Could not store profile for {self.label}: {e}")
+        return False
+
+    def report_text(self):
+        metrics = self.metrics
+        sql_ms = metrics.sql_seconds * 1000
+        lines = [
+            f"Profile: {self.label} ({self.kind})",
+            f"Captured: {timezone.now():%Y-%m-%d %H:%M:%S %Z}" + (f" by {self.user.username}" if self.user else ''),
+            f"Total: {self.total_ms:.1f} ms | SQL: {metrics.sql_count} queries, {sql_ms:.1f} ms "
+            f"({100 * sql_ms / self.total_ms if self.total_ms else 0:.0f}%)",
+            '',
+            'SQL by query shape (total time)',
+            f"{'count':>7} {'total ms':>10} {'avg ms':>8}  query",
+        ]
+        shapes = sorted(metrics.fingerprint_seconds.items(), key=lambda item: -item[1])
+        for sql, seconds in shapes[:self.options.get('TOP_QUERIES', 25)]:
+            count = metrics.fingerprints[sql]
+            lines.append(f"{count:>7} {seconds * 1000:>10.2f} {seconds * 1000 / count:>8.2f}  {sql[:400]}")
+        if not shapes:
+            lines.append('    (no queries)')
+
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(self.options.get('TOP_FUNCTIONS', 60))
+        lines += ['', 'Functions by cumulative time', stream.getvalue()]
+        return '\n'.join(lines)
+
+    def save(self):
+        from studenttracker.models import ProfileRun
+        self.profiler.create_stats()
+        raw_stats = marshal.dumps(self.profiler.stats)  # Before pstats.Stats(), which empties profiler.stats
+        name = f"{timezone.now():%Y%m%d-%H%M%S}_{_slug(self.label)}"
+        run = ProfileRun(
+            kind=self.kind, label=self.label[:255], user=self.user, total_ms=round(self.total_ms, 1),
+            sql_count=self.metrics.sql_count, sql_ms=round(self.metrics.sql_seconds * 1000, 1),
+        )
+        run.report.save(f'{name}.txt', ContentFile(self.report_text().encode()), save=False)
+        run.stats.save(f'{name}.prof', ContentFile(raw_stats), save=False)
+        run.save()
+        self.run = run
+        self.prune(self.options.get('KEEP', 100))
+        return run
+
+    @staticmethod
+    def prune(keep):
+        """Delete all but the `keep` newest runs, and their files"""
+        from studenttracker.models import ProfileRun
+        for old in ProfileRun.objects.order_by('-created_at', '-id')[keep:]:
+            old.report.delete(save=False)
+            old.stats.delete(save=False)
+            old.delete()
@@ -0,0 +1,138 @@
+import heapq
+import math
+import time
+from collections import defaultdict
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+
+ENROLLED_WEIGHT = 1.0
+WATCHED_WEIGHT = 1.0  # Added on top of enrollment when the student has watched something in the course
+
+
+class CourseRecommender:
+    """Students-who-took-X-also-took-Y recommendations from enrollment co-occurrence.
+
+    rebuild() streams every student's course vector (enrolled, plus watched
+    videos from VideoProgress) once, ordered by user, accumulating a sparse
+    course-by-course co-occurrence matrix. Scores are cosine similarities
+    between course columns, and only the TOP_K neighbours per course are
+    stored in CourseRecommendation, so a lookup reads at most K rows per
+    enrolled course.
+    """
+
+    def __init__(self, top_k=None, log=print):
+        self.top_k = top_k or settings.STUDYTRACK_SETTINGS.get('RECOMMENDATION_TOP_K', 10)
+        self.log = log
+
+    def _user_vectors(self):
+        """Yield {course_id: weight} per student, merging two user-ordered streams"""
+        from studenttracker.models import Enrollment, VideoProgress
+        enrolled = (
+            (user_id, course_id, ENROLLED_WEIGHT)
+            for user_id, course_id in Enrollment.objects.order_by('user_id').values_list(
+                'user_id', 'course_id'
+            ).iterator(chunk_size=5000)
+        )
+        watched = (
+            (user_id, course_id, WATCHED_WEIGHT)
+            for user_id, course_id in VideoProgress.objects.filter(watched_duration__gt=0).order_by(
+                'user_id'
+            ).values_list('user_id', 'video__section__course_id').distinct().iterator(chunk_size=5000)
+        )
+        merged = heapq.merge(enrolled, watched, key=lambda row: row[0])
+        for _, rows in groupby(merged, key=lambda row: row[0]):
+            vector = defaultdict(float)
+            for _, course_id, weight in rows:
+                vector[course_id] += weight
+            yield vector
+
+    def compute(self):
+        """Return {course_id: [(score, neighbour_id)]} with at most top_k neighbours each"""
+        from studenttracker.models import Course
+        cooccurrence = defaultdict(float)
+        norms = defaultdict(float)
+        for vector in self._user_vectors():
+            courses = sorted(vector.items())
+            for position, (course_a, weight_a) in enumerate(courses):
+                norms[course_a] += weight_a * weight_a
+                for course_b, weight_b in courses[position + 1:]:
+                    cooccurrence[course_a, course_b] += weight_a * weight_b
+
+        # Only published courses are worth recommending
+        published = set(Course.objects.filter(is_published=True).values_list('id', flat=True))
+        candidates = defaultdict(list)
+        for (course_a, course_b), dot in cooccurrence.items():
+            score = dot / math.sqrt(norms[course_a] * norms[course_b])
+            if course_b in published:
+                candidates[course_a].append((score, course_b))
+            if course_a in published:
+                candidates[course_b].append((score, course_a))
+        return {
+            course_id: heapq.nlargest(self.top_k, neighbours, key=lambda item: (item[0], -item[1]))
+            for course_id, neighbours in candidates.items()
+        }
+
+    def rebuild(self):
+        """Recompute and replace every stored neighbour list; returns (courses, rows, seconds)"""
+        from studenttracker.models import CourseRecommendation
+        started = time.perf_counter()
+        neighbours = self.compute()
+        rows = [
+            CourseRecommendation(course_id=course_id, recommended_course_id=neighbour_id, score=score, rank=rank)
+            for course_id, ranked in neighbours.items()
+            for rank, (score, neighbour_id) in enumerate(ranked, start=1)
+        ]
+        with transaction.atomic():
+            CourseRecommendation.objects.all().delete()
+            CourseRecommendation.objects.bulk_create(rows, batch_size=1000)
+
+        elapsed = time.perf_counter() - started
+        self.log(f"🧭 Recommendations rebuilt for {len(neighbours)} courses ({len(rows)} rows) in {elapsed:.1f}s")
+        return len(neighbours), len(rows), elapsed
+
+    def recommend_for_users(self, users):
+        """{user_id: Course or None} for many students with a fixed number of queries.
+
+        Neighbour scores of every enrolled course are summed; when a student has
+        no neighbours yet (new student, or rebuild has not run) the most popular
+        published course they are not enrolled in is used instead.
+        """
+        from studenttracker.models import Course, CourseRecommendation, Enrollment
+        user_ids = [user.id for user in users]
+        if not user_ids:
+            return {}
+
+        enrolled = defaultdict(set)
+        for user_id, course_id in Enrollment.objects.filter(user_id__in=user_ids).values_list('user_id', 'course_id'):
+            enrolled[user_id].add(course_id)
+
+        neighbours = defaultdict(list)
+        all_courses = set().union(*enrolled.values()) if enrolled else set()
+        for course_id, recommended_id, score in CourseRecommendation.objects.filter(
+            course_id__in=all_courses
+        ).values_list('course_id', 'recommended_course_id', 'score'):
+            neighbours[course_id].append((recommended_id, score))
+
+        popular = list(
+            Course.objects.filter(is_published=True).order_by('-students_count', 'id').values_list('id', flat=True)[:50]
+        )
+        chosen = {}
+        for user_id in user_ids:
+            taken = enrolled.get(user_id, set())
+            scores = defaultdict(float)
+            for course_id in taken:
+                for recommended_id, score in neighbours.get(course_id, []):
+                    if recommended_id not in taken:
+                        scores[recommended_id] += score
+            if scores:
+                chosen[user_id] = max(scores, key=lambda course_id: (scores[course_id], -course_id))
+            else:
+                chosen[user_id] = next((course_id for course_id in popular if course_id not in taken), None)
+
+        courses = Course.objects.in_bulk({course_id for course_id in chosen.values() if course_id})
+        return {user_id: courses.get(course_id) for user_id, course_id in chosen.items()}
+
+    def recommend_next_course(self, user):
+        return self.recommend_for_users([user]).get(user.id)
@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.db.models import BooleanField, ExpressionWrapper, Q, Value
+from django.utils.html import strip_tags
+
+from .email_delivery import build_email, deliver_emails, render_html
+
+
+def _study_subject(user, local_now):
+    if local_now.hour < 12:
+        greeting = "Morning"
+    elif local_now.hour < 17:
+        greeting = "Afternoon"
+    else:
+        greeting = "Evening"
+    return f"📚 {greeting} Study Reminder - {local_now.strftime('%Y-%m-%d')}"
+
+
+# Slot key -> what to send. `subject` is a string or callable(user, local_now);
+# `audience` is a Q() narrowing the active users with an email, or None for all of them.
+REMINDER_SLOTS = {
+    'morning': {
+        'subject': "🌅 Morning Study Reminder - Start Your Day Right!",
+        'template': "emails/study_reminder.html",
+        'audience': None,
+        'label': "Morning reminders",
+    },
+    'afternoon': {
+        'subject': "☀️ Afternoon Study Check-in - Keep Going!",
+        'template': "emails/study_reminder.html",
+        'audience': None,
+        'label': "Afternoon check-ins",
+    },
+    'evening': {
+        'subject': "🌙 Evening Study Review - Great Work Today!",
+        'template': "emails/study_reminder.html",
+        'audience': None,
+        'label': "Evening reviews",
+    },
+    'night': {
+        'subject': "🌌 Night Motivation - Plan for Tomorrow!",
+        'template': "emails/study_reminder.html",
+        'audience': None,
+        'label': "Night motivations",
+    },
+    'study': {
+        'subject': _study_subject,
+        'template': "emails/study_reminder.html",
+        'audience': None,
+        'label': "Study reminders",
+    },
+}
+
+
+class ReminderEngine:
+    """Send one or more reminder slots in a single pass over their audience.
+
+    The audience of every requested slot comes from one query (each slot's
+    filter is annotated as a boolean column), each student's context is
+    built once, and each (student, template) pair is rendered once even
+    when several slots use it. Messages go out through deliver_emails() in
+    chunks of REMINDER_CHUNK_SIZE students, so memory stays bounded and
+    SMTP sessions are reused.
+    """
+
+    def __init__(self, context_builder, slots=None):
+        # context_builder(user) -> template context, e.g. StudyHabitNotificationService._get_student_context
+        self.context_builder = context_builder
+        self.slots = slots or REMINDER_SLOTS
+        self.chunk_size = settings.STUDYTRACK_SETTINGS.get('REMINDER_CHUNK_SIZE', 500)
+
+    def audience(self, slot_keys, users=None):
+        """Active users with an email in any slot's audience, each with an `in_<slot>` flag"""
+        from studenttracker.models import User
+        if users is None:
+            users = User.objects.all()
+        filters = [self.slots[key]['audience'] for key in slot_keys]
+        flags = {
+            f'in_{key}': Value(True) if audience is None else ExpressionWrapper(audience, output_field=BooleanField())
+            for key, audience in zip(slot_keys, filters)
+        }
+        anyone = Q()
+        if None not in filters:
+            anyone = Q(pk__in=[])
+            for audience in filters:
+                anyone |= audience
+        return users.filter(anyone, is_active=True).exclude(email='').annotate(**flags).order_by('id')
+
+    def messages_for(self, user, slot_keys):
+        """[(slot_key, message)] for one student, rendering each template once"""
+        context = self.context_builder(user)
+        local_now = user.local_now()
+        rendered = {}
+        messages = []
+        for key in slot_keys:
+            if not getattr(user, f'in_{key}'):
+                continue
+            slot = self.slots[key]
+            if slot['template'] not in rendered:
+                html_message = render_html(slot['template'], context)
+                rendered[slot['template']] = (html_message, strip_tags(html_message))
+            html_message, plain_message = rendered[slot['template']]
+            subject = slot['subject'](user, local_now) if callable(slot['subject']) else slot['subject']
+            messages.append((key, build_email(subject, html_message, [user.email], plain_message=plain_message)))
+        return messages
+
+    def send(self, slot_keys, users=None):
+        """Send every slot in `slot_keys` to its audience; returns {slot_key: messages sent}"""
+        slot_keys = list(dict.fromkeys(slot_keys))
+        sent = dict.fromkeys(slot_keys, 0)
+        attempted = dict.fromkeys(slot_keys, 0)
+        audience = self.audience(slot_keys, users)
+        last_id = 0
+        while True:
+            # Keyset pages: only one chunk of students is held at a time
+            students = list(audience.filter(id__gt=last_id)[:self.chunk_size])
+            if not students:
+                break
+            last_id = students[-1].id
+            batch = []
+            for user in students:
+                batch.extend(self.messages_for(user, slot_keys))
+            outcomes = deliver_emails([message for _, message in batch])
+            for (key, message), ok in zip(batch, outcomes):
+                attempted[key] += 1
+                if ok:
+                    sent[key] += 1
+                else:
+                    print(f"❌ Failed to send {self.slots[key]['label'].lower()} to {message.to[0]}")
+
+        for key in slot_keys:
+            print(f"🎯 {self.slots[key]['label']}: {sent[key]}/{attempted[key]} sent successfully!")
+        return sent
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .shared_cache import cache_is_shared
+
+FIELDS = ['requests', 'total_ms', 'sql_count', 'sql_ms', 'template_ms', 'slow', 'n_plus_one']
+INDEX_KEY = 'request_metrics:views'
+FLAGGED_KEY = 'request_metrics:flagged'
+METRICS_TTL = 7 * 24 * 3600
+MAX_FLAGGED = 50
+
+
+def _key(view, field):
+    return f'request_metrics:{view}:{field}'
+
+
+class RequestMetricsStore:
+    """Per-view request statistics kept in the default cache.
+
+    Each process adds requests to an in-memory buffer and pushes it with
+    cache.incr() every FLUSH_SECONDS, so a request costs no cache round trips.
+    Counters from all workers only add up when CACHE_URL points at Redis or
+    Memcached; with the local-memory fallback each worker keeps (and the
+    admin page shows) only its own requests.
+    """
+
+    def __init__(self):
+        self.options = settings.STUDYTRACK_SETTINGS.get('REQUEST_METRICS', {})
+        self.flush_seconds = self.options.get('FLUSH_SECONDS', 30)
+        self._buffer = {}
+        self._max_ms = {}
+        self._flagged = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, metrics, flags):
+        """Add one finished request (a RequestMetrics.as_dict() payload)"""
+        view = metrics['view']
+        with self._lock:
+            totals = self._buffer.setdefault(view, dict.fromkeys(FIELDS, 0))
+            totals['requests'] += 1
+            totals['total_ms'] += metrics['total_ms']
+            totals['sql_count'] += metrics['sql_count']
+            totals['sql_ms'] += metrics['sql_ms']
+            totals['template_ms'] += metrics['template_ms']
+            totals['slow'] += 'slow' in flags
+            totals['n_plus_one'] += 'n_plus_one' in flags
+            self._max_ms[view] = max(self._max_ms.get(view, 0), metrics['total_ms'])
+            if flags:
+                self._flagged.append(dict(metrics, flags=flags))
+            due = time.monotonic() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            buffer, self._buffer = self._buffer, {}
+            max_ms, self._max_ms = self._max_ms, {}
+            flagged, self._flagged = self._flagged, []
+            self._last_flush = time.monotonic()
+        if not buffer:
+            return
+
+        views = set(cache.get(INDEX_KEY) or [])
+        if not views.issuperset(buffer):
+            cache.set(INDEX_KEY, sorted(views | set(buffer)), METRICS_TTL)
+        for view, totals in buffer.items():
+            for field, delta in totals.items():
+                key = _key(view, field)
+                # Integer counters so incr() is atomic on every cache backend
+                if not cache.add(key, round(delta), METRICS_TTL):
+                    cache.incr(key, round(delta))
+            current_max = cache.get(_key(view, 'max_ms')) or 0
+            if max_ms[view] > current_max:
+                cache.set(_key(view, 'max_ms'), round(max_ms[view]), METRICS_TTL)
+        if flagged:
+            recent = (cache.get(FLAGGED_KEY) or []) + flagged
+            cache.set(FLAGGED_KEY, recent[-MAX_FLAGGED:], METRICS_TTL)
+
+    @staticmethod
+    def summary():
+        """Per-view averages, slowest first, plus the most recent flagged requests"""
+        views = cache.get(INDEX_KEY) or []
+        values = cache.get_many([_key(view, field) for view in views for field in FIELDS + ['max_ms']])
+        rows = []
+        for view in views:
+            count = values.get(_key(view, 'requests'), 0)
+            if not count:
+                continue
+
+            def average(field):
+                return round(values.get(_key(view, field), 0) / count, 1)
+
+            rows.append({
+                'view': view,
+                'requests': count,
+                'avg_ms': average('total_ms'),
+                'max_ms': values.get(_key(view, 'max_ms'), 0),
+                'avg_sql_count': average('sql_count'),
+                'avg_sql_ms': average('sql_ms'),
+                'avg_template_ms': average('template_ms'),
+                'slow': values.get(_key(view, 'slow'), 0),
+                'n_plus_one': values.get(_key(view, 'n_plus_one'), 0),
+            })
+        rows.sort(key=lambda row: -row['avg_ms'])
+        return {'views': rows, 'flagged': list(reversed(cache.get(FLAGGED_KEY) or [])), 'shared': cache_is_shared()}
+
+    @staticmethod
+    def reset():
+        views = cache.get(INDEX_KEY) or []
+        cache.delete_many([_key(view, field) for view in views for field in FIELDS + ['max_ms']])
+        cache.delete_many([INDEX_KEY, FLAGGED_KEY])
+
+
+metrics_store = RequestMetricsStore()
@@ -0,0 +1,144 @@
+import gzip
+import json
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .notification_counter import adjust_unread_count
+
+
+class HistoryArchiver:
+    """Move old HabitNotification and stale VideoProgress rows out of the hot tables.
+
+    Rows are copied to gzip-compressed JSONL files under
+    MEDIA_ROOT/archives/<table>/<date>.jsonl.gz and then deleted in batches
+    of RETENTION['BATCH_SIZE'], walking the table by id so every batch is a
+    short index-range lock instead of one long DELETE.
+    A crash between writing and deleting re-archives that batch on the next
+    run, so archive files may contain duplicates but never lose a row.
+
+    Batches are removed with a raw DELETE: the per-row post_delete receivers
+    would otherwise make Django re-select every row and fire one signal per
+    row. Their bookkeeping is done once per batch instead (see
+    _notifications_deleted).
+    """
+
+    NOTIFICATION_FIELDS = [
+        'id', 'student_id', 'notification_type', 'title', 'message', 'related_course_id',
+        'related_task_id', 'is_read', 'scheduled_time', 'sent_at', 'created_at',
+    ]
+    VIDEO_PROGRESS_FIELDS = ['id', 'user_id', 'video_id', 'watched_duration', 'is_completed', 'last_watched']
+
+    def __init__(self, batch_size=None, dry_run=False, log=print):
+        self.policy = settings.STUDYTRACK_SETTINGS.get('RETENTION', {})
+        self.batch_size = batch_size or self.policy.get('BATCH_SIZE', 1000)
+        self.pause = self.policy.get('BATCH_PAUSE_SECONDS', 0.05)
+        self.dry_run = dry_run
+        self.log = log
+
+    def notification_queryset(self):
+        """Read notifications past READ_DAYS, and any notification past MAX_DAYS"""
+        from studenttracker.models import HabitNotification
+        now = timezone.now()
+        read_cutoff = now - timedelta(days=self.policy.get('NOTIFICATION_READ_DAYS', 30))
+        max_cutoff = now - timedelta(days=self.policy.get('NOTIFICATION_MAX_DAYS', 180))
+        return HabitNotification.objects.filter(
+            Q(is_read=True, created_at__lt=read_cutoff) | Q(created_at__lt=max_cutoff)
+        )
+
+    def video_progress_queryset(self):
+        """Progress rows that were opened but never watched and have not been touched since"""
+        from studenttracker.models import VideoProgress
+        cutoff = timezone.now() - timedelta(days=self.policy.get('VIDEO_PROGRESS_UNSTARTED_DAYS', 90))
+        return VideoProgress.objects.filter(watched_duration=0, is_completed=False, last_watched__lt=cutoff)
+
+    def _archive_path(self, table):
+        directory = os.path.join(settings.MEDIA_ROOT, 'archives', table)
+        return os.path.join(directory, f"{timezone.now():%Y-%m-%d}.jsonl.gz")
+
+    @staticmethod
+    def _notifications_deleted(rows):
+        # What uncount_deleted_notification would do, one cache update per student
+        unread = Counter(row['student_id'] for row in rows if not row['is_read'])
+        for student_id, count in unread.items():
+            adjust_unread_count(student_id, -count)
+
+    def archive(self, queryset, fields, table, on_delete=None):
+        """Archive and delete every row of `queryset`; returns (rows moved, seconds).
+
+        `on_delete(rows)` runs after each batch is deleted, in place of the
+        model's post_delete receivers.
+        """
+        started = time.perf_counter()
+        if self.dry_run:
+            count = queryset.count()
+            self.log(f"🔎 {table}: {count} rows would be archived")
+            return count, time.perf_counter() - started
+
+        moved = 0
+        last_id = 0
+        path = self._archive_path(table)
+        archive_file = None
+        try:
+            while True:
+                with transaction.atomic():
+                    # Selected, written and deleted under one lock with the policy applied,
+                    # so a row changed meanwhile (e.g. marked unread again) is either
+                    # still qualifying and archived as it is now, or left alone
+                    rows = list(
+                        queryset.filter(id__gt=last_id).order_by('id').select_for_update()
+                        .values(*fields)[:self.batch_size]
+                    )
+                    if not rows:
+                        break
+                    if archive_file is None:
+                        # Appending gzip members keeps one readable file per day across runs
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        archive_file = gzip.open(path, 'at', encoding='utf-8')
+                    for row in rows:
+                        archive_file.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                    archive_file.flush()
+
+                    ids = [row['id'] for row in rows]
+                    # Deliberately _raw_delete(): QuerySet.delete() would re-select the
+                    # batch and fire post_delete per row; on_delete does that bookkeeping
+                    # once per batch. Nothing references these tables, so no cascade is missed.
+                    queryset.filter(id__in=ids)._raw_delete(queryset.db)
+                    if on_delete:
+                        transaction.on_commit(lambda rows=rows: on_delete(rows))
+                moved += len(ids)
+                last_id = ids[-1]
+                if self.pause:
+                    time.sleep(self.pause)  # Let other writers in between batches
+        finally:
+            if archive_file is not None:
+                archive_file.close()
+
+        elapsed = time.perf_counter() - started
+        rate = moved / elapsed if elapsed else 0
+        if moved:
+            self.log(f"📦 {table}: archived {moved} rows to {path} ({rate:.0f} rows/s)")
+        else:
+            self.log(f"📦 {table}: nothing to archive")
+        return moved, elapsed
+
+    def run(self):
+        """Apply every retention policy; returns {table: (rows, seconds)}"""
+        return {
+            'habit_notifications': self.archive(
+                self.notification_queryset(), self.NOTIFICATION_FIELDS, 'habit_notifications',
+                on_delete=self._notifications_deleted,
+            ),
+            # Only never-watched rows are archived; they add nothing to watch-hour
+            # leaderboards, so skipping rank_course_watch_hours changes no rank
+            'video_progress': self.archive(
+                self.video_progress_queryset(), self.VIDEO_PROGRESS_FIELDS, 'video_progress'
+            ),
+        }
@@ -0,0 +1,196 @@
+import re
+import time
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Sum, Value, When
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TOKEN_LENGTH = 40
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it',
+    'of', 'on', 'or', 'the', 'this', 'to', 'with', 'you', 'your',
+}
+TITLE_WEIGHT = 3
+SECTION_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+MAX_QUERY_TERMS = 5
+MAX_CANDIDATES = 2000  # Multi-term queries rank at most this many matching documents
+
+
+def tokenize(text):
+    """Lower-cased word tokens of `text`, without stopwords or single characters"""
+    return [
+        token[:MAX_TOKEN_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def _prefix_q(term):
+    """token LIKE 'term%' written as a range so it is an index range scan on every backend"""
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return Q(token__gte=term, token__lt=upper)
+
+
+class SearchIndex:
+    """Inverted index over courses and videos, kept in the SearchToken table.
+
+    Each document stores one row per distinct token with the summed weight
+    of the fields it appears in (title, section title, description). A query
+    matches documents containing a token starting with every query term,
+    ranked by total weight with a bonus for whole-word matches. Every lookup
+    is a range scan on the (object_type, token, ...) covering index.
+    """
+
+    def _rows(self, object_type, object_id, course_id, is_public, fields):
+        from studenttracker.models import SearchToken
+        weights = {}
+        for text, weight in fields:
+            for token in set(tokenize(text)):
+                weights[token] = weights.get(token, 0) + weight
+        return [
+            SearchToken(token=token, object_type=object_type, object_id=object_id,
+                        course_id=course_id, weight=weight, is_public=is_public)
+            for token, weight in weights.items()
+        ]
+
+    def course_rows(self, course):
+        return self._rows('course', course.id, course.id, course.is_published, [
+            (course.title, TITLE_WEIGHT), (course.description, DESCRIPTION_WEIGHT),
+        ])
+
+    def video_rows(self, video, section=None, course=None):
+        section = section or video.section
+        course = course or section.course
+        return self._rows('video', video.id, course.id, course.is_published, [
+            (video.title, TITLE_WEIGHT), (section.title, SECTION_WEIGHT), (video.description, DESCRIPTION_WEIGHT),
+        ])
+
+    def _replace(self, object_type, object_ids, rows):
+        from studenttracker.models import SearchToken
+        with transaction.atomic():
+            SearchToken.objects.filter(object_type=object_type, object_id__in=object_ids).delete()
+            SearchToken.objects.bulk_create(rows, batch_size=1000)
+
+    def index_course(self, course):
+        """Reindex a course and refresh the visibility of its videos"""
+        from studenttracker.models import SearchToken
+        self._replace('course', [course.id], self.course_rows(course))
+        SearchToken.objects.filter(object_type='video', course_id=course.id).exclude(
+            is_public=course.is_published
+        ).update(is_public=course.is_published)
+
+    def index_video(self, video):
+        self._replace('video', [video.id], self.video_rows(video))
+
+    def index_section(self, section):
+        """Section titles are part of every video document in the section"""
+        videos = list(section.videos.all())
+        rows = [row for video in videos for row in self.video_rows(video, section, section.course)]
+        self._replace('video', [video.id for video in videos], rows)
+
+    def remove(self, object_type, object_id):
+        from studenttracker.models import SearchToken
+        SearchToken.objects.filter(object_type=object_type, object_id=object_id).delete()
+
+    def rebuild(self, batch_size=1000, log=print):
+        """Rebuild the whole index; returns (documents, rows, seconds)"""
+        from studenttracker.models import Course, SearchToken, Video
+        started = time.perf_counter()
+        # One transaction: searches keep seeing the old index until the new one is complete
+        with transaction.atomic():
+            SearchToken.objects.all().delete()
+            documents = rows = 0
+
+            batch = []
+            for course in Course.objects.only('id', 'title', 'description', 'is_published').iterator(chunk_size=batch_size):
+                batch.extend(self.course_rows(course))
+                documents += 1
+            SearchToken.objects.bulk_create(batch, batch_size=batch_size)
+            rows += len(batch)
+
+            batch = []
+            videos = Video.objects.select_related('section__course').only(
+                'id', 'title', 'description', 'section__title', 'section__course__id', 'section__course__is_published'
+            )
+            for video in videos.iterator(chunk_size=batch_size):
+                batch.extend(self.video_rows(video))
+                documents += 1
+                if len(batch) >= batch_size * 10:
+                    SearchToken.objects.bulk_create(batch, batch_size=batch_size)
+                    rows += len(batch)
+                    batch = []
+            SearchToken.objects.bulk_create(batch, batch_size=batch_size)
+            rows += len(batch)
+
+        elapsed = time.perf_counter() - started
+        log(f"🔎 Indexed {documents} documents ({rows} tokens) in {elapsed:.1f}s")
+        return documents, rows, elapsed
+
+    def ranked_ids(self, query, object_type, limit=20, include_unpublished=False):
+        """[(object_id, score)] of documents matching every term of `query`, best first"""
+        from studenttracker.models import SearchToken
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+
+        base = SearchToken.objects.filter(object_type=object_type)
+        if not include_unpublished:
+            base = base.filter(is_public=True)
+
+        def scored(rows, term):
+            exact_weight = Sum(Case(When(token=term, then=F('weight')), default=Value(0)))
+            return rows.values('object_id').annotate(score=Sum('weight') + exact_weight)
+
+        def term_scores(term, candidates=None):
+            # One index range scan per term; OR-ing the ranges would defeat the index
+            rows = base.filter(_prefix_q(term))
+            if candidates is not None:
+                rows = rows.filter(object_id__in=candidates)
+            return scored(rows, term)
+
+        if len(terms) == 1:
+            rows = term_scores(terms[0]).order_by('-score', 'object_id')[:limit]
+            return [(row['object_id'], row['score']) for row in rows]
+
+        # Documents containing every term, narrowed with nested IN subqueries
+        matching = base.filter(_prefix_q(terms[0]))
+        for term in terms[1:]:
+            matching = matching.filter(object_id__in=base.filter(_prefix_q(term)).values('object_id'))
+        # Capped by the first term's score, so the best matches are kept, not whichever the database returns first
+        candidates = [
+            row['object_id']
+            for row in scored(matching, terms[0]).order_by('-score', 'object_id')[:MAX_CANDIDATES]
+        ]
+        if not candidates:
+            return []
+
+        scores = dict.fromkeys(candidates, 0)
+        for term in terms:
+            for row in term_scores(term, candidates):
+                scores[row['object_id']] += row['score']
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def search(self, query, limit=20, include_unpublished=False):
+        """Ranked courses and videos for `query`, ready for JSON"""
+        from studenttracker.models import Course, Video
+        course_hits = self.ranked_ids(query, 'course', limit, include_unpublished)
+        video_hits = self.ranked_ids(query, 'video', limit, include_unpublished)
+
+        courses = Course.objects.in_bulk([object_id for object_id, _ in course_hits])
+        videos = Video.objects.select_related('section__course').in_bulk([object_id for object_id, _ in video_hits])
+        return {
+            'courses': [
+                {'id': courses[object_id].id, 'title': courses[object_id].title,
+                 'level': courses[object_id].level, 'score': score}
+                for object_id, score in course_hits if object_id in courses
+            ],
+            'videos': [
+                {'id': videos[object_id].id, 'title': videos[object_id].title,
+                 'course_id': videos[object_id].section.course_id,
+                 'course_title': videos[object_id].section.course.title,
+                 'is_preview': videos[object_id].is_preview, 'score': score}
+                for object_id, score in video_hits if object_id in videos
+            ],
+        }
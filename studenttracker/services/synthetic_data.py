@@ -0,0 +1,213 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+TIMEZONES = ['UTC', 'Europe/London', 'America/New_York', 'Asia/Kolkata', 'Australia/Sydney']
+HABITS = [
+    ('Pomodoro blocks', 'time_management'),
+    ('Phone in another room', 'focus'),
+    ('Evening walk', 'health'),
+    ('Spaced repetition', 'learning'),
+]
+
+
+class SyntheticDataset:
+    """Seeded, realistic-looking StudyTrack data for benchmarks.
+
+    The same seed and sizes always give the same rows, so two benchmark
+    runs are comparable. Everything is written with bulk_create, which
+    skips the model signals; the derived tables (leaderboards,
+    recommendations, funnels) are rebuilt once at the end instead.
+    """
+
+    def __init__(self, students=200, courses=20, sections=4, videos=5, enrollments=3, sessions=10, seed=42, log=print):
+        self.students = students
+        self.courses = courses
+        self.sections = sections
+        self.videos = videos
+        self.enrollments = min(enrollments, courses)
+        self.sessions = sessions
+        self.seed = seed
+        self.log = log
+        self.random = random.Random(seed)
+
+    def generate(self):
+        """Create the whole dataset; returns {table: rows created}"""
+        started = time.perf_counter()
+        students = self.create_students()
+        videos_by_course = self.create_catalogue()
+        counts = {
+            'students': len(students),
+            'courses': len(videos_by_course),
+            'videos': sum(len(videos) for videos in videos_by_course.values()),
+        }
+        counts.update(self.create_enrollments(students, videos_by_course))
+        counts.update(self.create_study_history(students))
+        self.rebuild_derived()
+        self.log(f"🧪 Generated synthetic dataset (seed {self.seed}) in {time.perf_counter() - started:.1f}s: {counts}")
+        return counts
+
+    def create_students(self):
+        from studenttracker.models import User, utc_offset_minutes
+        password = make_password('benchmark-password')  # Hashed once, shared by every student
+        users = []
+        for index in range(self.students):
+            tz_name = self.random.choice(TIMEZONES)
+            users.append(User(
+                username=f'bench_student_{index}',
+                email=f'bench_student_{index}@example.com',
+                first_name='Student',
+                last_name=str(index),
+                password=password,
+                role='student',
+                timezone=tz_name,
+                utc_offset_minutes=utc_offset_minutes(tz_name),
+                digest_frequency=self.random.choice(['individual', 'individual', 'daily', 'twice_daily']),
+            ))
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        return list(User.objects.filter(username__startswith='bench_student_').order_by('id'))
+
+    def create_catalogue(self):
+        """Published courses with sections and videos; returns {course_id: [(video_id, duration), ...]}"""
+        from studenttracker.models import Course, Video, VideoSection
+        levels = ['beginner', 'intermediate', 'advanced']
+        Course.objects.bulk_create([
+            Course(
+                title=f'Benchmark Course {index}',
+                description=f'Synthetic course {index} for benchmarking',
+                level=levels[index % len(levels)],
+                duration_hours=self.random.randint(1, 40),
+                rating=round(self.random.uniform(3, 5), 1),
+                is_published=True,
+            )
+            for index in range(self.courses)
+        ], batch_size=BATCH_SIZE)
+        courses = list(Course.objects.filter(title__startswith='Benchmark Course ').order_by('id'))
+
+        VideoSection.objects.bulk_create([
+            VideoSection(course=course, title=f'Section {order + 1}', order=order)
+            for course in courses
+            for order in range(self.sections)
+        ], batch_size=BATCH_SIZE)
+        sections = VideoSection.objects.filter(course__in=courses).order_by('course_id', 'order')
+
+        Video.objects.bulk_create([
+            Video(
+                section=section,
+                title=f'{section.title} - Lesson {order + 1}',
+                video_url='https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+                duration=self.random.randint(120, 1800),
+                order=order,
+                is_preview=section.order == 0 and order == 0,
+            )
+            for section in sections
+            for order in range(self.videos)
+        ], batch_size=BATCH_SIZE)
+
+        videos_by_course = {course.id: [] for course in courses}
+        for video_id, course_id, duration in Video.objects.filter(section__course__in=courses).order_by(
+            'section__course_id', 'section__order', 'order'
+        ).values_list('id', 'section__course_id', 'duration'):
+            videos_by_course[course_id].append((video_id, duration))
+        return videos_by_course
+
+    def create_enrollments(self, students, videos_by_course):
+        """Each student enrolls in a few courses and watches a prefix of each, stopping mid-video"""
+        from studenttracker.models import Course, Enrollment, VideoProgress
+        now = timezone.now()
+        course_ids = list(videos_by_course)
+        # Skewed popularity, so recommendations and leaderboards have something to rank
+        weights = [1 / (rank + 1) for rank in range(len(course_ids))]
+        enrollments = []
+        progress = []
+        for student in students:
+            chosen = set()
+            while len(chosen) < self.enrollments:
+                chosen.add(self.random.choices(course_ids, weights)[0])
+            for course_id in sorted(chosen):
+                videos = videos_by_course[course_id]
+                watched = self.random.randint(0, len(videos))
+                percent = 100 * watched / len(videos) if videos else 0
+                enrollments.append(Enrollment(
+                    user=student, course_id=course_id, progress=percent,
+                    completed_at=now if videos and watched == len(videos) else None,
+                ))
+                for video_id, duration in videos[:watched]:
+                    progress.append(VideoProgress(user=student, video_id=video_id, watched_duration=duration, is_completed=True))
+                if watched < len(videos):
+                    video_id, duration = videos[watched]
+                    progress.append(VideoProgress(
+                        user=student, video_id=video_id, watched_duration=self.random.randint(0, duration),
+                    ))
+        Enrollment.objects.bulk_create(enrollments, batch_size=BATCH_SIZE)
+        VideoProgress.objects.bulk_create(progress, batch_size=BATCH_SIZE)
+
+        for course_id in course_ids:
+            Course.objects.filter(id=course_id).update(
+                students_count=Enrollment.objects.filter(course_id=course_id).count()
+            )
+        return {'enrollments': len(enrollments), 'video_progress': len(progress)}
+
+    def create_study_history(self, students):
+        """Legacy courses, tasks, quizzes due soon, habits and a month of study sessions"""
+        from studenttracker.models import LegacyCourse, Quiz, StudyHabit, StudySession, Task
+        now = timezone.now()
+        today = timezone.localdate()
+        LegacyCourse.objects.bulk_create([
+            LegacyCourse(
+                student=student, name=f'Self-study {student.last_name}', status='In Progress',
+                completion_percentage=self.random.randint(0, 90), deadline=today + timedelta(days=self.random.randint(1, 60)),
+            )
+            for student in students
+        ], batch_size=BATCH_SIZE)
+        legacy_courses = list(LegacyCourse.objects.filter(student__in=students))
+
+        tasks = [
+            Task(
+                student_id=course.student_id, course=course, title=f'Assignment {number}',
+                status=self.random.choice(['Pending', 'In Progress', 'Completed']),
+                deadline=today + timedelta(days=self.random.randint(-3, 14)),
+            )
+            for course in legacy_courses
+            for number in range(1, 4)
+        ]
+        quizzes = [
+            Quiz(
+                course=course, title=f'Quiz for {course.name}', description='Synthetic quiz',
+                deadline=now + timedelta(hours=self.random.randint(1, 23)),
+            )
+            for course in legacy_courses
+        ]
+        habits = [
+            StudyHabit(student=student, habit_name=name, habit_category=category, target_frequency='daily',
+                       current_streak=self.random.randint(0, 30))
+            for student in students
+            for name, category in [self.random.choice(HABITS)]
+        ]
+        sessions = [
+            StudySession(
+                student=student, duration_minutes=self.random.randint(15, 180),
+                focus_score=self.random.randint(1, 10), productivity_score=self.random.randint(1, 10),
+                session_date=today - timedelta(days=self.random.randint(0, 29)),
+            )
+            for student in students
+            for _ in range(self.sessions)
+        ]
+        Task.objects.bulk_create(tasks, batch_size=BATCH_SIZE)
+        Quiz.objects.bulk_create(quizzes, batch_size=BATCH_SIZE)
+        StudyHabit.objects.bulk_create(habits, batch_size=BATCH_SIZE)
+        StudySession.objects.bulk_create(sessions, batch_size=BATCH_SIZE)
+        return {'tasks': len(tasks), 'quizzes': len(quizzes), 'study_sessions': len(sessions)}
+
+    def rebuild_derived(self):
+        from .funnel_service import VideoFunnelService
+        from .leaderboard_service import LeaderboardService
+        from .recommendation_service import CourseRecommender
+        quiet = lambda message: None
+        CourseRecommender(log=quiet).rebuild()
+        LeaderboardService().rebuild(log=quiet)
+        VideoFunnelService().refresh_stale(everything=True, log=quiet)
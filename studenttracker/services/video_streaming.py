@@ -0,0 +1,126 @@
+import mimetypes
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import http_date
+
+PREVIEW_SALT = 'studytrack.video_preview'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single-range header, None to send the
+    whole file, or False when the range cannot be satisfied"""
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None  # Multi-range or malformed: RFC 9110 lets us answer with 200
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def iter_file_range(path, start, length, chunk_size):
+    """Yield `length` bytes of `path` from `start` in fixed-size chunks"""
+    with open(path, 'rb', buffering=0) as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def stream_file(request, field_file):
+    """Serve an uploaded file with HTTP Range support.
+
+    STUDYTRACK_SETTINGS['VIDEO_STREAM_OFFLOAD'] can hand the transfer to the
+    front-end server instead ('x-sendfile' for Apache/lighttpd,
+    'x-accel-redirect' for nginx), which then does ranges and zero-copy
+    sendfile itself; Django only runs the access check.
+    """
+    custom = settings.STUDYTRACK_SETTINGS
+    path = field_file.path
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    offload = custom.get('VIDEO_STREAM_OFFLOAD')
+
+    if offload == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = custom.get('VIDEO_ACCEL_REDIRECT_PREFIX', '/protected-media/') + field_file.name
+        return response
+    if offload == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+
+    stat = os.stat(path)
+    size = stat.st_size
+    byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        (start, end), status = byte_range, 206
+
+    length = end - start + 1 if size else 0
+    chunk_size = custom.get('VIDEO_STREAM_CHUNK_SIZE', 512 * 1024)
+    response = StreamingHttpResponse(
+        iter_file_range(path, start, length, chunk_size), status=status, content_type=content_type
+    )
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def preview_url(video):
+    """Signed, expiring stream URL for a preview video's uploaded file.
+
+    The expiry is rounded up to the end of the next PREVIEW_URL_SECONDS
+    window, so everyone opening the preview in the same window gets the
+    same URL and a CDN or caching proxy can serve it from one cache entry.
+    The token carries the file name, so serving it needs no database query.
+    """
+    window = settings.STUDYTRACK_SETTINGS.get('PREVIEW_URL_SECONDS', 6 * 60 * 60)
+    expires = (int(time.time()) // window + 2) * window
+    # Signer, not signing.dumps(): that adds a per-second timestamp and every URL would differ
+    token = signing.Signer(salt=PREVIEW_SALT).sign_object({'v': video.id, 'f': video.video_file.name, 'e': expires})
+    return reverse('stream_preview', args=[token])
+
+
+def read_preview_token(token):
+    """(video_id, file name, expiry timestamp) of a valid token, or None if forged or expired"""
+    try:
+        data = signing.Signer(salt=PREVIEW_SALT).unsign_object(token)
+    except signing.BadSignature:
+        return None
+    if data['e'] <= time.time():
+        return None
+    return data['v'], data['f'], data['e']
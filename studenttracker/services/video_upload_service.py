@@ -0,0 +1,187 @@
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Rejected upload request; the message is safe to show to the client"""
+
+
+class ChunkedVideoUploadService:
+    """Resumable uploads for Video.video_file, written straight to disk.
+
+    Chunks must arrive in order: each one is appended at the upload's
+    received_bytes offset, so a client resumes by asking for the offset and
+    sending from there. Nothing is held in memory beyond one READ_SIZE
+    buffer, and the finished file is moved into place with a rename.
+    Each chunk is spooled to its own file while the client sends it; the
+    upload row is only locked afterwards, to check the offset and append.
+    """
+
+    def __init__(self):
+        custom = settings.STUDYTRACK_SETTINGS
+        self.max_size = custom.get('MAX_VIDEO_SIZE', 500 * 1024 * 1024)
+        self.allowed_formats = [fmt.lower() for fmt in custom.get('ALLOWED_VIDEO_FORMATS', [])]
+        self.max_chunk_size = custom.get('UPLOAD_CHUNK_MAX_SIZE', 8 * 1024 * 1024)
+
+    @staticmethod
+    def _tmp_dir():
+        return os.path.join(settings.MEDIA_ROOT, 'uploads_tmp')
+
+    def _part_path(self, upload):
+        return os.path.join(self._tmp_dir(), f"{upload.upload_id}.part")
+
+    def start(self, user, filename, total_size, sha256=''):
+        """Validate format and size before any bytes are accepted"""
+        from studenttracker.models import VideoUpload
+        filename = os.path.basename(filename or '')
+        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if extension not in self.allowed_formats:
+            raise UploadError(f"Unsupported video format. Allowed: {', '.join(self.allowed_formats)}")
+        try:
+            total_size = int(total_size)
+        except (TypeError, ValueError):
+            raise UploadError("total_size must be an integer")
+        if total_size <= 0 or total_size > self.max_size:
+            raise UploadError(f"Video must be between 1 byte and {self.max_size // (1024 * 1024)}MB")
+        sha256 = (sha256 or '').lower()
+        if sha256 and len(sha256) != 64:
+            raise UploadError("sha256 must be a 64 character hex digest")
+
+        upload = VideoUpload.objects.create(
+            user=user, filename=filename, total_size=total_size, sha256=sha256
+        )
+        os.makedirs(os.path.dirname(self._part_path(upload)), exist_ok=True)
+        open(self._part_path(upload), 'wb').close()
+        return upload
+
+    def write_chunk(self, upload, offset, stream, length, chunk_sha256=''):
+        """Append `length` bytes read from `stream` at `offset`; returns the new offset"""
+        from studenttracker.models import VideoUpload
+        if length <= 0 or length > self.max_chunk_size:
+            raise UploadError(f"Chunk size must be between 1 byte and {self.max_chunk_size} bytes")
+        # Cheap early answer before reading the body; checked again under the lock
+        self._check_chunk(VideoUpload.objects.get(pk=upload.pk), offset, length)
+
+        spool = self._spool_chunk(upload, stream, length, chunk_sha256)
+        try:
+            with transaction.atomic():
+                # Serialize writers of the same upload; the slow client read is already done
+                upload = VideoUpload.objects.select_for_update().get(pk=upload.pk)
+                self._check_chunk(upload, offset, length)
+                with open(self._part_path(upload), 'r+b') as part:
+                    part.seek(offset)
+                    shutil.copyfileobj(spool, part, READ_SIZE)
+                    part.truncate(offset + length)
+                upload.received_bytes = offset + length
+                upload.save(update_fields=['received_bytes', 'updated_at'])
+                return upload.received_bytes
+        finally:
+            spool.close()
+
+    @staticmethod
+    def _check_chunk(upload, offset, length):
+        if upload.status != 'uploading':
+            raise UploadError(f"Upload is {upload.status}")
+        if offset != upload.received_bytes:
+            raise UploadError(f"Expected offset {upload.received_bytes}")
+        if offset + length > upload.total_size:
+            raise UploadError("Chunk runs past the declared total_size")
+
+    def _spool_chunk(self, upload, stream, length, chunk_sha256=''):
+        """Read and verify one chunk into a temporary file next to the upload; returns it rewound"""
+        spool = tempfile.NamedTemporaryFile(dir=self._tmp_dir(), prefix=f"{upload.upload_id}.", suffix='.chunk')
+        digest = hashlib.sha256()
+        written = 0
+        try:
+            while written < length:
+                data = stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                spool.write(data)
+                digest.update(data)
+                written += len(data)
+            if written != length or (chunk_sha256 and digest.hexdigest() != chunk_sha256.lower()):
+                # Nothing was appended, so the client can resend it from the same offset
+                raise UploadError("Chunk was incomplete or failed checksum verification")
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool
+
+    def complete(self, upload):
+        """Verify the assembled file and move it under course_videos/; returns the storage name.
+
+        Safe to call again (e.g. a client retrying after a timeout): the row
+        lock makes a concurrent call wait, and it then returns the name the
+        first call stored.
+        """
+        from studenttracker.models import VideoUpload
+        with transaction.atomic():
+            upload = VideoUpload.objects.select_for_update().get(pk=upload.pk)
+            if upload.status == 'complete':
+                return upload.file_name
+            if upload.status != 'uploading':
+                raise UploadError(f"Upload is {upload.status}")
+            if upload.received_bytes != upload.total_size:
+                raise UploadError(f"Upload incomplete: {upload.received_bytes}/{upload.total_size} bytes")
+
+            path = self._part_path(upload)
+            if not upload.sha256 or self._file_sha256(path) == upload.sha256:
+                name = default_storage.get_available_name(f"course_videos/{upload.filename}")
+                destination = default_storage.path(name)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                os.replace(path, destination)  # Same filesystem: a rename, no copy
+
+                upload.file_name = name
+                upload.status = 'complete'
+                upload.save(update_fields=['file_name', 'status', 'updated_at'])
+                return name
+
+            # Committed before raising, so the client sees the upload as failed
+            upload.status = 'failed'
+            upload.save(update_fields=['status', 'updated_at'])
+            os.remove(path)
+        raise UploadError("File checksum does not match; please upload again")
+
+    @staticmethod
+    def _file_sha256(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as part:
+            for data in iter(lambda: part.read(READ_SIZE), b''):
+                digest.update(data)
+        return digest.hexdigest()
+
+    def expire_abandoned(self, log=print):
+        """Fail uploads idle for UPLOAD_EXPIRY_HOURS and delete their temporary files; returns how many"""
+        from studenttracker.models import VideoUpload
+        hours = settings.STUDYTRACK_SETTINGS.get('UPLOAD_EXPIRY_HOURS', 24)
+        cutoff = timezone.now() - timedelta(hours=hours)
+        expired = 0
+        for upload in VideoUpload.objects.filter(status='uploading', updated_at__lt=cutoff).only('id', 'upload_id'):
+            # Conditional, so a chunk that landed meanwhile keeps the upload alive
+            if VideoUpload.objects.filter(pk=upload.pk, status='uploading', updated_at__lt=cutoff).update(
+                status='failed', updated_at=timezone.now(),
+            ):
+                for path in glob.glob(os.path.join(self._tmp_dir(), f"{upload.upload_id}.*")):
+                    os.remove(path)
+                expired += 1
+        # Spooled chunks of a worker that died mid-request
+        for path in glob.glob(os.path.join(self._tmp_dir(), '*.chunk')):
+            if os.path.getmtime(path) < time.time() - hours * 3600:
+                os.remove(path)
+        if expired:
+            log(f"🧹 Expired {expired} abandoned video uploads")
+        return expired
@@ -0,0 +1,132 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from .models import (
+    Course, Enrollment, HabitNotification, StudyHabit, StudySession, Video, VideoProgress, VideoSection,
+)
+from .services.access_context import invalidate_enrolled_course_ids
+from .services.funnel_service import VideoFunnelService
+from .services.leaderboard_service import LeaderboardService
+from .services.media_processing import MediaProcessingQueue
+from .services.notification_counter import adjust_unread_count
+from .services.search_service import SearchIndex
+
+
+@receiver(post_save, sender=HabitNotification)
+def count_new_notification(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        adjust_unread_count(instance.student_id, 1)
+
+
+@receiver(post_delete, sender=HabitNotification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread_count(instance.student_id, -1)
+
+
+def _thumbnail_is_stale(instance):
+    return bool(instance.thumbnail) and instance.thumbnail_variants.get('source') != instance.thumbnail.name
+
+
+@receiver(post_save, sender=Course)
+def queue_course_media(sender, instance, **kwargs):
+    if _thumbnail_is_stale(instance):
+        MediaProcessingQueue.enqueue('course_thumbnail', instance.id)
+
+
+@receiver(post_save, sender=Video)
+def queue_video_media(sender, instance, **kwargs):
+    if _thumbnail_is_stale(instance):
+        MediaProcessingQueue.enqueue('video_thumbnail', instance.id)
+    if instance.video_file and not instance.duration:
+        MediaProcessingQueue.enqueue('video_duration', instance.id)
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, **kwargs):
+    SearchIndex().index_course(instance)
+
+
+@receiver(post_save, sender=VideoSection)
+def index_section(sender, instance, **kwargs):
+    SearchIndex().index_section(instance)
+
+
+@receiver(post_save, sender=Video)
+def index_video(sender, instance, **kwargs):
+    SearchIndex().index_video(instance)
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    SearchIndex().remove('course', instance.id)
+
+
+@receiver(post_delete, sender=Video)
+def unindex_video(sender, instance, **kwargs):
+    SearchIndex().remove('video', instance.id)
+
+
+# Leaderboards: only queue the student here; the leaderboard_updates job
+# re-ranks each queued student once (LeaderboardService.apply_pending)
+@receiver([post_save, post_delete], sender=StudySession)
+def rank_study_hours(sender, instance, **kwargs):
+    LeaderboardService.mark_changed('study_hours', instance.student_id)
+
+
+@receiver([post_save, post_delete], sender=StudyHabit)
+def rank_habit_streak(sender, instance, **kwargs):
+    LeaderboardService.mark_changed('habit_streak', instance.student_id)
+
+
+@receiver(post_init, sender=Enrollment)
+def remember_completion(sender, instance, **kwargs):
+    instance._ranked_completed = instance.pk is not None and instance.completed_at is not None
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def rank_courses_completed(sender, instance, **kwargs):
+    completed = kwargs.get('signal') is not post_delete and instance.completed_at is not None
+    if completed == instance._ranked_completed:
+        return  # Progress-only saves leave the count of completed courses alone
+    instance._ranked_completed = completed
+    LeaderboardService.mark_changed('courses_completed', instance.user_id)
+
+
+@receiver(post_init, sender=VideoProgress)
+def remember_watched_duration(sender, instance, **kwargs):
+    instance._ranked_duration = instance.watched_duration if instance.pk else 0
+
+
+@receiver([post_save, post_delete], sender=VideoProgress)
+def rank_course_watch_hours(sender, instance, **kwargs):
+    watched = 0 if kwargs.get('signal') is post_delete else instance.watched_duration
+    if watched == instance._ranked_duration:
+        return  # Course watch hours only depend on watched_duration
+    instance._ranked_duration = watched
+    if VideoProgress.video.is_cached(instance) and Video.section.is_cached(instance.video):
+        course_id = instance.video.section.course_id
+    else:
+        course_id = Video.objects.filter(id=instance.video_id).values_list('section__course_id', flat=True).first()
+    if course_id:
+        LeaderboardService.mark_changed('course_watch_hours', instance.user_id, course_id)
+
+
+@receiver(post_save, sender=VideoProgress)
+def stale_video_funnel(sender, instance, **kwargs):
+    VideoFunnelService.mark_video_stale(instance.video_id)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def stale_course_funnels(sender, instance, **kwargs):
+    VideoFunnelService.mark_course_stale(instance.course_id)
+
+
+@receiver(post_save, sender=Enrollment)
+def refresh_enrolled_courses(sender, instance, created, **kwargs):
+    if created:
+        invalidate_enrolled_course_ids(instance.user_id)
+
+
+@receiver(post_delete, sender=Enrollment)
+def drop_enrolled_course(sender, instance, **kwargs):
+    invalidate_enrolled_course_ids(instance.user_id)
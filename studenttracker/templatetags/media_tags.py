@@ -0,0 +1,35 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_thumbnail(obj, width, alt='', css_class=''):
+    """Render obj.thumbnail as a <picture> using the variants built by process_media_jobs.
+
+    The browser gets WebP and JPEG srcsets and picks the smallest file that
+    fills `width` CSS pixels at its pixel density. Until the worker has run,
+    the original upload is used as-is.
+    """
+    thumbnail = getattr(obj, 'thumbnail', None)
+    if not thumbnail:
+        return ''
+    width = int(width)
+    variants = getattr(obj, 'thumbnail_variants', None) or {}
+    sizes = sorted(int(key) for key in variants if key.isdigit())
+    if variants.get('source') != thumbnail.name or not sizes:
+        return format_html('<img src="{}" alt="{}" width="{}" class="{}" loading="lazy">',
+                           thumbnail.url, alt, width, css_class)
+
+    def srcset(fmt):
+        return ', '.join(f"{default_storage.url(variants[str(size)][fmt])} {size}w" for size in sizes)
+
+    fallback = next((size for size in sizes if size >= width), sizes[-1])
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}px">'
+        '<img src="{}" srcset="{}" sizes="{}px" alt="{}" width="{}" class="{}" loading="lazy"></picture>',
+        srcset('webp'), width,
+        default_storage.url(variants[str(fallback)]['jpeg']), srcset('jpeg'), width, alt, width, css_class,
+    )
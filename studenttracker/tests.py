@@ -1,3 +1,731 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.db import OperationalError, connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .management.commands.benchmark_email_delivery import StandInSMTPServer
+from .management.commands.send_study_notifications import Command as SendStudyNotifications
+from .models import (
+    Course, Enrollment, HabitNotification, LeaderboardEntry, PendingLeaderboardUpdate, ScheduledJobRun, SchedulerLock,
+    StudySession, User, Video, VideoProgress, VideoSection, VideoUpload,
+)
+from .services import access_context, notification_counter, search_service
+from .services.analytics_service import AdminAnalyticsService
+from .services.email_delivery import AsyncEmailDelivery, _SmtplibSession, deliver_emails
+from .services.leaderboard_service import LeaderboardService
+from .services.reminder_engine import ReminderEngine
+from .services.login_throttle import get_client_ip
+from .services.notification_scheduler import NotificationScheduler
+from .services.retention_service import HistoryArchiver
+from .services.video_streaming import parse_range, preview_url, read_preview_token
+from .services.video_upload_service import ChunkedVideoUploadService, UploadError
+
+
+def studytrack_settings(**overrides):
+    return override_settings(STUDYTRACK_SETTINGS=dict(settings.STUDYTRACK_SETTINGS, **overrides))
+
+
+# -------------------------------------------
+# SCHEDULER
+# -------------------------------------------
+# Transactional: the lease heartbeat writes from its own thread and connection
+@studytrack_settings(SCHEDULER_LOCK_TTL_SECONDS=0.3)
+class NotificationSchedulerLeaseTests(TransactionTestCase):
+    def scheduler(self, func):
+        return NotificationScheduler({'job': (1, func)}, log=lambda message: None)
+
+    def test_only_one_process_holds_the_lock(self):
+        leader = self.scheduler(lambda slot: True)
+        standby = self.scheduler(lambda slot: True)
+        self.assertTrue(leader.acquire_lock())
+        self.assertFalse(standby.acquire_lock())
+        leader.release_lock()
+        self.assertTrue(standby.acquire_lock())
+
+    def test_expired_lock_is_taken_over(self):
+        leader = self.scheduler(lambda slot: True)
+        standby = self.scheduler(lambda slot: True)
+        self.assertTrue(leader.acquire_lock())
+        SchedulerLock.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(standby.acquire_lock())
+
+    def test_lock_is_kept_while_a_long_job_runs(self):
+        takeovers = []
+        standby = self.scheduler(lambda slot: True)
+
+        def long_job(slot):
+            # Several lease lengths; the standby keeps trying the whole time
+            for _ in range(8):
+                time.sleep(0.15)
+                try:
+                    takeovers.append(standby.acquire_lock())
+                except OperationalError:
+                    pass  # SQLite test database: table briefly locked by the heartbeat thread
+            return True
+
+        leader = self.scheduler(long_job)
+        self.assertTrue(leader.acquire_lock())
+        ScheduledJobRun.objects.create(job_name='job', last_slot=timezone.now() - timedelta(minutes=1, seconds=30))
+        leader.run_pending()
+
+        self.assertTrue(takeovers)
+        self.assertNotIn(True, takeovers)
+        self.assertEqual(ScheduledJobRun.objects.get(job_name='job').last_status, 'success')
+
+
+    def test_renewal_error_is_retried_not_fatal(self):
+        messages = []
+        leader = NotificationScheduler({'job': (1, lambda slot: time.sleep(0.5) is None)}, log=messages.append)
+        renew = leader.acquire_lock
+        calls = []
+
+        def flaky_renew():
+            calls.append(1)
+            if len(calls) == 2:  # The first renewal from the heartbeat thread
+                raise OperationalError('database went away')
+            return renew()
+
+        leader.acquire_lock = flaky_renew
+        ScheduledJobRun.objects.create(job_name='job', last_slot=timezone.now() - timedelta(minutes=1, seconds=30))
+        self.assertIsNotNone(leader.run_pending())
+        self.assertTrue(any('Could not renew' in message for message in messages))
+        self.assertEqual(ScheduledJobRun.objects.get(job_name='job').last_status, 'success')
+
+    def test_lost_lease_stops_the_runner(self):
+        ran = []
+
+        def taken_over(slot):
+            SchedulerLock.objects.update(owner='someone-else', expires_at=timezone.now() + timedelta(hours=1))
+            time.sleep(0.5)
+            ran.append('first')
+            return True
+
+        leader = NotificationScheduler(
+            {'first': (1, taken_over), 'second': (1, lambda slot: ran.append('second') is None)}, log=lambda message: None,
+        )
+        self.assertTrue(leader.acquire_lock())
+        for name in ('first', 'second'):
+            ScheduledJobRun.objects.create(job_name=name, last_slot=timezone.now() - timedelta(minutes=1, seconds=30))
+        self.assertIsNone(leader.run_pending())
+        self.assertEqual(ran, ['first'])
+
+
+# -------------------------------------------
+# SLOT AUDIENCES
+# -------------------------------------------
+@studytrack_settings(REMINDER_CHUNK_SIZE=2)
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SlotAudienceBatchingTests(TestCase):
+    def setUp(self):
+        # utc_offset_minutes follows the timezone on save; UTC students see 07:00 at 07:00 UTC
+        self.students = [
+            User.objects.create_user(username=f'slot{i}', email=f'slot{i}@example.com', password='x', timezone='UTC')
+            for i in range(5)
+        ]
+        User.objects.create_user(username='elsewhere', email='elsewhere@example.com', password='x', timezone='Asia/Tokyo')
+        self.tick = timezone.now().replace(hour=7, minute=0, second=0, microsecond=0)
+
+    def test_local_slot_hands_the_audience_over_in_batches(self):
+        batches = []
+        result = SendStudyNotifications().run_local_slot(
+            '07:00', 15, ['individual'], lambda users: batches.append(sorted(users.values_list('id', flat=True))), self.tick,
+        )
+        self.assertTrue(result)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(sum(batches, []), [student.id for student in self.students])
+
+    def test_reminder_engine_pages_through_the_audience(self):
+        contexts = []
+        engine = ReminderEngine(lambda user: contexts.append(user.id) or {'user': user})
+        with mock.patch('studenttracker.services.reminder_engine.deliver_emails', side_effect=lambda emails: [True] * len(emails)):
+            sent = engine.send(['morning'], User.objects.filter(username__startswith='slot'))
+        self.assertEqual(sent, {'morning': 5})
+        self.assertEqual(contexts, [student.id for student in self.students])
+
+
+# -------------------------------------------
+# EMAIL DELIVERY
+# -------------------------------------------
+class AsyncEmailDeliveryTests(SimpleTestCase):
+    def setUp(self):
+        self.server = StandInSMTPServer(rejects={'flaky@example.com': 1, 'bounce@example.com': 99})
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def delivery(self, **kwargs):
+        return AsyncEmailDelivery(
+            host='127.0.0.1', port=self.server.port, use_tls=False, use_ssl=False,
+            username=None, password=None, timeout=5, **kwargs,
+        )
+
+    def messages(self, recipients):
+        return [EmailMessage(f'Subject {i}', 'Body', 'noreply@example.com', [to]) for i, to in enumerate(recipients)]
+
+    def test_reports_each_message_in_order(self):
+        recipients = [f'student{i}@example.com' for i in range(20)]
+        results = self.delivery(concurrency=4, queue_size=5).deliver(self.messages(recipients))
+
+        self.assertEqual([result['recipients'] for result in results], [[to] for to in recipients])
+        self.assertTrue(all(result['status'] == 'sent' and result['attempts'] == 1 for result in results))
+        self.assertEqual(self.server.received, 20)
+
+    def test_retries_once_then_gives_up(self):
+        recipients = ['ok@example.com', 'flaky@example.com', 'bounce@example.com']
+        results = self.delivery(concurrency=1).deliver(self.messages(recipients))
+
+        self.assertEqual([(r['status'], r['attempts']) for r in results], [('sent', 1), ('sent', 2), ('failed', 2)])
+        self.assertTrue(results[2]['error'])
+        self.assertEqual(self.server.received, 2)
+
+    def test_blocking_smtplib_fallback(self):
+        delivery = self.delivery(concurrency=2)
+        delivery.session_class = _SmtplibSession
+        results = delivery.deliver(self.messages(['a@example.com', 'flaky@example.com']))
+
+        self.assertEqual([(r['status'], r['attempts']) for r in results], [('sent', 1), ('sent', 2)])
+
+    def test_queue_bounds_how_far_rendering_runs_ahead(self):
+        self.server.latency = 0.01
+        concurrency, queue_size = 2, 3
+        ahead = []
+
+        def produce():
+            for index, message in enumerate(self.messages([f's{i}@example.com' for i in range(30)])):
+                # Messages handed over but not yet accepted by the server
+                ahead.append(index - self.server.received)
+                yield message
+
+        results = self.delivery(concurrency=concurrency, queue_size=queue_size).deliver(produce())
+
+        self.assertEqual(len(results), 30)
+        # Queued messages plus one in flight per session (and the one being put)
+        self.assertLessEqual(max(ahead), queue_size + concurrency + 1)
+
+
+class AsyncEmailRenderingTests(TestCase):
+    def setUp(self):
+        self.server = StandInSMTPServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def test_messages_are_built_on_the_calling_thread(self):
+        User.objects.create_user(username='rendered', email='rendered@example.com', password='x')
+
+        def produce():
+            for i in range(5):
+                # ORM access while building a message, as templates and contexts do
+                count = User.objects.filter(username='rendered').count()
+                yield EmailMessage(f'Subject {i}', f'{count} student', 'noreply@example.com', [f's{i}@example.com'])
+
+        results = AsyncEmailDelivery(
+            host='127.0.0.1', port=self.server.port, use_tls=False, use_ssl=False,
+            username=None, password=None, timeout=5, concurrency=2,
+        ).deliver(produce())
+        self.assertEqual([result['status'] for result in results], ['sent'] * 5)
+
+    def test_failure_part_way_keeps_the_outcomes_already_sent(self):
+        emails = [EmailMessage('Hi', 'Body', 'noreply@example.com', [f's{i}@example.com']) for i in range(2)]
+        emails.append(('Broken', 'studenttracker/emails/does_not_exist.html', {}, ['s2@example.com']))
+        with override_settings(
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server.port, EMAIL_USE_TLS=False, EMAIL_HOST_USER=None,
+            STUDYTRACK_SETTINGS=dict(settings.STUDYTRACK_SETTINGS, ASYNC_EMAIL_DELIVERY=True, ASYNC_EMAIL_CONCURRENCY=1),
+        ):
+            self.assertEqual(deliver_emails(emails), [True, True, False])
+        self.assertEqual(self.server.received, 2)
+
+
+# -------------------------------------------
+# RETENTION
+# -------------------------------------------
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class HistoryArchiverTests(TestCase):
+    def test_deletes_in_batches_without_per_row_signals(self):
+        student = User.objects.create_user(username='archived', email='archived@example.com', password='x')
+        HabitNotification.objects.bulk_create([
+            HabitNotification(student=student, notification_type='study_tip', title=f'Tip {i}', message='...', is_read=i % 2 == 0)
+            for i in range(40)
+        ])
+        HabitNotification.objects.update(created_at=timezone.now() - timedelta(days=365))
+        keep = HabitNotification.objects.create(student=student, notification_type='study_tip', title='New', message='...')
+
+        archiver = HistoryArchiver(batch_size=25, log=lambda message: None)
+        archiver.pause = 0
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            moved, _ = archiver.archive(
+                archiver.notification_queryset(), archiver.NOTIFICATION_FIELDS, 'habit_notifications',
+                on_delete=archiver._notifications_deleted,
+            )
+
+        self.assertEqual(moved, 40)
+        self.assertEqual(list(HabitNotification.objects.values_list('id', flat=True)), [keep.id])
+        # Per batch: one SELECT and one DELETE (+ savepoints), never one query per row
+        self.assertLess(len(queries), 15)
+
+
+# -------------------------------------------
+# CHUNKED UPLOADS
+# -------------------------------------------
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+@studytrack_settings(ALLOWED_VIDEO_FORMATS=['mp4'], UPLOAD_CHUNK_MAX_SIZE=1024)
+class ChunkedVideoUploadTests(TestCase):
+    def setUp(self):
+        self.service = ChunkedVideoUploadService()
+        self.user = User.objects.create_user(username='uploader', email='uploader@example.com', password='x')
+        self.data = os.urandom(2500)
+        self.upload = self.service.start(self.user, 'lecture.mp4', len(self.data), hashlib.sha256(self.data).hexdigest())
+
+    def send(self, offset, length, sha256=''):
+        return self.service.write_chunk(self.upload, offset, io.BytesIO(self.data[offset:offset + length]), length, sha256)
+
+    def test_chunks_append_at_the_resume_offset(self):
+        self.assertEqual(self.send(0, 1000), 1000)
+        self.assertEqual(self.send(1000, 1000), 2000)
+        self.assertEqual(self.send(2000, 500), 2500)
+        name = self.service.complete(VideoUpload.objects.get(pk=self.upload.pk))
+        with open(os.path.join(settings.MEDIA_ROOT, name), 'rb') as assembled:
+            self.assertEqual(assembled.read(), self.data)
+
+    def test_complete_again_returns_the_stored_name(self):
+        for offset in (0, 1000, 2000):
+            self.send(offset, min(1000, len(self.data) - offset))
+        name = self.service.complete(self.upload)
+        # A retry with the caller's stale copy of the row
+        self.assertEqual(self.service.complete(self.upload), name)
+        self.assertEqual(VideoUpload.objects.get(pk=self.upload.pk).status, 'complete')
+
+    def test_checksum_mismatch_fails_the_upload(self):
+        self.send(0, 1000)
+        self.send(1000, 1000)
+        self.service.write_chunk(self.upload, 2000, io.BytesIO(b'x' * 500), 500)
+        with self.assertRaisesMessage(UploadError, 'checksum does not match'):
+            self.service.complete(self.upload)
+        self.assertEqual(VideoUpload.objects.get(pk=self.upload.pk).status, 'failed')
+        self.assertFalse(os.path.exists(self.service._part_path(self.upload)))
+
+    def test_out_of_order_chunk_is_rejected(self):
+        self.send(0, 1000)
+        with self.assertRaisesMessage(UploadError, 'Expected offset 1000'):
+            self.send(0, 1000)
+        with self.assertRaisesMessage(UploadError, 'Expected offset 1000'):
+            self.send(2000, 500)
+
+    def test_bad_or_short_chunk_leaves_the_offset(self):
+        self.send(0, 1000)
+        with self.assertRaises(UploadError):
+            self.send(1000, 1000, sha256='0' * 64)
+        with self.assertRaises(UploadError):
+            self.service.write_chunk(self.upload, 1000, io.BytesIO(self.data[1000:1500]), 1000)
+        self.assertEqual(VideoUpload.objects.get(pk=self.upload.pk).received_bytes, 1000)
+        self.assertEqual(self.send(1000, 1000), 2000)
+        # Failed chunks leave no spool files behind
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_ROOT, 'uploads_tmp')), [f'{self.upload.upload_id}.part'])
+
+    def test_chunk_past_total_size_is_rejected(self):
+        self.send(0, 1000)
+        self.send(1000, 1000)
+        with self.assertRaisesMessage(UploadError, 'past the declared total_size'):
+            self.service.write_chunk(self.upload, 2000, io.BytesIO(b'x' * 1000), 1000)
+
+    def test_abandoned_uploads_expire(self):
+        self.send(0, 1000)
+        VideoUpload.objects.filter(pk=self.upload.pk).update(updated_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(self.service.expire_abandoned(log=lambda message: None), 1)
+        self.assertEqual(VideoUpload.objects.get(pk=self.upload.pk).status, 'failed')
+        self.assertFalse(os.path.exists(self.service._part_path(self.upload)))
+
+
+# -------------------------------------------
+# LOGIN THROTTLE
+# -------------------------------------------
+@studytrack_settings(LOGIN_THROTTLE=dict(
+    settings.STUDYTRACK_SETTINGS['LOGIN_THROTTLE'], IP_ATTEMPTS=4, EMAIL_ATTEMPTS=2,
+    CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR', TRUSTED_PROXIES=1,
+))
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])  # Not 1M PBKDF2 rounds per login
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(
+            username='throttled', email='throttled@example.com', password='right-password', first_name='T',
+        )
+
+    def login(self, email, password, forwarded_for='203.0.113.7'):
+        return self.client.post(
+            '/login/', {'email': email, 'password': password},
+            REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR=forwarded_for,
+        )
+
+    def test_email_is_refused_after_its_attempts(self):
+        self.login('throttled@example.com', 'wrong')
+        self.login('throttled@example.com', 'wrong')
+        self.assertEqual(self.login('throttled@example.com', 'right-password').status_code, 429)
+
+    def test_successful_login_resets_the_email(self):
+        self.login('throttled@example.com', 'wrong')
+        self.assertEqual(self.login('throttled@example.com', 'right-password').status_code, 302)
+        self.client.logout()
+        self.login('throttled@example.com', 'wrong')
+        self.assertEqual(self.login('throttled@example.com', 'right-password').status_code, 302)
+
+    def test_ip_counts_the_proxied_client_not_the_proxy(self):
+        for i in range(4):
+            # Forged left-hand entries change every time; the proxy's entry does not
+            self.login(f'nobody{i}@example.com', 'wrong', forwarded_for=f'198.51.100.{i}, 203.0.113.7')
+        self.assertEqual(self.login('throttled@example.com', 'right-password').status_code, 429)
+        # Another client behind the same proxy is unaffected
+        self.assertEqual(self.login('throttled@example.com', 'right-password', forwarded_for='203.0.113.8').status_code, 302)
+
+    def test_client_ip_falls_back_to_remote_addr(self):
+        factory = RequestFactory()
+        self.assertEqual(get_client_ip(factory.get('/', REMOTE_ADDR='10.0.0.2')), '10.0.0.2')
+        self.assertEqual(get_client_ip(factory.get('/', REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR='203.0.113.7')), '203.0.113.7')
+
+
+# -------------------------------------------
+# UNREAD COUNTER
+# -------------------------------------------
+@mock.patch.object(notification_counter, 'cache_is_shared', return_value=True)
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='unread', email='unread@example.com', password='x')
+
+    def notify(self):
+        return HabitNotification.objects.create(student=self.student, notification_type='study_tip', title='Tip', message='...')
+
+    def test_counter_follows_committed_changes(self, shared):
+        self.assertEqual(notification_counter.get_unread_count(self.student.id), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.notify()
+            self.notify()
+        self.assertEqual(notification_counter.get_unread_count(self.student.id), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            notification_counter.mark_read(self.student.id, [first.id])
+        self.assertEqual(notification_counter.get_unread_count(self.student.id), 1)
+
+    def test_rolled_back_change_leaves_the_counter(self, shared):
+        self.assertEqual(notification_counter.get_unread_count(self.student.id), 0)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.notify()
+                    raise OperationalError('rolled back')
+            except OperationalError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(notification_counter.get_unread_count(self.student.id), 0)
+
+    def test_seeding_never_overwrites_a_newer_value(self, shared):
+        key = notification_counter._unread_key(self.student.id)
+        real_get = cache.get
+
+        def get_then_concurrent_seed(k, *args):
+            value = real_get(k, *args)
+            if k == key and value is None:
+                cache.set(key, 7)  # Another worker seeded and adjusted it while we counted
+            return value
+
+        with mock.patch.object(cache, 'get', side_effect=get_then_concurrent_seed):
+            self.assertEqual(notification_counter.get_unread_count(self.student.id), 7)
+        self.assertEqual(cache.get(key), 7)
+
+
+# -------------------------------------------
+# ENROLLMENT ACCESS
+# -------------------------------------------
+# LocMemCache stands in for Redis here: every test runs in one process
+@mock.patch.object(access_context, 'cache_is_shared', return_value=True)
+class EnrolledCourseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='enrolled', email='enrolled@example.com', password='x')
+        self.course = Course.objects.create(title='Cached')
+
+    def test_enrollment_change_retires_the_cached_set(self, shared):
+        self.assertEqual(access_context.get_enrolled_course_ids(self.student.id), frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = Enrollment.objects.create(user=self.student, course=self.course)
+        self.assertEqual(access_context.get_enrolled_course_ids(self.student.id), {self.course.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.delete()
+        self.assertEqual(access_context.get_enrolled_course_ids(self.student.id), frozenset())
+
+    def test_slow_reader_cannot_write_back_an_old_set(self, shared):
+        stale_version = cache.get_or_set(access_context._version_key(self.student.id), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(user=self.student, course=self.course)
+        # A reader that loaded the set before the enrollment stores it late
+        cache.set(access_context._enrolled_key(self.student.id, stale_version), frozenset())
+        self.assertEqual(access_context.get_enrolled_course_ids(self.student.id), {self.course.id})
+
+    def test_second_enroll_with_a_stale_set_is_not_an_error(self, shared):
+        self.client.force_login(self.student)
+        access_context.get_enrolled_course_ids(self.student.id)
+        # Enrolled by another request whose invalidation has not landed yet
+        Enrollment.objects.bulk_create([Enrollment(user=self.student, course=self.course)])
+
+        response = self.client.get(f'/course/{self.course.id}/enroll/')
+        self.assertRedirects(response, f'/course/{self.course.id}/', fetch_redirect_response=False)
+        self.assertEqual(Enrollment.objects.filter(user=self.student).count(), 1)
+
+    def test_without_a_shared_cache_the_database_is_read(self, shared):
+        shared.return_value = False
+        access_context.get_enrolled_course_ids(self.student.id)
+        Enrollment.objects.bulk_create([Enrollment(user=self.student, course=self.course)])
+        self.assertEqual(access_context.get_enrolled_course_ids(self.student.id), {self.course.id})
+
+
+# -------------------------------------------
+# ANALYTICS
+# -------------------------------------------
+class SectionFunnelTests(TestCase):
+    def test_counts_students_who_finished_every_video(self):
+        course = Course.objects.create(title='Funnels')
+        section = VideoSection.objects.create(course=course, title='Basics')
+        empty = VideoSection.objects.create(course=course, title='Later', order=1)
+        videos = [Video.objects.create(section=section, title=f'Part {i}', order=i) for i in range(3)]
+        students = [User.objects.create_user(username=f'funnel{i}', email=f'funnel{i}@example.com', password='x') for i in range(3)]
+        for video in videos:
+            VideoProgress.objects.create(user=students[0], video=video, is_completed=True)
+        VideoProgress.objects.create(user=students[1], video=videos[0], is_completed=True)
+        VideoProgress.objects.create(user=students[1], video=videos[1], is_completed=True)
+        VideoProgress.objects.create(user=students[2], video=videos[2])
+
+        with self.assertNumQueries(1):
+            funnels = AdminAnalyticsService().section_funnels()
+
+        self.assertEqual(
+            [(row['id'], row['video_count'], row['started'], row['completed'], row['completion_rate']) for row in funnels],
+            [(section.id, 3, 3, 1, 33.3), (empty.id, 0, 0, 0, 0)],
+        )
+
+
+    def test_courses_finished_through_the_view_count_as_completed(self):
+        section = VideoSection.objects.create(course=Course.objects.create(title='Analytics'), title='Only')
+        videos = [Video.objects.create(section=section, title=f'Part {i}', order=i, duration=60) for i in range(2)]
+        finisher, dropout = [
+            User.objects.create_user(username=f'analytics{i}', email=f'analytics{i}@example.com', password='x') for i in range(2)
+        ]
+        for student in (finisher, dropout):
+            Enrollment.objects.create(user=student, course=section.course)
+        self.client.force_login(finisher)
+        for video in videos:
+            self.client.post(f'/video/{video.id}/mark-completed/')
+        self.client.force_login(dropout)
+        self.client.post(f'/video/{videos[0].id}/mark-completed/')
+
+        summary = AdminAnalyticsService().compute_summary()
+        self.assertEqual(summary['totals']['completed_enrollments'], 1)
+        course = next(row for row in summary['courses'] if row['id'] == section.course_id)
+        self.assertEqual((course['enrolled'], course['completed'], course['completion_rate']), (2, 1, 50.0))
+
+
+# -------------------------------------------
+# SEARCH
+# -------------------------------------------
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.weak = Course.objects.create(title='Cooking', description='python basics for kitchens')
+        self.strong = Course.objects.create(title='Python basics', description='Start here')
+        self.index = search_service.SearchIndex()
+
+    def test_candidate_cap_keeps_the_best_matches(self):
+        with mock.patch.object(search_service, 'MAX_CANDIDATES', 1):
+            hits = self.index.ranked_ids('python basics', 'course', include_unpublished=True)
+        self.assertEqual([object_id for object_id, _ in hits], [self.strong.id])
+
+    def test_rebuild_matches_the_incremental_index(self):
+        before = self.index.ranked_ids('python basics', 'course', include_unpublished=True)
+        self.index.rebuild(log=lambda message: None)
+        self.assertEqual(self.index.ranked_ids('python basics', 'course', include_unpublished=True), before)
+        self.assertEqual([object_id for object_id, _ in before], [self.strong.id, self.weak.id])
+
+
+# -------------------------------------------
+# METRICS EXPORT
+# -------------------------------------------
+@studytrack_settings(METRICS_TOKEN='scrape-secret')
+class NotificationMetricsExportTests(TestCase):
+    def scrape(self, token):
+        return self.client.get('/metrics/notifications/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_token_is_required(self):
+        self.assertEqual(self.scrape('scrape-secret').status_code, 200)
+        self.assertEqual(self.scrape('wrong').status_code, 403)
+
+    def test_non_ascii_token_is_refused_not_an_error(self):
+        self.assertEqual(self.scrape('scrape-sécret').status_code, 403)
+
+
+# -------------------------------------------
+# LEADERBOARDS
+# -------------------------------------------
+class LeaderboardRankTests(TestCase):
+    def setUp(self):
+        self.service = LeaderboardService()
+        self.students = [
+            User.objects.create_user(username=f'ranked{i}', email=f'ranked{i}@example.com', password='x', role='student')
+            for i in range(4)
+        ]
+
+    def study(self, student, minutes):
+        with self.captureOnCommitCallbacks(execute=True):
+            session = StudySession.objects.create(student=student, duration_minutes=minutes)
+        self.service.apply_pending(log=lambda message: None)
+        return session
+
+    def board(self):
+        return list(LeaderboardEntry.objects.filter(metric='study_hours').order_by('rank', 'user_id').values_list('user_id', 'rank'))
+
+    def assertMatchesRebuild(self):
+        incremental = self.board()
+        self.service.rebuild(log=lambda message: None)
+        self.assertEqual(incremental, self.board())
+
+    def test_ranks_move_up_down_and_tie(self):
+        a, b, c, d = self.students
+        self.study(a, 120)
+        self.study(b, 60)
+        self.study(c, 60)
+        self.assertEqual(self.board(), [(a.id, 1), (b.id, 2), (c.id, 2)])
+
+        self.study(d, 180)  # New leader pushes everyone down
+        self.study(c, 120)  # 3h overtakes a and ties d
+        self.assertEqual(self.board(), [(c.id, 1), (d.id, 1), (a.id, 3), (b.id, 4)])
+        self.assertMatchesRebuild()
+
+    def test_removed_value_leaves_the_board(self):
+        a, b, c, _ = self.students
+        session = self.study(a, 120)
+        self.study(b, 60)
+        self.study(c, 30)
+        with self.captureOnCommitCallbacks(execute=True):
+            session.delete()
+        self.service.apply_pending(log=lambda message: None)
+
+        self.assertEqual(self.board(), [(b.id, 1), (c.id, 2)])
+        self.assertMatchesRebuild()
+
+    def test_changes_are_queued_once_per_student(self):
+        student = self.students[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            for minutes in (10, 20, 30):
+                StudySession.objects.create(student=student, duration_minutes=minutes)
+        self.assertEqual(PendingLeaderboardUpdate.objects.count(), 1)
+        self.assertFalse(LeaderboardEntry.objects.exists())
+
+        self.assertEqual(self.service.apply_pending(log=lambda message: None), 1)
+        self.assertEqual(self.service.position('study_hours', student.id)['value'], 1.0)
+        self.assertFalse(PendingLeaderboardUpdate.objects.exists())
+
+    def test_finishing_a_course_through_the_view_ranks_it(self):
+        student = self.students[0]
+        section = VideoSection.objects.create(course=Course.objects.create(title='Finished'), title='Only')
+        videos = [Video.objects.create(section=section, title=f'Part {i}', order=i, duration=60) for i in range(2)]
+        enrollment = Enrollment.objects.create(user=student, course=section.course)
+        self.client.force_login(student)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/video/{videos[0].id}/mark-completed/')
+        self.assertIsNone(Enrollment.objects.get(pk=enrollment.pk).completed_at)
+        PendingLeaderboardUpdate.objects.filter(metric='courses_completed').delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/video/{videos[1].id}/mark-completed/')
+        self.assertIsNotNone(Enrollment.objects.get(pk=enrollment.pk).completed_at)
+        self.assertTrue(PendingLeaderboardUpdate.objects.filter(metric='courses_completed', user=student).exists())
+        self.service.apply_pending(log=lambda message: None)
+        self.assertEqual(self.service.position('courses_completed', student.id)['value'], 1)
+
+    def test_unchanged_watch_time_is_not_queued(self):
+        video = Video.objects.create(
+            section=VideoSection.objects.create(course=Course.objects.create(title='Ranked'), title='One'),
+            title='Intro', duration=600,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            progress = VideoProgress.objects.create(user=self.students[0], video=video, watched_duration=600)
+        self.assertEqual(list(PendingLeaderboardUpdate.objects.values_list('metric', 'course_id')),
+                         [('course_watch_hours', video.section.course_id)])
+
+        PendingLeaderboardUpdate.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            progress = VideoProgress.objects.get(pk=progress.pk)
+            progress.is_completed = True
+            progress.save()
+        self.assertFalse(PendingLeaderboardUpdate.objects.exists())
+
+
+# -------------------------------------------
+# VIDEO STREAMING
+# -------------------------------------------
+class ParseRangeTests(SimpleTestCase):
+    def test_satisfiable_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=500-', 1000), (500, 999))
+        self.assertEqual(parse_range('bytes=900-5000', 1000), (900, 999))  # End clamped to the file
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))  # Final 100 bytes
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_whole_file_when_missing_or_unsupported(self):
+        for header in [None, '', 'bytes=-', 'bytes=0-1,5-9', 'items=0-9', 'bytes=a-b']:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1000))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ['bytes=1000-', 'bytes=5000-6000', 'bytes=10-5', 'bytes=-0']:
+            with self.subTest(header=header):
+                self.assertIs(parse_range(header, 1000), False)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+@studytrack_settings(PREVIEW_URL_SECONDS=3600, VIDEO_STREAM_OFFLOAD=None)
+class PreviewTokenTests(TestCase):
+    def setUp(self):
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'course_videos'), exist_ok=True)
+        with open(os.path.join(settings.MEDIA_ROOT, 'course_videos', 'preview.mp4'), 'wb') as handle:
+            handle.write(b'0123456789' * 100)
+        section = VideoSection.objects.create(course=Course.objects.create(title='Preview'), title='Intro')
+        self.video = Video.objects.create(section=section, title='Trailer', is_preview=True, video_file='course_videos/preview.mp4')
+
+    def token(self, url):
+        return url.rstrip('/').rsplit('/', 1)[-1]
+
+    def test_url_is_shared_within_a_window_and_expires_after_one_to_two(self):
+        with mock.patch('time.time', return_value=7200 + 10):
+            first = preview_url(self.video)
+        with mock.patch('time.time', return_value=7200 + 3500):
+            self.assertEqual(preview_url(self.video), first)
+
+        with mock.patch('time.time', return_value=7200 + 3500):
+            _, name, expires = read_preview_token(self.token(first))
+        self.assertEqual((name, expires), ('course_videos/preview.mp4', 4 * 3600))  # End of the next window
+        with mock.patch('time.time', return_value=expires - 1):
+            self.assertIsNotNone(read_preview_token(self.token(first)))
+        with mock.patch('time.time', return_value=expires):
+            self.assertIsNone(read_preview_token(self.token(first)))
+
+    def test_forged_token_is_refused(self):
+        token = self.token(preview_url(self.video))
+        self.assertIsNone(read_preview_token(token[:-2] + ('AA' if not token.endswith('AA') else 'BB')))
+
+    def test_link_streams_ranges_until_it_expires(self):
+        url = preview_url(self.video)
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('public', response['Cache-Control'])
+
+        with mock.patch('time.time', return_value=time.time() + 2 * 3600):
+            self.assertEqual(self.client.get(url).status_code, 403)
@@ -1,13 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.db import IntegrityError
-from django.http import JsonResponse
+from django.db.models import Prefetch
+from django.db.models.fields.files import FieldFile
+from django.http import HttpResponse, JsonResponse, Http404, HttpResponseForbidden
 from django.utils import timezone
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_POST
+import hmac
+import time
 import re
-from .models import User, Course, Task, HabitNotification, VideoSection, Video, Enrollment, VideoProgress
+from zoneinfo import available_timezones
+from .models import User, Course, Task, HabitNotification, VideoSection, Video, Enrollment, VideoProgress, VideoUpload
 from .services.notification_service import StudyHabitNotificationService
+from .services.notification_counter import get_unread_count, mark_read
+from .services.analytics_service import AdminAnalyticsService
+from .services.notification_metrics import notification_metrics
+from .services.login_throttle import LoginThrottle, get_client_ip
+from .services.leaderboard_service import COURSE_METRICS, GLOBAL_METRICS, LeaderboardService
+from .services.recommendation_service import CourseRecommender
+from .services.request_metrics import metrics_store
+from .services.search_service import SearchIndex
+from .services.video_streaming import preview_url, read_preview_token, stream_file
+from .services.video_upload_service import ChunkedVideoUploadService, UploadError
 
 # -------------------------------------------
 # HOME PAGE
@@ -26,6 +45,9 @@ def register_user(request):
         password = request.POST.get('password', '')
         confirm = request.POST.get('confirm', '')
         education = request.POST.get('education', '').strip()
+        user_timezone = request.POST.get('timezone', '').strip()
+        if user_timezone not in available_timezones():
+            user_timezone = 'UTC'
 
         # Validation
         if not all([first_name, last_name, email, password, confirm]):
@@ -49,6 +71,7 @@ def register_user(request):
                 first_name=first_name,
                 last_name=last_name,
                 education=education,
+                timezone=user_timezone,
                 role="student"
             )
             messages.success(request, "✅ Registration successful! Please login.")
@@ -66,24 +89,28 @@ def login_user(request):
     if request.method == "POST":
         email = request.POST.get('email', '').strip().lower()
         password = request.POST.get('password', '')
+        client_ip = get_client_ip(request)
+        throttle = LoginThrottle()
         
-        try:
-            # Find user by email (since we use email as username)
-            user = User.objects.get(email=email)
-            # Authenticate using Django's system
-            user = authenticate(request, username=user.username, password=password)
+        # Refuse brute-force traffic before any user lookup or password hashing
+        if throttle.is_blocked(client_ip, email):
+            messages.error(request, "⚠ Too many failed login attempts. Please try again later.")
+            return render(request, 'studenttracker/login.html', status=429)
+        
+        # One indexed lookup by email, see auth_backends.EmailBackend
+        user = authenticate(request, email=email, password=password)
+        
+        if user is not None:
+            throttle.reset(email)
+            login(request, user)
+            messages.success(request, f"✅ Welcome back, {user.first_name}!")
             
-            if user is not None:
-                login(request, user)
-                messages.success(request, f"✅ Welcome back, {user.first_name}!")
-                
-                if user.role == "admin":
-                    return redirect('admin_dashboard')
-                else:
-                    return redirect('dashboard')
+            if user.role == "admin":
+                return redirect('admin_dashboard')
             else:
-                messages.error(request, "⚠ Invalid email or password")
-        except User.DoesNotExist:
+                return redirect('dashboard')
+        else:
+            throttle.record_failure(client_ip, email)
             messages.error(request, "⚠ Invalid email or password")
     
     return render(request, 'studenttracker/login.html')
@@ -103,16 +130,22 @@ def dashboard(request):
     video_id = request.GET.get('video_id')
     if video_id:
         try:
-            active_video = Video.objects.get(id=video_id)
+            active_video = Video.objects.select_related('section').get(id=video_id)
             # Check if user can access this video
-            if not active_video.is_preview:
-                enrollment = Enrollment.objects.filter(user=user, course=active_video.section.course).first()
-                if not enrollment:
-                    messages.error(request, 'You need to enroll in this course to watch this video.')
-                    return redirect('dashboard')
-        except Video.DoesNotExist:
+            if not request.access.can_watch(active_video):
+                messages.error(request, 'You need to enroll in this course to watch this video.')
+                return redirect('dashboard')
+        except (Video.DoesNotExist, ValueError):
             pass
     
+    # Uploaded previews play from a signed, cacheable link; everything else through the access-checked stream
+    video_src = None
+    if active_video and active_video.video_file:
+        if active_video.is_preview:
+            video_src = preview_url(active_video)
+        else:
+            video_src = reverse('stream_video', args=[active_video.id])
+    
     # Get courses for continue learning (in progress)
     continue_learning_courses = []
     for enrollment in enrolled_courses.filter(progress__lt=100):
@@ -173,18 +206,22 @@ def dashboard(request):
     courses = Course.objects.filter(enrollments__user=user)
     tasks = Task.objects.filter(student=user)
     notifications = HabitNotification.objects.filter(student=user, is_read=False)
+    unread_notification_count = get_unread_count(user.id)
     
     context = {
         'user': user,
         'enrolled_courses': enrolled_courses,
         'active_video': active_video,
+        'video_src': video_src,
         'continue_learning_courses': continue_learning_courses,
         'high_completion_courses': high_completion_courses,
         'preview_courses': preview_courses,
         'preview_courses_with_videos': preview_courses_with_videos,
+        'recommended_course': CourseRecommender().recommend_next_course(user),
         'courses': courses,  # Legacy
         'tasks': tasks,      # Legacy
-        'notifications': notifications.order_by('-created_at')[:10],
+        'notifications': notifications.order_by('-id')[:10],  # Not gated on the count, which can lag other processes
+        'unread_notification_count': unread_notification_count,
     }
     
     return render(request, 'studenttracker/dashboard.html', context)
@@ -194,7 +231,7 @@ def dashboard(request):
 # -------------------------------------------
 @login_required
 def admin_dashboard(request):
-    if request.user.role != "admin":
+    if not request.access.is_admin:
         messages.error(request, "⚠ You are not authorized to view this page.")
         return redirect('dashboard')
 
@@ -220,19 +257,45 @@ def admin_dashboard(request):
         
         return redirect('admin_dashboard')
 
-    students = User.objects.filter(role="student")
+    # Everything the student cards render, loaded up front instead of per card
+    students = User.objects.filter(role="student").prefetch_related(
+        'enrollments__course__sections__videos',
+        Prefetch('videoprogress_set', queryset=VideoProgress.objects.select_related('video')),
+        'tasks',
+    )
 
     return render(request, "studenttracker/admin_dashboard.html", {
         "admin_user": request.user,
         "students": students
     })
 
+# -------------------------------------------
+# ADMIN ANALYTICS
+# -------------------------------------------
+@login_required
+def admin_analytics(request):
+    if not request.access.is_admin:
+        messages.error(request, "⚠ You are not authorized to view this page.")
+        return redirect('dashboard')
+
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 365)
+    except ValueError:
+        days = 30
+    service = AdminAnalyticsService(days=days)
+    metrics_store.flush()  # Include this worker's not-yet-flushed requests
+    return render(request, "studenttracker/admin_analytics.html", {
+        "summary": service.get_summary(refresh=bool(request.GET.get('refresh'))),
+        "cache_minutes": service.ttl // 60,
+        "request_metrics": metrics_store.summary(),
+    })
+
 # -------------------------------------------
 # ADD COURSE (Admin Only - UPDATED FOR VIDEO COURSES)
 # -------------------------------------------
 @login_required
 def add_course(request):
-    if request.user.role != "admin":
+    if not request.access.is_admin:
         messages.error(request, "⚠ Only admin can access this page.")
         return redirect('dashboard')
 
@@ -269,6 +332,7 @@ def add_course(request):
 
     return render(request, 'studenttracker/add_course.html', {
         'students': students,
+        'totals': AdminAnalyticsService().get_summary()['totals'],
     })
 
 # -------------------------------------------
@@ -276,7 +340,7 @@ def add_course(request):
 # -------------------------------------------
 @login_required
 def add_video(request):
-    if request.user.role != "admin":
+    if not request.access.is_admin:
         messages.error(request, "⚠ Only admin can access this page.")
         return redirect('dashboard')
 
@@ -291,9 +355,19 @@ def add_video(request):
         order = request.POST.get('order', 0)
         video_type = request.POST.get('video_type', 'video')
         is_preview = 'is_preview' in request.POST
+        upload_id = request.POST.get('upload_id')
         
         course = get_object_or_404(Course, id=course_id)
         
+        # File sent beforehand through the chunked upload API
+        video_file = None
+        if upload_id:
+            upload = VideoUpload.objects.filter(upload_id=upload_id, user=request.user, status='complete').first()
+            if not upload:
+                messages.error(request, "⚠ The uploaded video file was not found or is incomplete.")
+                return redirect('add_video')
+            video_file = upload.file_name
+        
         # Create or get a default section for the course
         default_section, created = VideoSection.objects.get_or_create(
             course=course,
@@ -313,10 +387,11 @@ def add_video(request):
             title=title,
             description=description,
             video_url=video_url,
-            duration=duration,
+            duration=duration or 0,  # 0 lets the media worker probe the uploaded file
             order=order,
             video_type=video_type,
-            is_preview=is_preview
+            is_preview=is_preview,
+            video_file=video_file
         )
         
         messages.success(request, f"✅ Video '{title}' added successfully!")
@@ -324,15 +399,104 @@ def add_video(request):
     
     context = {
         'courses': courses,
+        'allowed_formats': settings.STUDYTRACK_SETTINGS['ALLOWED_VIDEO_FORMATS'],
     }
     return render(request, 'studenttracker/add_video.html', context)
 
+# -------------------------------------------
+# CHUNKED VIDEO UPLOADS (Admin Only)
+# -------------------------------------------
+def _admin_json_required(request):
+    if not request.access.is_admin:
+        return JsonResponse({'success': False, 'error': 'Only admin can upload videos'}, status=403)
+    return None
+
+@login_required
+def start_video_upload(request):
+    """Register an upload; format and size are checked before any bytes are sent"""
+    denied = _admin_json_required(request)
+    if denied:
+        return denied
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+    
+    service = ChunkedVideoUploadService()
+    try:
+        upload = service.start(
+            request.user,
+            request.POST.get('filename'),
+            request.POST.get('total_size'),
+            request.POST.get('sha256', ''),
+        )
+    except UploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'upload_id': str(upload.upload_id),
+        'offset': 0,
+        'max_chunk_size': service.max_chunk_size,
+    })
+
+@login_required
+def video_upload_chunk(request, upload_id):
+    """GET: resume offset. POST ?offset=N with the raw chunk as body (X-Chunk-SHA256 optional)"""
+    denied = _admin_json_required(request)
+    if denied:
+        return denied
+    upload = get_object_or_404(VideoUpload, upload_id=upload_id, user=request.user)
+    
+    if request.method == 'POST':
+        try:
+            offset = int(request.GET.get('offset', -1))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            # Read from the request stream, never request.body, so the chunk goes straight to disk
+            offset = ChunkedVideoUploadService().write_chunk(
+                upload, offset, request, length, request.META.get('HTTP_X_CHUNK_SHA256', '')
+            )
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'offset must be an integer'}, status=400)
+        except UploadError as e:
+            upload.refresh_from_db()
+            return JsonResponse({'success': False, 'error': str(e), 'offset': upload.received_bytes}, status=409)
+        return JsonResponse({'success': True, 'offset': offset, 'total_size': upload.total_size})
+    
+    return JsonResponse({
+        'success': True,
+        'offset': upload.received_bytes,
+        'total_size': upload.total_size,
+        'status': upload.status,
+    })
+
+@login_required
+def complete_video_upload(request, upload_id):
+    """Verify the assembled file and optionally attach it to an existing video"""
+    denied = _admin_json_required(request)
+    if denied:
+        return denied
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+    upload = get_object_or_404(VideoUpload, upload_id=upload_id, user=request.user)
+    
+    try:
+        file_name = ChunkedVideoUploadService().complete(upload)
+    except UploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    video_id = request.POST.get('video_id')
+    if video_id:
+        video = get_object_or_404(Video, id=video_id)
+        video.video_file.name = file_name
+        video.save(update_fields=['video_file'])
+    
+    return JsonResponse({'success': True, 'file': file_name, 'upload_id': str(upload.upload_id)})
+
 # -------------------------------------------
 # ADD TASK (Admin Only)
 # -------------------------------------------
 @login_required
 def add_task(request):
-    if request.user.role != "admin":
+    if not request.access.is_admin:
         messages.error(request, "⚠ Only admin can access this page.")
         return redirect('dashboard')
 
@@ -366,7 +530,8 @@ def add_task(request):
 
     return render(request, 'studenttracker/add_task.html', {
         'students': students, 
-        'courses': courses
+        'courses': courses,
+        'totals': AdminAnalyticsService().get_summary()['totals'],
     })
 # -------------------------------------------
 # ENROLL IN COURSE
@@ -376,13 +541,15 @@ def enroll_course(request, course_id):
     course = get_object_or_404(Course, id=course_id)
     
     # Check if already enrolled
-    existing_enrollment = Enrollment.objects.filter(user=request.user, course=course).first()
-    if existing_enrollment:
+    if request.access.is_enrolled(course.id):
         messages.info(request, f'You are already enrolled in "{course.title}"')
         return redirect('course_detail', course_id=course_id)
     
-    # Create enrollment
-    Enrollment.objects.create(user=request.user, course=course)
+    # Create enrollment; the enrolled set can lag a concurrent click, the unique row cannot
+    enrollment, created = Enrollment.objects.get_or_create(user=request.user, course=course)
+    if not created:
+        messages.info(request, f'You are already enrolled in "{course.title}"')
+        return redirect('course_detail', course_id=course_id)
     
     # Update course students count
     course.students_count = Enrollment.objects.filter(course=course).count()
@@ -395,32 +562,56 @@ def enroll_course(request, course_id):
 # -------------------------------------------
 @login_required
 def play_video(request, video_id):
-    video = get_object_or_404(Video, id=video_id)
-    
-    # Check if user is enrolled or video is preview
-    if not video.is_preview:
-        enrollment = Enrollment.objects.filter(
-            user=request.user, 
-            course=video.section.course
-        ).first()
-        if not enrollment:
-            messages.error(request, 'You need to enroll in this course to watch this video.')
-            return redirect('dashboard')
-    
-    # Update or create video progress
+    # The dashboard loads the video and checks access; progress is only
+    # recorded once playback actually starts (see start_video)
+    return redirect(f'/dashboard/?video_id={video_id}')
+
+@login_required
+@require_POST
+def start_video(request, video_id):
+    """Called by the player on first play: create the progress row"""
+    video = get_object_or_404(Video.objects.select_related('section'), id=video_id)
+    if not request.access.can_watch(video):
+        return JsonResponse({'success': False, 'error': 'You need to enroll in this course to watch this video.'})
     progress, created = VideoProgress.objects.get_or_create(
         user=request.user,
         video=video,
         defaults={'watched_duration': 0, 'is_completed': False}
     )
-    
-    # Redirect to dashboard with video parameter to show the player
-    return redirect(f'/dashboard/?video_id={video_id}')
+    return JsonResponse({'success': True, 'created': created})
+
+@login_required
+def stream_video(request, video_id):
+    """Serve an uploaded video file with byte-range support for seeking"""
+    video = get_object_or_404(Video.objects.select_related('section'), id=video_id)
+    if not video.video_file:
+        raise Http404("This video has no uploaded file")
+    if not request.access.can_watch(video):
+        return HttpResponseForbidden('You need to enroll in this course to watch this video.')
+    try:
+        return stream_file(request, video.video_file)
+    except FileNotFoundError:
+        raise Http404("Video file is missing")
+
+def stream_preview(request, token):
+    """Serve a preview video from a signed link (see preview_url); no login or database access"""
+    signed = read_preview_token(token)
+    if signed is None:
+        return HttpResponseForbidden('This preview link is invalid or has expired.')
+    _, file_name, expires = signed
+    try:
+        response = stream_file(request, FieldFile(None, Video._meta.get_field('video_file'), file_name))
+    except FileNotFoundError:
+        raise Http404("Video file is missing")
+    # Same URL for every viewer until it expires, so shared caches may keep it that long
+    patch_cache_control(response, public=True, max_age=max(0, int(expires - time.time())))
+    return response
 
 @login_required
 def mark_video_completed(request, video_id):
     if request.method == 'POST':
-        video = get_object_or_404(Video, id=video_id)
+        video = get_object_or_404(Video.objects.select_related('section'), id=video_id)
+        course_id = video.section.course_id
         
         # Update progress
         progress, created = VideoProgress.objects.get_or_create(
@@ -431,22 +622,26 @@ def mark_video_completed(request, video_id):
         progress.watched_duration = video.duration  # Assume full duration watched
         progress.save()
         
-        # Update course progress
-        enrollment = Enrollment.objects.filter(
-            user=request.user,
-            course=video.section.course
-        ).first()
+        # Update course progress (preview watchers have no enrollment to update)
+        enrollment = None
+        if request.access.is_enrolled(course_id):
+            enrollment = Enrollment.objects.filter(user=request.user, course_id=course_id).first()
         
         if enrollment:
             # Calculate new progress
-            total_videos = Video.objects.filter(section__course=enrollment.course).count()
+            total_videos = Video.objects.filter(section__course_id=course_id).count()
             completed_videos = VideoProgress.objects.filter(
                 user=request.user,
-                video__section__course=enrollment.course,
+                video__section__course_id=course_id,
                 is_completed=True
             ).count()
             
             enrollment.progress = (completed_videos / total_videos) * 100 if total_videos > 0 else 0
+            # completed_at drives the courses_completed leaderboard and the analytics completion rates
+            if enrollment.progress >= 100:
+                enrollment.completed_at = enrollment.completed_at or timezone.now()
+            else:
+                enrollment.completed_at = None
             enrollment.save()
         
         return JsonResponse({'success': True})
@@ -462,14 +657,22 @@ def video_notes(request, video_id):
 @login_required
 def course_detail(request, course_id):
     course = get_object_or_404(Course, id=course_id)
-    enrollment = Enrollment.objects.filter(user=request.user, course=course).first()
+    enrollment = None
+    if request.access.is_enrolled(course.id):
+        enrollment = Enrollment.objects.filter(user=request.user, course=course).first()
     
     if not enrollment and not course.sections.filter(videos__is_preview=True).exists():
         messages.error(request, 'You need to enroll in this course to access it.')
         return redirect('dashboard')
     
+    # Videos and their funnel summaries in two queries instead of one per section/video
+    sections = course.sections.prefetch_related(
+        Prefetch('videos', queryset=Video.objects.select_related('funnel'))
+    )
+    
     context = {
         'course': course,
+        'sections': sections,
         'enrollment': enrollment,
     }
     return render(request, 'studenttracker/course_detail.html', context)
@@ -480,15 +683,73 @@ def course_detail(request, course_id):
 @login_required
 def mark_notification_read(request, notification_id):
     """Mark notification as read"""
-    try:
-        notification = HabitNotification.objects.get(id=notification_id, student=request.user)
-        notification.is_read = True
-        notification.save()
-        print(f"✅ Marked notification {notification_id} as read for user {request.user.email}")
-        return JsonResponse({'success': True})
-    except HabitNotification.DoesNotExist:
-        print(f"❌ Notification {notification_id} not found for user {request.user.email}")
+    updated = mark_read(request.user.id, [notification_id])
+    # Zero rows means already read or not ours; only the rare miss pays for the lookup
+    if not updated and not HabitNotification.objects.filter(id=notification_id, student=request.user).exists():
         return JsonResponse({'success': False, 'error': 'Notification not found'})
+    return JsonResponse({'success': True, 'unread_count': get_unread_count(request.user.id)})
+
+@login_required
+def mark_notifications_read(request):
+    """Mark all or the selected notifications as read with a single UPDATE"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'})
+    
+    if request.POST.get('all'):
+        ids = None
+    else:
+        try:
+            ids = [int(i) for i in request.POST.getlist('ids')]
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid notification id'})
+    
+    updated = mark_read(request.user.id, ids)
+    return JsonResponse({'success': True, 'updated': updated, 'unread_count': get_unread_count(request.user.id)})
+
+@login_required
+def notification_feed(request):
+    """Keyset-paginated notification feed: ?cursor=<last id>&limit=20&unread=1"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+        cursor = int(request.GET['cursor']) if request.GET.get('cursor') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor or limit'})
+    
+    notifications = HabitNotification.objects.filter(student=request.user)
+    if request.GET.get('unread'):
+        notifications = notifications.filter(is_read=False)
+    if cursor is not None:
+        notifications = notifications.filter(id__lt=cursor)
+    
+    # Fetch one extra row to know whether another page exists
+    page = list(notifications.order_by('-id').values(
+        'id', 'notification_type', 'title', 'message', 'is_read', 'created_at'
+    )[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    
+    return JsonResponse({
+        'success': True,
+        'results': page,
+        'next_cursor': page[-1]['id'] if has_more else None,
+        'unread_count': get_unread_count(request.user.id),
+    })
+
+@login_required
+def notification_settings(request):
+    """Choose between individual reminder emails and a combined digest"""
+    if request.method == 'POST':
+        frequency = request.POST.get('digest_frequency')
+        if frequency not in dict(User.DIGEST_CHOICES):
+            return JsonResponse({'success': False, 'error': 'Unknown digest frequency'})
+        request.user.digest_frequency = frequency
+        request.user.save(update_fields=['digest_frequency'])
+        return JsonResponse({'success': True, 'digest_frequency': frequency})
+    
+    return JsonResponse({
+        'digest_frequency': request.user.digest_frequency,
+        'choices': dict(User.DIGEST_CHOICES),
+    })
 
 @login_required
 def test_study_reminder(request):
@@ -497,6 +758,77 @@ def test_study_reminder(request):
     success = notification_service.send_study_reminder(request.user)
     return JsonResponse({'success': success})
 
+# -------------------------------------------
+# SEARCH
+# -------------------------------------------
+@login_required
+def search(request):
+    """Ranked course and video search: ?q=<terms>&limit=20 (every term is prefix-matched)"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit'})
+    if not query:
+        return JsonResponse({'success': True, 'query': query, 'courses': [], 'videos': []})
+    
+    # Admins also find unpublished courses and their videos
+    results = SearchIndex().search(query, limit=limit, include_unpublished=request.access.is_admin)
+    return JsonResponse({'success': True, 'query': query, **results})
+
+# -------------------------------------------
+# LEADERBOARDS
+# -------------------------------------------
+@login_required
+def leaderboard(request):
+    """Ranked page of a board plus the caller's own position.
+
+    ?metric=study_hours|habit_streak|courses_completed, or
+    ?metric=course_watch_hours&course=<id>; page with ?after=<rank>:<user_id>
+    """
+    metric = request.GET.get('metric', 'study_hours')
+    try:
+        course_id = int(request.GET.get('course', 0))
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+        after = tuple(int(part) for part in request.GET['after'].split(':', 1)) if request.GET.get('after') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid course, limit or cursor'})
+    if after is not None and len(after) != 2:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'})
+    if not (metric in GLOBAL_METRICS and not course_id) and not (metric in COURSE_METRICS and course_id):
+        return JsonResponse({'success': False, 'error': 'Unknown metric for this board'})
+    
+    service = LeaderboardService()
+    # Fetch one extra row to know whether another page exists
+    entries = service.top(metric, course_id, limit=limit + 1, after=after)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return JsonResponse({
+        'success': True,
+        'metric': metric,
+        'course': course_id or None,
+        'results': entries,
+        'next_cursor': f"{entries[-1]['rank']}:{entries[-1]['user_id']}" if has_more else None,
+        'me': service.position(metric, request.user.id, course_id),
+    })
+
+# -------------------------------------------
+# NOTIFICATION METRICS (Prometheus)
+# -------------------------------------------
+def notification_metrics_export(request):
+    """Notification delivery counters and timings in the Prometheus text format.
+
+    Scrapers authenticate with `Authorization: Bearer <METRICS_TOKEN>`;
+    admins can also open the page from a logged-in session.
+    """
+    token = settings.STUDYTRACK_SETTINGS.get('METRICS_TOKEN')
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    is_admin = request.access.is_admin
+    # Bytes: compare_digest() raises TypeError for non-ASCII str, and headers can carry any latin-1 text
+    if not is_admin and not (token and hmac.compare_digest(supplied.encode(), token.encode())):
+        return HttpResponseForbidden('Metrics need an admin session or the metrics token')
+    return HttpResponse(notification_metrics.prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # -------------------------------------------
 # LOGOUT
 # -------------------------------------------